@@ -1,25 +1,55 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
-from routes import api_bp
+from routes import api_bp, init_controllers
+from config.database import db_config
 from config.settings import settings
+from config.json_provider import BSONJSONProvider
+from monitoring.profiling import init_profiling
 
 def create_app():
     app = Flask(__name__)
+    # Serializa ObjectId/datas direto na resposta (sem json_util + json.loads)
+    app.json = BSONJSONProvider(app)
     
     # Configurar CORS
     CORS(app, 
          origins=['http://localhost:3000', 'http://localhost:5173', 'http://localhost:5174'],
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-         allow_headers=['Content-Type', 'Authorization'],
+         allow_headers=['Content-Type', 'Authorization', 'Cache-Control'],  # Cache-Control: no-cache ignora o cache do n8n
+         expose_headers=['X-Next-Cursor'],
          supports_credentials=True)
     
+    init_controllers()
     app.register_blueprint(api_bp, url_prefix='/api')
+
+    # Latência por rota, requisições em andamento e GET /metrics
+    if settings.METRICS_ENABLED:
+        from monitoring.metrics import init_metrics
+        init_metrics(app)
+
+    # Perfil sob demanda (X-Profile ou amostragem); desligado não registra nada
+    if settings.PROFILING_ENABLED:
+        init_profiling(app)
     
     # Health check endpoint
     @app.route('/')
     @app.route('/health')
     def health_check():
         return jsonify({"status": "healthy", "service": "ChatAI Backend"}), 200
+
+    # Liveness: o processo responde (não consulta dependências; falhar aqui reinicia o container)
+    @app.route('/livez')
+    def livez():
+        return jsonify({"status": "alive"}), 200
+
+    # Readiness: só recebe tráfego com o MongoDB acessível (ping com prazo READINESS_TIMEOUT)
+    @app.route('/readyz')
+    def readyz():
+        try:
+            db_config.ping(settings.READINESS_TIMEOUT)
+        except Exception as e:
+            return jsonify({"status": "not_ready", "checks": {"mongodb": f"error: {str(e) or type(e).__name__}"}}), 503
+        return jsonify({"status": "ready", "checks": {"mongodb": "ok"}}), 200
     
     return app
 
@@ -0,0 +1,83 @@
+"""
+Entrada ASGI do ChatAI: mesmas rotas de app.py sobre Quart, motor e httpx
+
+Uma chamada esperando o n8n ocupa só uma corrotina, então um processo atende
+centenas de turnos de chat simultâneos (ajuste N8N_POOL_MAXSIZE e
+N8N_BULKHEAD_MAX_CONCURRENT de acordo).
+
+Uso:
+    hypercorn asgi:app --bind 0.0.0.0:5000
+"""
+
+from quart import Quart, jsonify
+from quart_cors import cors
+from async_routes import async_api_bp, init_controllers, health_prober
+from config.async_database import async_db_config
+from config.json_provider import BSONJSONProvider
+from config.settings import settings
+from gateways.async_n8n_gateway import close_async_n8n_gateway
+from monitoring.profiling import init_async_profiling
+from passwords import password_verifier
+
+def create_async_app():
+    app = Quart(__name__)
+    # Mesma serialização de ObjectId/datas do app Flask
+    app.json = BSONJSONProvider(app)
+
+    app = cors(app,
+               allow_origin=['http://localhost:3000', 'http://localhost:5173', 'http://localhost:5174'],
+               allow_methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
+               allow_headers=['Content-Type', 'Authorization', 'Cache-Control'],  # Cache-Control: no-cache ignora o cache do n8n
+               expose_headers=['X-Next-Cursor'],
+               allow_credentials=True)
+
+    app.register_blueprint(async_api_bp, url_prefix='/api')
+
+    # Latência por rota, requisições em andamento e GET /metrics
+    if settings.METRICS_ENABLED:
+        from monitoring.metrics import init_async_metrics
+        init_async_metrics(app)
+
+    # Perfil sob demanda (X-Profile ou amostragem); desligado não registra nada
+    if settings.PROFILING_ENABLED:
+        init_async_profiling(app)
+
+    @app.before_serving
+    async def startup():
+        await async_db_config.connect()
+        init_controllers()
+        health_prober.start()
+
+    @app.after_serving
+    async def shutdown():
+        await health_prober.stop()
+        await close_async_n8n_gateway()
+        password_verifier.shutdown()
+        async_db_config.disconnect()
+
+    # Health check endpoint
+    @app.route('/')
+    @app.route('/health')
+    async def health_check():
+        return jsonify({"status": "healthy", "service": "ChatAI Backend"}), 200
+
+    # Liveness: o processo responde (não consulta dependências; falhar aqui reinicia o container)
+    @app.route('/livez')
+    async def livez():
+        return jsonify({"status": "alive"}), 200
+
+    # Readiness: só recebe tráfego com o MongoDB acessível (ping com prazo READINESS_TIMEOUT)
+    @app.route('/readyz')
+    async def readyz():
+        try:
+            await async_db_config.ping(settings.READINESS_TIMEOUT)
+        except Exception as e:
+            return jsonify({"status": "not_ready", "checks": {"mongodb": f"error: {str(e) or type(e).__name__}"}}), 503
+        return jsonify({"status": "ready", "checks": {"mongodb": "ok"}}), 200
+
+    return app
+
+app = create_async_app()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,86 @@
+"""
+Rotas do app ASGI (asgi.py): mesmo contrato de routes.py, com controllers assíncronos
+
+Os controllers dependem do banco (motor) e do gateway assíncrono, que só existem
+dentro do event loop; init_controllers() é chamado no startup do app.
+"""
+
+from quart import Blueprint, jsonify
+from controllers.async_auth_controller import AsyncAuthController
+from controllers.async_talk_controller import AsyncTalkController
+from controllers.async_message_controller import AsyncMessageController
+from config.async_database import async_db_config
+from gateways.async_n8n_gateway import get_async_n8n_gateway
+from monitoring.health import create_async_health_prober, health_response
+
+async_api_bp = Blueprint('async_api', __name__)
+
+auth_controller: AsyncAuthController = None
+talk_controller: AsyncTalkController = None
+message_controller: AsyncMessageController = None
+
+# Tarefas criadas no startup do app (asgi.py)
+health_prober = create_async_health_prober()
+
+
+def init_controllers():
+    """Instancia os controllers (depois de async_db_config.connect())"""
+    global auth_controller, talk_controller, message_controller
+    db = async_db_config.get_database()
+    n8n_gateway = get_async_n8n_gateway()
+    auth_controller = AsyncAuthController(db)
+    talk_controller = AsyncTalkController(db, n8n_gateway)
+    message_controller = AsyncMessageController(db, n8n_gateway)
+
+
+# Rotas
+@async_api_bp.route('/login', methods=['POST'])
+async def login():
+    return await auth_controller.login()
+
+@async_api_bp.route('/refresh', methods=['POST'])
+async def refresh():
+    return await auth_controller.refresh()
+
+@async_api_bp.route('/me', methods=['GET'])
+async def get_current_user():
+    return await auth_controller.get_current_user()
+
+@async_api_bp.route('/talk-user', methods=['GET'])
+async def get_talks_by_user():
+    return await talk_controller.get_talks_by_user()
+
+@async_api_bp.route('/messages-by-talk', methods=['GET'])
+async def get_messages_by_talk():
+    return await message_controller.get_messages_by_talk()
+
+@async_api_bp.route('/message', methods=['POST'])
+async def send_message():
+    return await message_controller.send_message_to_talk()
+
+@async_api_bp.route('/message/stream', methods=['POST'])
+async def stream_message():
+    return await message_controller.stream_message_to_talk()
+
+@async_api_bp.route('/reply-status', methods=['GET'])
+async def get_reply_status():
+    return await message_controller.get_reply_status()
+
+@async_api_bp.route('/talk', methods=['POST'])
+async def create_talk():
+    return await talk_controller.create_talk_with_message()
+
+@async_api_bp.route('/talk', methods=['PUT'])
+async def update_talk():
+    return await talk_controller.update_talk()
+
+@async_api_bp.route('/talk', methods=['DELETE'])
+async def delete_talk():
+    return await talk_controller.delete_talk()
+
+
+@async_api_bp.route('/health', methods=['GET'])
+async def health():
+    """Health check da API: último resultado do prober, sem consultar as dependências"""
+    body, status_code = health_response(health_prober.snapshot(), get_async_n8n_gateway().get_stats())
+    return jsonify(body), status_code
@@ -1,28 +1,166 @@
-import os
+import datetime
+import hashlib
+import threading
+import time
+import uuid
 import jwt
+from collections import OrderedDict
 from functools import wraps
+from typing import Optional, Tuple
 from flask import request, jsonify, g
+from config.settings import settings
+
+JWT_ALGORITHM = 'HS256'
+REFRESH_TOKEN_TYPE = 'refresh'
+
+# Chaves de assinatura lidas uma vez, no import
+_access_key = settings.JWT_SECRET_KEY
+_refresh_key = settings.JWT_REFRESH_SECRET_KEY
+
+
+class VerifiedTokenCache:
+    """
+    Cache LRU de tokens de acesso já verificados, indexado pelo digest do token
+
+    Evita refazer a validação do JWT a cada requisição do mesmo cliente. Cada
+    entrada vale até o exp do próprio token, então um token expirado nunca é
+    aceito pelo cache.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[bytes, Tuple[dict, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        if self.max_entries <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(payload)
+
+    def put(self, token: str, payload: dict):
+        if self.max_entries <= 0 or 'exp' not in payload:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(payload), float(payload['exp']))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_verified_tokens = VerifiedTokenCache(settings.JWT_VERIFIED_CACHE_SIZE)
+
+
+def issue_access_token(user) -> str:
+    """Token de acesso (curto) com os dados do usuário usados pelas rotas"""
+    return jwt.encode({
+        'user': user['email'],
+        'user_id': str(user['_id']),
+        'name': user['name'],
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=settings.JWT_ACCESS_TOKEN_EXPIRES)
+    }, _access_key, algorithm=JWT_ALGORITHM)
+
+
+def issue_refresh_token(user, family: Optional[str] = None) -> Tuple[str, dict]:
+    """
+    Token de renovação (longo): só troca por novos tokens em /api/refresh, uma vez
+
+    family identifica a sessão aberta pelo login (nova quando None) e passa para os
+    tokens emitidos nas renovações seguintes.
+
+    Returns:
+        (token, claims); os claims são gravados pelo RefreshTokenRepository
+    """
+    claims = {
+        'type': REFRESH_TOKEN_TYPE,
+        'user_id': str(user['_id']),
+        'jti': uuid.uuid4().hex,
+        'fam': family or uuid.uuid4().hex,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=settings.JWT_REFRESH_TOKEN_EXPIRES)
+    }
+    return jwt.encode(claims, _refresh_key, algorithm=JWT_ALGORITHM), claims
+
+
+def decode_refresh_token(token: str) -> Tuple[Optional[dict], Optional[str]]:
+    """Valida um token de renovação: (payload, None) ou (None, mensagem de erro)"""
+    try:
+        payload = jwt.decode(token, _refresh_key, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        return None, 'Refresh token has expired!'
+    except jwt.InvalidTokenError:
+        return None, 'Refresh token is invalid!'
+    # Tokens sem jti/fam (emitidos antes da rotação) não podem ser consumidos
+    if payload.get('type') != REFRESH_TOKEN_TYPE or not payload.get('jti') or not payload.get('fam'):
+        return None, 'Refresh token is invalid!'
+    return payload, None
+
+
+def _decode_bearer(headers) -> Tuple[Optional[dict], Optional[str]]:
+    """Valida o header Authorization: (payload do token, None) ou (None, mensagem de erro)"""
+    token = None
+    if 'Authorization' in headers:
+        auth_header = headers['Authorization']
+        if auth_header.startswith('Bearer '):
+            token = auth_header.split(' ')[1]
+
+    if not token:
+        return None, 'Token is missing!'
+
+    payload = _verified_tokens.get(token)
+    if payload is not None:
+        return payload, None
+
+    try:
+        payload = jwt.decode(token, _access_key, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        return None, 'Token has expired!'
+    except jwt.InvalidTokenError:
+        return None, 'Token is invalid!'
+
+    # Token de renovação não serve como token de acesso (mesmo com a mesma chave)
+    if payload.get('type') == REFRESH_TOKEN_TYPE:
+        return None, 'Token is invalid!'
+
+    _verified_tokens.put(token, payload)
+    return payload, None
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-
-        if not token:
-            return jsonify({'message': 'Token is missing!'}), 401
-
-        try:
-            data = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
-            g.current_user = data
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired!'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token is invalid!'}), 401
+        data, error = _decode_bearer(request.headers)
+        if error:
+            return jsonify({'message': error}), 401
 
+        g.current_user = data
         return f(*args, **kwargs)
 
     return decorated
+
+def async_token_required(f):
+    """token_required para controllers do app ASGI (Quart)"""
+    from quart import request as quart_request, jsonify as quart_jsonify, g as quart_g
+
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        data, error = _decode_bearer(quart_request.headers)
+        if error:
+            return quart_jsonify({'message': error}), 401
+
+        quart_g.current_user = data
+        return await f(*args, **kwargs)
+
+    return decorated
@@ -0,0 +1,101 @@
+"""
+Async Database Configuration - Conexão com MongoDB pelo driver assíncrono (motor)
+
+Usada pelo app ASGI (asgi.py). O cliente é criado no startup do servidor, dentro
+do event loop que vai atendê-lo, sem esperar o MongoDB: a conexão abre na primeira
+operação e a disponibilidade é verificada pelo /readyz (ping()).
+"""
+
+from typing import Optional
+import asyncio
+import structlog
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from .settings import settings
+
+logger = structlog.get_logger(__name__)
+
+
+class AsyncDatabaseConfig:
+    """Configuração e conexão assíncrona com MongoDB"""
+
+    def __init__(self):
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._database: Optional[AsyncIOMotorDatabase] = None
+
+    @staticmethod
+    def _event_listeners() -> list:
+        """Listeners das métricas (importados aqui: o gunicorn.conf.py configura o modo multiprocesso antes)"""
+        if not settings.METRICS_ENABLED:
+            return []
+        from monitoring.metrics import mongodb_listeners
+        return mongodb_listeners()
+
+    async def connect(self) -> AsyncIOMotorDatabase:
+        """Cria o cliente do MongoDB (sem I/O) e retorna a instância do banco"""
+        try:
+            if not self._client:
+                logger.info("Criando cliente do MongoDB (motor)", uri=settings.MONGODB_URI.replace(
+                    settings.MONGODB_URI.split('@')[0].split('//')[1], "***:***"
+                ))
+
+                # Mesmas opções do cliente síncrono; o pool atende todas as corrotinas do processo
+                self._client = AsyncIOMotorClient(
+                    settings.MONGODB_URI,
+                    serverSelectionTimeoutMS=5000,
+                    connectTimeoutMS=5000,
+                    socketTimeoutMS=5000,
+                    maxPoolSize=50,
+                    minPoolSize=5,
+                    maxIdleTimeMS=30000,
+                    connect=False,  # conecta na primeira operação
+                    event_listeners=self._event_listeners(),
+                )
+
+            if self._database is None:
+                self._database = self._client[settings.MONGODB_DATABASE]
+
+            return self._database
+
+        except Exception as e:
+            logger.error("Erro ao criar cliente do MongoDB (motor)", error=str(e))
+            raise
+
+    def disconnect(self):
+        """Desconecta do MongoDB"""
+        if self._client:
+            self._client.close()
+            self._client = None
+            self._database = None
+            logger.info("Conexão com MongoDB (motor) encerrada")
+
+    def get_database(self) -> AsyncIOMotorDatabase:
+        """
+        Retorna a instância do banco (connect() precisa ter sido aguardado no startup)
+        """
+        if self._database is None:
+            raise RuntimeError("AsyncDatabaseConfig.connect() não foi chamado no startup do app")
+        return self._database
+
+    async def ping(self, timeout: float):
+        """
+        Pinga o MongoDB com prazo total de `timeout` segundos
+
+        Raises:
+            asyncio.TimeoutError, PyMongoError: MongoDB inacessível dentro do prazo
+        """
+        await asyncio.wait_for(self.get_database().command('ping'), timeout)
+
+    async def health_check(self) -> bool:
+        """Verifica se a conexão com o banco está saudável"""
+        try:
+            await self.ping(settings.READINESS_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.error("Health check do MongoDB (motor) falhou", error=str(e))
+            return False
+
+
+# Instância global da configuração assíncrona do banco
+async_db_config = AsyncDatabaseConfig()
@@ -2,8 +2,12 @@
 Database Configuration - Configuração do banco de dados
 """
 
+import threading
+
+import pymongo
 from pymongo import MongoClient
 from pymongo.database import Database
+from pymongo.write_concern import WriteConcern
 from typing import Optional
 import structlog
 
@@ -12,43 +16,69 @@ from .settings import settings
 logger = structlog.get_logger(__name__)
 
 
+def parse_write_concern(value: str) -> Optional[WriteConcern]:
+    """
+    Converte 'majority' ou um número de nós ('0', '1', ...) em WriteConcern
+
+    Vazio retorna None: a escrita usa o write concern do cliente (MONGODB_URI)
+    """
+    value = value.strip()
+    if not value:
+        return None
+    return WriteConcern(w=int(value) if value.isdigit() else value)
+
+
 class DatabaseConfig:
     """Configuração e conexão com MongoDB"""
     
     def __init__(self):
         self._client: Optional[MongoClient] = None
         self._database: Optional[Database] = None
+        self._lock = threading.Lock()
     
+    @staticmethod
+    def _event_listeners() -> list:
+        """Listeners das métricas (importados aqui: o gunicorn.conf.py configura o modo multiprocesso antes)"""
+        if not settings.METRICS_ENABLED:
+            return []
+        from monitoring.metrics import mongodb_listeners
+        return mongodb_listeners()
+
     def connect(self) -> Database:
-        """Conecta ao MongoDB e retorna a instância do banco"""
+        """
+        Cria o cliente do MongoDB e retorna a instância do banco
+
+        Não faz I/O: com connect=False o cliente só abre conexões (e as threads de
+        monitoramento) na primeira operação, então importar a app e subir os workers
+        não depende do MongoDB. A disponibilidade é verificada pelo /readyz (ping()).
+        """
         try:
-            if not self._client:
-                logger.info("Conectando ao MongoDB", uri=settings.MONGODB_URI.replace(
-                    settings.MONGODB_URI.split('@')[0].split('//')[1], "***:***"
-                ))
-                
-                self._client = MongoClient(
-                    settings.MONGODB_URI,
-                    serverSelectionTimeoutMS=5000,  # 5 segundos timeout
-                    connectTimeoutMS=5000,
-                    socketTimeoutMS=5000,
-                    maxPoolSize=50,
-                    minPoolSize=5,
-                    maxIdleTimeMS=30000,
-                )
-                
-                # Testar conexão
-                self._client.admin.command('ping')
-                logger.info("Conexão com MongoDB estabelecida com sucesso")
-            
-            if not self._database:
-                self._database = self._client[settings.MONGODB_DATABASE]
-                logger.info("Database selecionado", database=settings.MONGODB_DATABASE)
-            
-            return self._database
-            
+            with self._lock:
+                if self._client is None:
+                    logger.info("Criando cliente do MongoDB", uri=settings.MONGODB_URI.replace(
+                        settings.MONGODB_URI.split('@')[0].split('//')[1], "***:***"
+                    ))
+
+                    self._client = MongoClient(
+                        settings.MONGODB_URI,
+                        serverSelectionTimeoutMS=5000,  # 5 segundos timeout
+                        connectTimeoutMS=5000,
+                        socketTimeoutMS=5000,
+                        maxPoolSize=50,
+                        minPoolSize=5,
+                        maxIdleTimeMS=30000,
+                        connect=False,  # conecta na primeira operação
+                        event_listeners=self._event_listeners(),
+                    )
+
+                if self._database is None:
+                    self._database = self._client[settings.MONGODB_DATABASE]
+                    logger.info("Database selecionado", database=settings.MONGODB_DATABASE)
+
+                return self._database
+
         except Exception as e:
-            logger.error("Erro ao conectar com MongoDB", error=str(e))
+            logger.error("Erro ao criar cliente do MongoDB", error=str(e))
             raise
     
     def disconnect(self):
@@ -59,20 +89,38 @@ class DatabaseConfig:
             self._database = None
             logger.info("Conexão com MongoDB encerrada")
     
+    def reset_after_fork(self):
+        """
+        Descarta o cliente herdado do processo pai (gunicorn post_fork)
+
+        O MongoClient não é fork-safe: os sockets e os locks do pool pertencem ao pai.
+        O filho não fecha o cliente herdado (isso encerraria sessões do pai); só solta
+        a referência, e a próxima get_database() cria outro cliente.
+        """
+        self._lock = threading.Lock()
+        self._client = None
+        self._database = None
+
     def get_database(self) -> Database:
         """Retorna a instância do banco de dados"""
         if self._database is None:
             return self.connect()
         return self._database
     
+    def ping(self, timeout: float):
+        """
+        Pinga o MongoDB com prazo total de `timeout` segundos (seleção do servidor incluída)
+
+        Raises:
+            PyMongoError: MongoDB inacessível dentro do prazo
+        """
+        with pymongo.timeout(timeout):
+            self.get_database().command('ping')
+
     def health_check(self) -> bool:
         """Verifica se a conexão com o banco está saudável"""
         try:
-            if not self._client:
-                return False
-            
-            # Ping no servidor
-            self._client.admin.command('ping')
+            self.ping(settings.READINESS_TIMEOUT)
             return True
             
         except Exception as e:
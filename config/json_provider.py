@@ -0,0 +1,92 @@
+"""
+JSON Provider - Serialização direta de documentos BSON nas respostas
+
+Substitui o caminho json.loads(json_util.dumps(docs)) + jsonify por uma única
+passagem: os tipos BSON são convertidos durante a própria codificação, sem
+montar um grafo de objetos intermediário. Usa orjson quando instalado.
+
+Formatos de saída (JSON_LEGACY_BSON_FORMAT):
+
+    tipo         legado (padrão, igual ao json_util)      simples
+    ObjectId     {"$oid": "64a1b2c3..."}                 "64a1b2c3..."
+    datetime     {"$date": "2024-02-15T10:00:00Z"}       "2024-02-15T10:00:00Z"
+    Decimal128   {"$numberDecimal": "1.50"}              "1.50"
+
+Datas são sempre UTC, com milissegundos quando diferentes de zero.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any
+
+from bson import ObjectId, json_util
+from bson.decimal128 import Decimal128
+from flask.json.provider import DefaultJSONProvider
+
+from .settings import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+
+def format_datetime(value: datetime) -> str:
+    """ISO 8601 em UTC no mesmo formato do json_util (modo relaxed)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    millis = value.microsecond // 1000
+    fraction = f".{millis:03d}" if millis else ""
+    return f"{value.strftime('%Y-%m-%dT%H:%M:%S')}{fraction}Z"
+
+
+def bson_default(value: Any, legacy: bool) -> Any:
+    """Converte um tipo BSON não nativo do JSON"""
+    if isinstance(value, ObjectId):
+        return {'$oid': str(value)} if legacy else str(value)
+    if isinstance(value, datetime):
+        return {'$date': format_datetime(value)} if legacy else format_datetime(value)
+    if isinstance(value, Decimal128):
+        return {'$numberDecimal': str(value)} if legacy else str(value)
+    if legacy:
+        # Demais tipos BSON (Binary, Regex, Timestamp...) no formato do json_util
+        return json_util.default(value)
+    return str(value)
+
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """JSON provider do Flask que entende tipos BSON"""
+
+    legacy_bson_format = settings.JSON_LEGACY_BSON_FORMAT
+
+    def _default(self, value: Any) -> Any:
+        return bson_default(value, self.legacy_bson_format)
+
+    def _orjson_options(self) -> int:
+        options = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=self._default, option=self._orjson_options()).decode('utf-8')
+        kwargs.setdefault('default', self._default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if orjson is not None and self.compact is not False:
+            # Codifica direto para bytes, sem str intermediária
+            body = orjson.dumps(obj, default=self._default, option=self._orjson_options())
+            return self._app.response_class(body, mimetype=self.mimetype)
+
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args.setdefault('indent', 2)
+        else:
+            dump_args.setdefault('separators', (',', ':'))
+        return self._app.response_class(f"{self.dumps(obj, **dump_args)}\n", mimetype=self.mimetype)
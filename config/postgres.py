@@ -27,9 +27,14 @@ class PostgresConfig:
                        host=settings.POSTGRES_HOST,
                        database=settings.POSTGRES_DB)
             
+            poolclass = QueuePool
+            if settings.METRICS_ENABLED:
+                from monitoring.metrics import InstrumentedQueuePool
+                poolclass = InstrumentedQueuePool  # Mesmo QueuePool, medindo a espera pelo checkout (/metrics)
+
             self._engine = create_engine(
                 settings.postgres_uri,
-                poolclass=QueuePool,
+                poolclass=poolclass,
                 pool_size=10,
                 max_overflow=20,
                 pool_pre_ping=True,
@@ -80,14 +85,22 @@ class PostgresConfig:
     def health_check(self) -> bool:
         """Verifica se a conexão com o banco está saudável"""
         try:
-            engine = self.get_engine()
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
+            self.ping()
             return True
         except Exception as e:
             logger.error("Health check do PostgreSQL falhou", error=str(e))
             return False
     
+    def ping(self):
+        """
+        SELECT 1 numa conexão do pool (prober de saúde)
+
+        Raises:
+            SQLAlchemyError: PostgreSQL inacessível
+        """
+        with self.get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+
     def get_database_info(self) -> dict:
         """Retorna informações sobre o banco de dados"""
         try:
@@ -192,6 +205,16 @@ class PostgresConfig:
             logger.error("Erro ao executar query", query=query, error=str(e))
             raise
     
+    def reset_after_fork(self):
+        """
+        Troca o pool herdado do processo pai por um novo (gunicorn post_fork)
+
+        dispose(close=False) abandona as conexões do pai sem fechá-las, como recomenda
+        o SQLAlchemy para processos filhos; a engine continua valendo.
+        """
+        if self._engine:
+            self._engine.dispose(close=False)
+
     def close(self):
         """Fecha as conexões com o banco"""
         if self._engine:
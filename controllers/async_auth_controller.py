@@ -0,0 +1,79 @@
+import asyncio
+from quart import request, jsonify, g
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from controllers.auth_controller import AuthController, LOGIN_USER_PROJECTION
+from auth import async_token_required, issue_refresh_token
+from entities.user import login_query, login_user
+from passwords import password_verifier, PasswordPoolFull
+from repositories.async_refresh_token_repository import AsyncRefreshTokenRepository
+from repositories.refresh_token_repository import CONSUMED
+
+class AsyncAuthController:
+    """AuthController do app ASGI: mesmas buscas e resposta, com o bcrypt fora do event loop"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.refresh_tokens = AsyncRefreshTokenRepository(db)
+
+    async def login(self):
+        auth = await request.get_json()
+
+        if not auth or not auth.get('username') or not auth.get('password'):
+            return AuthController._unauthorized()
+
+        username = auth.get('username')
+        password = auth.get('password')
+
+        try:
+            users = await self.db.user.find(login_query(username), limit=2).to_list(2)
+            user = login_user(users, username)
+
+            if not AuthController._has_password(user):
+                return AuthController._unauthorized()
+            # bcrypt roda no pool de processos; o event loop só aguarda o resultado
+            try:
+                future = password_verifier.submit(password, user['password'])
+            except PasswordPoolFull:
+                return AuthController._too_many_logins()
+            try:
+                # O cancelamento do wait_for chega ao Future do pool (sai da fila se ainda não rodou)
+                matches, new_hash = await asyncio.wait_for(asyncio.wrap_future(future), password_verifier.timeout)
+            except asyncio.TimeoutError:
+                return AuthController._password_timeout()
+
+            if matches:
+                if new_hash:
+                    await self.db.user.update_one(*AuthController._rehash_update(user, new_hash))
+                refresh_token, claims = issue_refresh_token(user)
+                await self.refresh_tokens.create(claims)
+                return jsonify(AuthController._login_body(user, refresh_token))
+
+            return AuthController._unauthorized()
+
+        except Exception as e:
+            return jsonify({'message': f'Error: {str(e)}'}), 500
+
+    async def refresh(self):
+        payload, error_response = AuthController._refresh_token_from(await request.get_json(silent=True))
+        if error_response:
+            return error_response
+
+        try:
+            if await self.refresh_tokens.consume(payload) != CONSUMED:
+                return AuthController._revoked_refresh()
+            user = await self.db.user.find_one(AuthController._refresh_query(payload), LOGIN_USER_PROJECTION)
+            if not user:
+                return jsonify({'message': 'User not found'}), 401
+            refresh_token, claims = issue_refresh_token(user, payload['fam'])
+            await self.refresh_tokens.create(claims)
+            return jsonify(AuthController._login_body(user, refresh_token))
+
+        except Exception as e:
+            return jsonify({'message': f'Error: {str(e)}'}), 500
+
+    @async_token_required
+    async def get_current_user(self):
+        if not g.current_user:
+            return jsonify({'message': 'User not found'}), 404
+
+        return jsonify(g.current_user)
@@ -0,0 +1,244 @@
+import asyncio
+from datetime import datetime
+from quart import jsonify, g, request, current_app, Response, stream_with_context
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from use_cases.message_use_case import MessageUseCase
+from use_cases.reply_use_case import AsyncReplyUseCase, bot_response_from, stream_error_response, wants_async_reply
+from repositories.message_storage import create_async_message_repository
+from repositories.async_reply_job_repository import AsyncReplyJobRepository
+from repositories.pagination import parse_page_size
+from auth import async_token_required
+from gateways.async_n8n_gateway import AsyncN8nGateway
+from gateways.response_cache import cache_allowed
+
+# Referências das tarefas de streaming em andamento (o event loop só guarda referências fracas)
+_stream_tasks = set()
+
+class AsyncMessageController:
+    """MessageController do app ASGI: mesmas rotas e respostas, sobre motor e httpx"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, n8n_gateway: AsyncN8nGateway):
+        self.message_use_case = MessageUseCase(create_async_message_repository(db))
+        self.n8n_gateway = n8n_gateway
+        self.reply_use_case = AsyncReplyUseCase(AsyncReplyJobRepository(db), self.message_use_case)
+
+    @async_token_required
+    async def get_messages_by_talk(self):
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            talk_id = request.args.get('talk_id')
+            if not talk_id:
+                return jsonify({'message': 'talk_id is required as query parameter'}), 400
+
+            after = request.args.get('after')
+            before = request.args.get('before')
+            limit = request.args.get('limit')
+
+            next_cursor = None
+            if limit is not None or before is not None:
+                messages, next_cursor = await self.message_use_case.get_messages_page(
+                    talk_id, user_id, parse_page_size(limit), before, after
+                )
+            else:
+                messages = await self.message_use_case.get_messages_by_talk_and_user(talk_id, user_id, after)
+
+            response = jsonify(messages)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response, 200
+        except ValueError:
+            return jsonify({'message': 'Invalid pagination parameters (limit, before, after)'}), 400
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
+
+    @async_token_required
+    async def send_message_to_talk(self):
+        """
+        Envia uma mensagem para uma conversa existente e retorna a resposta do bot
+        """
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            data = await request.get_json()
+            if not data:
+                return jsonify({'message': 'Request body is required'}), 400
+
+            talk_id = data.get('talk_id')
+            content = data.get('content')
+            message_type = data.get('type', 'user')
+
+            if not talk_id:
+                return jsonify({'message': 'talk_id is required'}), 400
+            if not content:
+                return jsonify({'message': 'content is required'}), 400
+
+            if wants_async_reply(data):
+                user_message = await self.message_use_case.create_message(
+                    content=content,
+                    message_type=message_type,
+                    talk_id=talk_id,
+                    user_id=user_id
+                )
+                job = await self.reply_use_case.enqueue_reply(talk_id, user_id, content, user_message['_id'])
+                job_id = str(job['_id'])
+                return jsonify({
+                    'job_id': job_id,
+                    'status': job['status'],
+                    'status_url': f'/api/reply-status?job_id={job_id}',
+                    'messages': [user_message]
+                }), 202
+
+            # Enquanto o n8n responde, a corrotina fica suspensa e o processo atende outras requisições
+            sent_at = datetime.utcnow()
+            n8n_response = await self.n8n_gateway.send_chat_input(content, use_cache=cache_allowed(request.headers))
+
+            user_message, bot_message = await self.message_use_case.append_turn(
+                talk_id=talk_id,
+                user_id=user_id,
+                user_content=content,
+                bot_content=bot_response_from(n8n_response),
+                sent_at=sent_at,
+                user_type=message_type
+            )
+
+            return jsonify({
+                'messages': [user_message, bot_message],
+                'n8n_status': 'success' if n8n_response['success'] else 'error'
+            }), 201
+
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
+
+    @staticmethod
+    def _sse_event(event: str, data) -> str:
+        """Formata um evento Server-Sent Events com payload JSON"""
+        return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+    async def _relay_stream(self, queue: asyncio.Queue, content: str, talk_id: str, user_id: str, use_cache: bool):
+        """
+        Consome o streaming do n8n, repassa os trechos pela fila e persiste a mensagem do bot
+
+        Roda numa tarefa própria: se o cliente desconectar, a resposta ainda é
+        consumida até o fim e salva uma única vez.
+        """
+        try:
+            parts = []
+            final = None
+            try:
+                async for event in self.n8n_gateway.stream_chat_input(content, use_cache=use_cache):
+                    if event['type'] == 'chunk':
+                        parts.append(event['content'])
+                        queue.put_nowait(event)
+                    else:
+                        final = event['response']
+            except Exception as e:
+                final = stream_error_response(e)
+            if final is None:
+                final = stream_error_response()
+
+            bot_response = bot_response_from(final)
+            if not final['success'] and parts:
+                # Falha no meio do streaming: preserva o que já foi exibido ao usuário
+                bot_response = ''.join(parts)
+
+            bot_message = await self.message_use_case.create_message(
+                content=bot_response,
+                message_type='bot',
+                talk_id=talk_id,
+                user_id=user_id
+            )
+            queue.put_nowait({
+                'type': 'done',
+                'message': bot_message,
+                'n8n_status': 'success' if final['success'] else 'error'
+            })
+        except Exception as e:
+            queue.put_nowait({'type': 'error', 'error': e})
+
+    @async_token_required
+    async def stream_message_to_talk(self):
+        """
+        Envia uma mensagem e transmite a resposta do bot via Server-Sent Events
+        """
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            data = await request.get_json(silent=True)
+            if not data:
+                return jsonify({'message': 'Request body is required'}), 400
+
+            talk_id = data.get('talk_id')
+            content = data.get('content')
+
+            if not talk_id:
+                return jsonify({'message': 'talk_id is required'}), 400
+            if not content:
+                return jsonify({'message': 'content is required'}), 400
+
+            user_message = await self.message_use_case.create_message(
+                content=content,
+                message_type='user',
+                talk_id=talk_id,
+                user_id=user_id
+            )
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
+
+        queue = asyncio.Queue()
+        task = asyncio.create_task(self._relay_stream(queue, content, talk_id, user_id, cache_allowed(request.headers)))
+        _stream_tasks.add(task)
+        task.add_done_callback(_stream_tasks.discard)
+
+        @stream_with_context
+        async def generate():
+            yield self._sse_event('user_message', user_message)
+            while True:
+                event = await queue.get()
+                if event['type'] == 'chunk':
+                    yield self._sse_event('chunk', {'content': event['content']})
+                elif event['type'] == 'done':
+                    yield self._sse_event('done', {'message': event['message'], 'n8n_status': event['n8n_status']})
+                    return
+                else:
+                    raise event['error']
+
+        response = Response(
+            generate(),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        # A resposta dura o tempo do n8n (até N8N_TIMEOUT), acima do limite padrão do Quart
+        response.timeout = None
+        return response
+
+    @async_token_required
+    async def get_reply_status(self):
+        """
+        Consulta o andamento de uma resposta assíncrona do bot
+        """
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            job_id = request.args.get('job_id')
+            if not job_id:
+                return jsonify({'message': 'job_id is required as query parameter'}), 400
+
+            job_status = await self.reply_use_case.get_job_status(job_id, user_id)
+            if not job_status:
+                return jsonify({'message': 'Reply job not found or access denied'}), 404
+
+            return jsonify(job_status), 200
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
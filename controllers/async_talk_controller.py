@@ -0,0 +1,192 @@
+from datetime import datetime
+from quart import jsonify, g, request
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from use_cases.talk_use_case import AsyncTalkUseCase
+from use_cases.message_use_case import MessageUseCase, talk_summary_fields
+from use_cases.reply_use_case import AsyncReplyUseCase, bot_response_from, wants_async_reply
+from repositories.async_talk_repository import AsyncTalkRepository
+from repositories.message_storage import create_async_message_repository
+from repositories.async_reply_job_repository import AsyncReplyJobRepository
+from repositories.pagination import parse_page_size
+from auth import async_token_required
+from gateways.async_n8n_gateway import AsyncN8nGateway
+from gateways.response_cache import cache_allowed
+
+class AsyncTalkController:
+    """TalkController do app ASGI: mesmas rotas e respostas, sobre motor e httpx"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, n8n_gateway: AsyncN8nGateway):
+        message_repository = create_async_message_repository(db)
+        self.talk_use_case = AsyncTalkUseCase(AsyncTalkRepository(db), message_repository)
+        self.message_use_case = MessageUseCase(message_repository)
+        self.n8n_gateway = n8n_gateway
+        self.reply_use_case = AsyncReplyUseCase(AsyncReplyJobRepository(db), self.message_use_case)
+
+    @staticmethod
+    def _talk_json(talk) -> dict:
+        return {
+            'talk_id': str(talk['_id']),
+            'name': talk['name'],
+            'created_at': talk['create_at'].isoformat()
+        }
+
+    @async_token_required
+    async def get_talks_by_user(self):
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            limit = request.args.get('limit')
+            before = request.args.get('before')
+            after = request.args.get('after')
+
+            next_cursor = None
+            if limit is not None or before is not None or after is not None:
+                talks, next_cursor = await self.talk_use_case.get_talks_page(
+                    user_id, parse_page_size(limit), before, after
+                )
+            else:
+                talks = await self.talk_use_case.get_talks_by_user_id(user_id)
+
+            response = jsonify(talks)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response, 200
+        except ValueError:
+            return jsonify({'message': 'Invalid pagination parameters (limit, before, after)'}), 400
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
+
+    @async_token_required
+    async def create_talk_with_message(self):
+        """
+        Cria uma nova conversa (talk) e envia a primeira mensagem com resposta do bot
+        """
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            data = await request.get_json()
+            if not data:
+                return jsonify({'message': 'Request body is required'}), 400
+
+            message = data.get('message')
+            if not message:
+                return jsonify({'message': 'Message is required'}), 400
+
+            talk_name = message[:50] + '...' if len(message) > 50 else message
+
+            if wants_async_reply(data):
+                talk = await self.talk_use_case.create_talk(talk_name, user_id)
+                talk_id = str(talk['_id'])
+                user_message = await self.message_use_case.create_message(
+                    content=message,
+                    message_type='user',
+                    talk_id=talk_id,
+                    user_id=user_id
+                )
+                job = await self.reply_use_case.enqueue_reply(talk_id, user_id, message, user_message['_id'])
+                job_id = str(job['_id'])
+                return jsonify({
+                    'talk': self._talk_json(talk),
+                    'job_id': job_id,
+                    'status': job['status'],
+                    'status_url': f'/api/reply-status?job_id={job_id}',
+                    'messages': [user_message]
+                }), 202
+
+            sent_at = datetime.utcnow()
+            n8n_response = await self.n8n_gateway.send_chat_input(message, use_cache=cache_allowed(request.headers))
+            bot_response = bot_response_from(n8n_response)
+
+            replied_at = datetime.utcnow()
+            talk = await self.talk_use_case.create_talk(
+                talk_name, user_id, created_at=sent_at,
+                summary=talk_summary_fields({'content': bot_response, 'create_at': replied_at}, 2)
+            )
+
+            user_message, bot_message = await self.message_use_case.append_turn(
+                talk_id=str(talk['_id']),
+                user_id=user_id,
+                user_content=message,
+                bot_content=bot_response,
+                sent_at=sent_at,
+                replied_at=replied_at,
+                touch_talk=False
+            )
+
+            return jsonify({
+                'talk': self._talk_json(talk),
+                'messages': [user_message, bot_message],
+                'n8n_status': 'success' if n8n_response['success'] else 'error'
+            }), 201
+
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
+
+    @async_token_required
+    async def update_talk(self):
+        """
+        Atualiza o nome de uma conversa (talk)
+        """
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            data = await request.get_json()
+            if not data:
+                return jsonify({'message': 'Request body is required'}), 400
+
+            talk_id = data.get('talk_id')
+            new_name = data.get('name')
+
+            if not talk_id:
+                return jsonify({'message': 'talk_id is required'}), 400
+            if not new_name:
+                return jsonify({'message': 'name is required'}), 400
+
+            updated_talk = await self.talk_use_case.update_talk(talk_id, user_id, new_name)
+
+            if not updated_talk:
+                return jsonify({'message': 'Talk not found or access denied'}), 404
+
+            return jsonify({
+                'message': 'Talk updated successfully',
+                'talk': {
+                    'talk_id': str(updated_talk['_id']),
+                    'name': updated_talk['name'],
+                    'updated_at': updated_talk['update_at'].isoformat()
+                }
+            }), 200
+
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
+
+    @async_token_required
+    async def delete_talk(self):
+        """
+        Deleta logicamente uma conversa (talk) e suas mensagens
+        """
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            talk_id = request.args.get('talk_id')
+            if not talk_id:
+                return jsonify({'message': 'talk_id is required'}), 400
+
+            deleted = await self.talk_use_case.delete_talk(talk_id, user_id)
+
+            if not deleted:
+                return jsonify({'message': 'Talk not found or access denied'}), 404
+
+            return jsonify({
+                'message': 'Talk and its messages deleted successfully'
+            }), 200
+
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
@@ -1,17 +1,23 @@
-import os
-import jwt
 import datetime
-import bcrypt
+import math
+from bson import ObjectId
 from flask import request, jsonify, g
 from config.database import db_config
-from auth import token_required
+from config.settings import settings
+from auth import token_required, issue_access_token, issue_refresh_token, decode_refresh_token
+from entities.user import login_query, login_user
+from passwords import password_verifier, PasswordPoolFull, PasswordVerifyTimeout
+from repositories.refresh_token_repository import RefreshTokenRepository, CONSUMED
+
+# Campos do usuário usados na resposta do login/refresh
+LOGIN_USER_PROJECTION = {'_id': 1, 'name': 1, 'email': 1, 'setor': 1, 'cargo': 1}
 
 class AuthController:
     def login(self):
         auth = request.get_json()
 
         if not auth or not auth.get('username') or not auth.get('password'):
-            return jsonify({'message': 'Could not verify'}), 401, {'WWW-Authenticate': 'Basic realm="Login required!"'}
+            return self._unauthorized()
 
         username = auth.get('username')
         password = auth.get('password')
@@ -20,48 +26,120 @@ class AuthController:
             # Conectar ao MongoDB
             db = db_config.get_database()
             
-            # Buscar usuário por email
-            user = db.user.find_one({
-                "email": f"{username}",
-                "is_deleted": False
-            })
+            # Buscar usuário por email ou nome numa única consulta indexada
+            user = login_user(list(db.user.find(login_query(username), limit=2)), username)
+
+            # Verificar senha usando bcrypt (no pool de processos)
+            if not self._has_password(user):
+                return self._unauthorized()
+            try:
+                matches, new_hash = password_verifier.verify(password, user['password'])
+            except PasswordPoolFull:
+                return self._too_many_logins()
+            except PasswordVerifyTimeout:
+                return self._password_timeout()
+
+            if matches:
+                if new_hash:
+                    db.user.update_one(*self._rehash_update(user, new_hash))
+                refresh_token, claims = issue_refresh_token(user)
+                RefreshTokenRepository(db).create(claims)
+                return jsonify(self._login_body(user, refresh_token))
+
+            return self._unauthorized()
             
-            # Se não encontrar, tentar buscar só pelo nome
-            if not user:
-                user = db.user.find_one({
-                    "name": {"$regex": username, "$options": "i"},
-                    "is_deleted": False
-                })
-                
-            # Se ainda não encontrar, tentar buscar pelo email exato
+        except Exception as e:
+            return jsonify({'message': f'Error: {str(e)}'}), 500
+
+    # As respostas de erro estáticas têm o corpo em dict (sem jsonify): o Flask e o Quart
+    # serializam o dict, então servem também ao AsyncAuthController
+
+    @staticmethod
+    def _unauthorized():
+        return {'message': 'Could not verify'}, 401, {'WWW-Authenticate': 'Basic realm="Login required!"'}
+
+    @staticmethod
+    def _too_many_logins():
+        """Fila do bcrypt cheia: recusa na hora em vez de segurar o worker"""
+        return {'message': 'Too many login attempts, try again shortly'}, 429, {'Retry-After': '1'}
+
+    @staticmethod
+    def _password_timeout():
+        """Pool do bcrypt sem dar conta a tempo: indisponibilidade momentânea, não erro interno"""
+        retry_after = str(math.ceil(password_verifier.timeout))
+        return {'message': 'Login temporarily unavailable, try again shortly'}, 503, {'Retry-After': retry_after}
+
+    @staticmethod
+    def _has_password(user) -> bool:
+        return bool(user and user.get('password'))
+
+    @staticmethod
+    def _rehash_update(user, new_hash: str) -> tuple:
+        """Regrava o hash com o custo atual, só se a senha não mudou desde a leitura"""
+        return (
+            {'_id': user['_id'], 'password': user['password']},
+            {'$set': {'password': new_hash, 'update_at': datetime.datetime.utcnow()}}
+        )
+
+    @staticmethod
+    def _login_body(user, refresh_token: str) -> dict:
+        """Tokens e dados do usuário autenticado"""
+        return {
+            'token': issue_access_token(user),
+            'refresh_token': refresh_token,
+            'expires_in': settings.JWT_ACCESS_TOKEN_EXPIRES,
+            'user': {
+                'id': str(user['_id']),
+                'name': user['name'],
+                'email': user['email'],
+                'setor': user['setor'],
+                'cargo': user['cargo']
+            }
+        }
+
+    @staticmethod
+    def _refresh_token_from(data):
+        """Token de renovação do corpo; (token, None) ou (None, resposta de erro)"""
+        refresh_token = (data or {}).get('refresh_token')
+        if not refresh_token:
+            return None, ({'message': 'refresh_token is required'}, 400)
+        payload, error = decode_refresh_token(refresh_token)
+        if error:
+            return None, ({'message': error}, 401)
+        return payload, None
+
+    @staticmethod
+    def _refresh_query(payload) -> dict:
+        return {'_id': ObjectId(payload['user_id']), 'is_deleted': False}
+
+    @staticmethod
+    def _revoked_refresh():
+        return {'message': 'Refresh token has been revoked!'}, 401
+
+    def refresh(self):
+        """
+        Troca um token de renovação por novos tokens, sem verificar a senha de novo
+
+        O token apresentado é consumido; reapresentá-lo revoga a sessão inteira
+        (RefreshTokenRepository).
+        """
+        payload, error_response = self._refresh_token_from(request.get_json(silent=True))
+        if error_response:
+            return error_response
+
+        try:
+            db = db_config.get_database()
+            tokens = RefreshTokenRepository(db)
+            if tokens.consume(payload) != CONSUMED:
+                return self._revoked_refresh()
+            # Usuário removido depois do login não renova a sessão
+            user = db.user.find_one(self._refresh_query(payload), LOGIN_USER_PROJECTION)
             if not user:
-                user = db.user.find_one({
-                    "email": username,
-                    "is_deleted": False
-                })
-
-            # Verificar senha usando bcrypt
-            if user and user.get('password') and bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-                token = jwt.encode({
-                    'user': user['email'],
-                    'user_id': str(user['_id']),
-                    'name': user['name'],
-                    'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=30)
-                }, os.getenv('JWT_SECRET_KEY', 'your-super-secret-jwt-key'), algorithm='HS256')
-
-                return jsonify({
-                    'token': token,
-                    'user': {
-                        'id': str(user['_id']),
-                        'name': user['name'],
-                        'email': user['email'],
-                        'setor': user['setor'],
-                        'cargo': user['cargo']
-                    }
-                })
-
-            return jsonify({'message': 'Could not verify'}), 401, {'WWW-Authenticate': 'Basic realm="Login required!"'}
-            
+                return jsonify({'message': 'User not found'}), 401
+            refresh_token, claims = issue_refresh_token(user, payload['fam'])
+            tokens.create(claims)
+            return jsonify(self._login_body(user, refresh_token))
+
         except Exception as e:
             return jsonify({'message': f'Error: {str(e)}'}), 500
 
@@ -1,18 +1,22 @@
-from flask import jsonify, g, request
+from flask import jsonify, g, request, current_app, Response, stream_with_context
+from datetime import datetime
 from use_cases.message_use_case import MessageUseCase
-from repositories.message_repository import MessageRepository
+from use_cases.reply_use_case import ReplyUseCase, bot_response_from, stream_error_response, wants_async_reply
+from repositories.message_storage import create_message_repository
+from repositories.reply_job_repository import ReplyJobRepository
+from repositories.pagination import parse_page_size
 from config.database import db_config
 from auth import token_required
-from bson import json_util
-import json
-from gateways.n8n_gateway import N8nGateway
+from gateways.n8n_gateway import get_n8n_gateway
+from gateways.response_cache import cache_allowed
 
 class MessageController:
     def __init__(self):
         db = db_config.get_database()
-        message_repository = MessageRepository(db)
+        message_repository = create_message_repository(db)
         self.message_use_case = MessageUseCase(message_repository)
-        self.n8n_gateway = N8nGateway()
+        self.n8n_gateway = get_n8n_gateway()
+        self.reply_use_case = ReplyUseCase(ReplyJobRepository(db), self.message_use_case)
 
     @token_required
     def get_messages_by_talk(self):
@@ -27,13 +31,29 @@ class MessageController:
             if not talk_id:
                 return jsonify({'message': 'talk_id is required as query parameter'}), 400
 
-            # Buscar mensagens
-            messages = self.message_use_case.get_messages_by_talk_and_user(talk_id, user_id)
-            
-            # Convert ObjectId to string for JSON serialization
-            messages_json = json.loads(json_util.dumps(messages))
+            # Cursores opcionais: after (cursor, _id de mensagem ou data ISO 8601) e before
+            after = request.args.get('after')
+            before = request.args.get('before')
+            limit = request.args.get('limit')
 
-            return jsonify(messages_json), 200
+            next_cursor = None
+            if limit is not None or before is not None:
+                # Paginação: página mais recente por padrão; X-Next-Cursor vai em 'before'
+                # (ou em 'after', se a página foi pedida com after)
+                messages, next_cursor = self.message_use_case.get_messages_page(
+                    talk_id, user_id, parse_page_size(limit), before, after
+                )
+            else:
+                # Buscar mensagens
+                messages = self.message_use_case.get_messages_by_talk_and_user(talk_id, user_id, after)
+            
+            # ObjectId e datas são convertidos pelo JSON provider da aplicação
+            response = jsonify(messages)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response, 200
+        except ValueError:
+            return jsonify({'message': 'Invalid pagination parameters (limit, before, after)'}), 400
         except Exception as e:
             return jsonify({'message': f'An error occurred: {str(e)}'}), 500
 
@@ -62,18 +82,28 @@ class MessageController:
             if not content:
                 return jsonify({'message': 'content is required'}), 400
 
-            # 1. Criar mensagem do usuário
-            user_message = self.message_use_case.create_message(
-                content=content,
-                message_type=message_type,
-                talk_id=talk_id,
-                user_id=user_id
-            )
+            # Modo assíncrono: a resposta do bot fica a cargo do worker (python -m workers.reply)
+            if wants_async_reply(data):
+                user_message = self.message_use_case.create_message(
+                    content=content,
+                    message_type=message_type,
+                    talk_id=talk_id,
+                    user_id=user_id
+                )
+                job = self.reply_use_case.enqueue_reply(talk_id, user_id, content, user_message['_id'])
+                job_id = str(job['_id'])
+                return jsonify({
+                    'job_id': job_id,
+                    'status': job['status'],
+                    'status_url': f'/api/reply-status?job_id={job_id}',
+                    'messages': [user_message]
+                }), 202
 
-            # 2. Enviar para o n8n e obter resposta
-            n8n_response = self.n8n_gateway.send_chat_input(content)
+            # 1. Enviar para o n8n e obter resposta
+            sent_at = datetime.utcnow()
+            n8n_response = self.n8n_gateway.send_chat_input(content, use_cache=cache_allowed(request.headers))
             
-            # 3. Processar resposta do n8n (usando o novo formato padronizado)
+            # 2. Processar resposta do n8n (usando o novo formato padronizado)
             if n8n_response['success']:
                 # Usar diretamente o campo 'message' padronizado
                 bot_response = n8n_response.get('message', 'Resposta não disponível')
@@ -81,19 +111,21 @@ class MessageController:
                 # Se falhar, usar mensagem de erro amigável do campo 'message'
                 bot_response = n8n_response.get('message', 'Desculpe, não consegui processar sua mensagem no momento.')
             
-            # 4. Criar mensagem do bot com a resposta
-            bot_message = self.message_use_case.create_message(
-                content=bot_response,
-                message_type='bot',
+            # 3. Gravar mensagem do usuário e resposta do bot numa única escrita
+            user_message, bot_message = self.message_use_case.append_turn(
                 talk_id=talk_id,
-                user_id=user_id
+                user_id=user_id,
+                user_content=content,
+                bot_content=bot_response,
+                sent_at=sent_at,
+                user_type=message_type
             )
 
-            # 5. Buscar todas as mensagens da conversa para retornar
-            all_messages = self.message_use_case.get_messages_by_talk_and_user(talk_id, user_id)
-            messages_json = json.loads(json_util.dumps(all_messages))
+            # 4. Retornar só as mensagens criadas neste turno; o histórico anterior o cliente
+            #    já tem (ou busca com GET /api/messages-by-talk?after=...)
+            messages_json = [user_message, bot_message]
 
-            # 6. Retornar resposta com as mensagens
+            # 5. Retornar resposta com as mensagens
             response = {
                 'messages': messages_json,
                 'n8n_status': 'success' if n8n_response['success'] else 'error'
@@ -103,3 +135,131 @@ class MessageController:
 
         except Exception as e:
             return jsonify({'message': f'An error occurred: {str(e)}'}), 500
+
+    @staticmethod
+    def _sse_event(event: str, data) -> str:
+        """Formata um evento Server-Sent Events com payload JSON"""
+        return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+    @token_required
+    def stream_message_to_talk(self):
+        """
+        Envia uma mensagem e transmite a resposta do bot via Server-Sent Events
+
+        Eventos: user_message (mensagem salva do usuário), chunk (trecho da resposta,
+        repassado assim que chega do n8n) e done (mensagem do bot persistida).
+        talk_id e content vêm no corpo JSON (POST): o texto do chat não passa pela
+        query string, que fica nos logs de acesso e de proxies.
+        """
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            data = request.get_json(silent=True)
+            if not data:
+                return jsonify({'message': 'Request body is required'}), 400
+
+            talk_id = data.get('talk_id')
+            content = data.get('content')
+
+            if not talk_id:
+                return jsonify({'message': 'talk_id is required'}), 400
+            if not content:
+                return jsonify({'message': 'content is required'}), 400
+
+            user_message = self.message_use_case.create_message(
+                content=content,
+                message_type='user',
+                talk_id=talk_id,
+                user_id=user_id
+            )
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
+
+        use_cache = cache_allowed(request.headers)
+
+        def generate():
+            parts = []
+            final = None
+            stream = self.n8n_gateway.stream_chat_input(content, use_cache=use_cache)
+            try:
+                # Primeiro evento sai antes da chamada ao n8n: libera os headers imediatamente
+                yield self._sse_event('user_message', user_message)
+
+                try:
+                    for event in stream:
+                        if event['type'] == 'chunk':
+                            parts.append(event['content'])
+                            yield self._sse_event('chunk', {'content': event['content']})
+                        else:
+                            final = event['response']
+                except Exception as e:
+                    # Gateway levantou em vez de emitir done: vira uma resposta de erro
+                    final = stream_error_response(e)
+            finally:
+                # Se o cliente desconectar no meio, termina de consumir o n8n para
+                # que a resposta completa ainda seja salva uma única vez
+                if final is None:
+                    final = self._finish_stream(stream, parts)
+
+                bot_response = bot_response_from(final)
+                if not final['success'] and parts:
+                    # Falha no meio do streaming: preserva o que já foi exibido ao usuário
+                    bot_response = ''.join(parts)
+
+                bot_message = self.message_use_case.create_message(
+                    content=bot_response,
+                    message_type='bot',
+                    talk_id=talk_id,
+                    user_id=user_id
+                )
+
+            yield self._sse_event('done', {
+                'message': bot_message,
+                'n8n_status': 'success' if final['success'] else 'error'
+            })
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # Desativa o buffering do nginx
+            }
+        )
+
+    @staticmethod
+    def _finish_stream(stream, parts: list) -> dict:
+        """Consome o resto do streaming; sem o evento done, devolve uma resposta de erro"""
+        try:
+            for event in stream:
+                if event['type'] == 'chunk':
+                    parts.append(event['content'])
+                else:
+                    return event['response']
+        except Exception as e:
+            return stream_error_response(e)
+        return stream_error_response()
+
+    @token_required
+    def get_reply_status(self):
+        """
+        Consulta o andamento de uma resposta assíncrona do bot
+        """
+        try:
+            user_id = g.current_user.get('user_id')
+            if not user_id:
+                return jsonify({'message': 'User ID not found in token'}), 400
+
+            job_id = request.args.get('job_id')
+            if not job_id:
+                return jsonify({'message': 'job_id is required as query parameter'}), 400
+
+            job_status = self.reply_use_case.get_job_status(job_id, user_id)
+            if not job_status:
+                return jsonify({'message': 'Reply job not found or access denied'}), 404
+
+            return jsonify(job_status), 200
+        except Exception as e:
+            return jsonify({'message': f'An error occurred: {str(e)}'}), 500
@@ -1,22 +1,26 @@
 from flask import jsonify, g, request
+from datetime import datetime
 from use_cases.talk_use_case import TalkUseCase
-from use_cases.message_use_case import MessageUseCase
+from use_cases.message_use_case import MessageUseCase, talk_summary_fields
+from use_cases.reply_use_case import ReplyUseCase, wants_async_reply
 from repositories.talk_repository import TalkRepository
-from repositories.message_repository import MessageRepository
+from repositories.message_storage import create_message_repository
+from repositories.reply_job_repository import ReplyJobRepository
+from repositories.pagination import parse_page_size
 from config.database import db_config
 from auth import token_required
-from bson import json_util
-import json
-from gateways.n8n_gateway import N8nGateway
+from gateways.n8n_gateway import get_n8n_gateway
+from gateways.response_cache import cache_allowed
 
 class TalkController:
     def __init__(self):
         db = db_config.get_database()
         talk_repository = TalkRepository(db)
-        message_repository = MessageRepository(db)
-        self.talk_use_case = TalkUseCase(talk_repository)
+        message_repository = create_message_repository(db)
+        self.talk_use_case = TalkUseCase(talk_repository, message_repository)
         self.message_use_case = MessageUseCase(message_repository)
-        self.n8n_gateway = N8nGateway()
+        self.n8n_gateway = get_n8n_gateway()
+        self.reply_use_case = ReplyUseCase(ReplyJobRepository(db), self.message_use_case)
 
     @token_required
     def get_talks_by_user(self):
@@ -25,12 +29,27 @@ class TalkController:
             if not user_id:
                 return jsonify({'message': 'User ID not found in token'}), 400
 
-            talks = self.talk_use_case.get_talks_by_user_id(user_id)
+            limit = request.args.get('limit')
+            before = request.args.get('before')
+            after = request.args.get('after')
+
+            next_cursor = None
+            if limit is not None or before is not None or after is not None:
+                # Paginação: mais novas primeiro; X-Next-Cursor vai em 'after'
+                # (ou em 'before', se a página foi pedida com before)
+                talks, next_cursor = self.talk_use_case.get_talks_page(
+                    user_id, parse_page_size(limit), before, after
+                )
+            else:
+                talks = self.talk_use_case.get_talks_by_user_id(user_id)
             
-            # Convert ObjectId to string for JSON serialization
-            talks_json = json.loads(json_util.dumps(talks))
-
-            return jsonify(talks_json), 200
+            # ObjectId e datas são convertidos pelo JSON provider da aplicação
+            response = jsonify(talks)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response, 200
+        except ValueError:
+            return jsonify({'message': 'Invalid pagination parameters (limit, before, after)'}), 400
         except Exception as e:
             return jsonify({'message': f'An error occurred: {str(e)}'}), 500
 
@@ -57,22 +76,35 @@ class TalkController:
             # Gerar nome da conversa baseado na primeira mensagem
             talk_name = message[:50] + '...' if len(message) > 50 else message
 
-            # 1. Criar a conversa (talk)
-            talk = self.talk_use_case.create_talk(talk_name, user_id)
-            talk_id = str(talk['_id'])
-
-            # 2. Criar mensagem do usuário
-            user_message = self.message_use_case.create_message(
-                content=message,
-                message_type='user',
-                talk_id=talk_id,
-                user_id=user_id
-            )
-
-            # 3. Enviar para o n8n e obter resposta
-            n8n_response = self.n8n_gateway.send_chat_input(message)
+            # Modo assíncrono: a resposta do bot fica a cargo do worker (python -m workers.reply)
+            if wants_async_reply(data):
+                talk = self.talk_use_case.create_talk(talk_name, user_id)
+                talk_id = str(talk['_id'])
+                user_message = self.message_use_case.create_message(
+                    content=message,
+                    message_type='user',
+                    talk_id=talk_id,
+                    user_id=user_id
+                )
+                job = self.reply_use_case.enqueue_reply(talk_id, user_id, message, user_message['_id'])
+                job_id = str(job['_id'])
+                return jsonify({
+                    'talk': {
+                        'talk_id': talk_id,
+                        'name': talk_name,
+                        'created_at': talk['create_at'].isoformat()
+                    },
+                    'job_id': job_id,
+                    'status': job['status'],
+                    'status_url': f'/api/reply-status?job_id={job_id}',
+                    'messages': [user_message]
+                }), 202
+
+            # 1. Enviar para o n8n e obter resposta
+            sent_at = datetime.utcnow()
+            n8n_response = self.n8n_gateway.send_chat_input(message, use_cache=cache_allowed(request.headers))
             
-            # 4. Processar resposta do n8n (usando o novo formato padronizado)
+            # 2. Processar resposta do n8n (usando o novo formato padronizado)
             if n8n_response['success']:
                 # Usar diretamente o campo 'message' padronizado
                 bot_response = n8n_response.get('message', 'Resposta não disponível')
@@ -80,19 +112,29 @@ class TalkController:
                 # Se falhar, usar mensagem de erro amigável do campo 'message'
                 bot_response = n8n_response.get('message', 'Desculpe, não consegui processar sua mensagem no momento.')
             
-            # 5. Criar mensagem do bot com a resposta
-            bot_message = self.message_use_case.create_message(
-                content=bot_response,
-                message_type='bot',
+            # 3. Criar a conversa (talk) já com o resumo do primeiro turno
+            replied_at = datetime.utcnow()
+            talk = self.talk_use_case.create_talk(
+                talk_name, user_id, created_at=sent_at,
+                summary=talk_summary_fields({'content': bot_response, 'create_at': replied_at}, 2)
+            )
+            talk_id = str(talk['_id'])
+
+            # 4. Gravar mensagem do usuário e resposta do bot numa única escrita
+            user_message, bot_message = self.message_use_case.append_turn(
                 talk_id=talk_id,
-                user_id=user_id
+                user_id=user_id,
+                user_content=message,
+                bot_content=bot_response,
+                sent_at=sent_at,
+                replied_at=replied_at,
+                touch_talk=False
             )
 
-            # 6. Buscar todas as mensagens da conversa para retornar
-            all_messages = self.message_use_case.get_messages_by_talk_and_user(talk_id, user_id)
-            messages_json = json.loads(json_util.dumps(all_messages))
+            # 5. Conversa nova: as mensagens deste turno são todo o histórico
+            messages_json = [user_message, bot_message]
 
-            # 7. Retornar resposta com dados da conversa e mensagens
+            # 6. Retornar resposta com dados da conversa e mensagens
             response = {
                 'talk': {
                     'talk_id': talk_id,
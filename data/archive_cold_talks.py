@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Arquiva as mensagens das conversas frias em message_archive
+
+Conversas sem atividade há MESSAGE_ARCHIVE_AFTER_DAYS dias (last_activity_at) têm
+as mensagens movidas da coleção quente (message ou message_bucket, conforme
+MESSAGE_STORAGE) para um único documento comprimido por conversa. A conversa
+continua na lista lateral (o resumo fica no documento talk) e é reidratada na
+primeira leitura do histórico.
+
+Antes e depois, o comando mostra o tamanho dos dados e dos índices das coleções
+(collStats) e o uso do cache do WiredTiger (serverStatus): o que sai da coleção
+quente deixa de disputar o cache com as conversas em uso.
+
+Exige MESSAGE_ARCHIVE_ENABLED=true na API e neste comando (sem ele a API não
+reidrata as conversas arquivadas). Pode rodar periodicamente (cron).
+
+Uso:
+    python data/archive_cold_talks.py                 # arquiva e mostra o relatório
+    python data/archive_cold_talks.py --dry-run       # só conta as conversas e mensagens
+    python data/archive_cold_talks.py --days 60       # inatividade mínima, em dias
+    python data/archive_cold_talks.py --limit 1000    # máximo de conversas nesta rodada
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+# Permite rodar como script a partir da raiz ou de data/
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from config.settings import settings
+from data.indexes import INDEXES, apply_indexes
+from repositories.message_archive import ArchiveTooLarge
+from repositories.message_storage import create_message_repository
+from repositories.talk_repository import TalkRepository
+
+REPORT_COLLECTIONS = ('message', 'message_bucket', 'message_archive', 'talk')
+# Coleções cujos dados e índices disputam o cache com as conversas em uso
+HOT_COLLECTIONS = ('message', 'message_bucket', 'talk')
+
+
+def storage_report(db: Database) -> Dict[str, Any]:
+    """
+    Tamanho das coleções e uso do cache do WiredTiger
+
+    Returns:
+        {'collections': {nome: {count, size, storage_size, index_size, cached}},
+         'hot_bytes': dados + índices das coleções quentes, 'cache': {used, max} ou None}
+    """
+    collections = {}
+    for name in REPORT_COLLECTIONS:
+        try:
+            stats = db.command('collStats', name)
+        except OperationFailure:
+            continue  # Coleção ainda não existe
+        collections[name] = {
+            'count': stats.get('count', 0),
+            'size': stats.get('size', 0),
+            'storage_size': stats.get('storageSize', 0),
+            'index_size': stats.get('totalIndexSize', 0),
+            'cached': stats.get('wiredTiger', {}).get('cache', {}).get('bytes currently in the cache'),
+        }
+
+    hot_bytes = sum(collections[name]['size'] + collections[name]['index_size']
+                    for name in HOT_COLLECTIONS if name in collections)
+
+    cache = None
+    try:
+        wired_tiger = db.client.admin.command('serverStatus').get('wiredTiger', {}).get('cache', {})
+        if wired_tiger:
+            cache = {'used': wired_tiger.get('bytes currently in the cache'),
+                     'max': wired_tiger.get('maximum bytes configured')}
+    except OperationFailure:
+        pass  # Usuário sem permissão para serverStatus
+
+    return {'collections': collections, 'hot_bytes': hot_bytes, 'cache': cache}
+
+
+def archive_cold_talks(db: Database, days: Optional[int] = None, limit: int = 1000,
+                       dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Arquiva as conversas sem atividade há `days` dias
+
+    Returns:
+        {'talks', 'messages', 'raw_bytes', 'compressed_bytes', 'empty', 'too_large',
+         'before', 'after'} (after é None no dry-run)
+    """
+    if not settings.MESSAGE_ARCHIVE_ENABLED and not dry_run:
+        raise RuntimeError("MESSAGE_ARCHIVE_ENABLED=false: a API não reidrataria as conversas arquivadas")
+
+    days = settings.MESSAGE_ARCHIVE_AFTER_DAYS if days is None else days
+    inactive_before = datetime.utcnow() - timedelta(days=days)
+    talk_repository = TalkRepository(db)
+    message_repository = create_message_repository(db)
+
+    talk_indexes = [spec for spec in INDEXES if spec.name == 'talk_archive_candidates']
+    apply_indexes(db, drop_obsolete=False, dry_run=dry_run, specs=talk_indexes)
+
+    report = {'talks': 0, 'messages': 0, 'raw_bytes': 0, 'compressed_bytes': 0,
+              'empty': 0, 'too_large': [], 'before': storage_report(db), 'after': None}
+
+    for talk in talk_repository.iter_archive_candidates(inactive_before, limit):
+        if dry_run:
+            report['talks'] += 1
+            report['messages'] += talk.get('message_count', 0)
+            continue
+        try:
+            archive = message_repository.archive_talk(str(talk['_id']), str(talk['user_id']))
+        except ArchiveTooLarge:
+            report['too_large'].append(talk['_id'])
+            continue
+        if archive is None:
+            report['empty'] += 1
+            continue
+        report['talks'] += 1
+        report['messages'] += archive['count']
+        report['raw_bytes'] += archive['raw_size']
+        report['compressed_bytes'] += archive['size']
+
+    if not dry_run:
+        report['after'] = storage_report(db)
+    return report
+
+
+def _mb(value: Optional[int]) -> str:
+    return '-' if value is None else f"{value / 1024 / 1024:.1f} MB"
+
+
+def print_storage(title: str, storage: Dict[str, Any]):
+    print(f"\n📊 {title}")
+    for name, stats in storage['collections'].items():
+        print(f"   {name:16} {stats['count']:>10} docs  dados {_mb(stats['size']):>10}  "
+              f"disco {_mb(stats['storage_size']):>10}  índices {_mb(stats['index_size']):>10}  "
+              f"no cache {_mb(stats['cached']):>10}")
+    print(f"   Coleções quentes (dados + índices): {_mb(storage['hot_bytes'])}")
+    if storage['cache']:
+        print(f"   Cache do WiredTiger: {_mb(storage['cache']['used'])} de {_mb(storage['cache']['max'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquiva as mensagens das conversas frias")
+    parser.add_argument('--days', type=int, default=None,
+                        help="Dias sem atividade (padrão: MESSAGE_ARCHIVE_AFTER_DAYS)")
+    parser.add_argument('--limit', type=int, default=1000, help="Máximo de conversas nesta rodada")
+    parser.add_argument('--dry-run', action='store_true', help="Só conta as conversas e mensagens")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(project_root / 'env.example')
+    from config.database import db_config
+
+    try:
+        db = db_config.connect()
+        report = archive_cold_talks(db, days=args.days, limit=args.limit, dry_run=args.dry_run)
+        print_storage("Antes", report['before'])
+        if args.dry_run:
+            print(f"\n✅ (dry-run) {report['talks']} conversas com {report['messages']} mensagens seriam arquivadas")
+            return 0
+
+        print_storage("Depois", report['after'])
+        ratio = report['raw_bytes'] / report['compressed_bytes'] if report['compressed_bytes'] else 0
+        print(f"\n✅ {report['talks']} conversas arquivadas ({report['messages']} mensagens, "
+              f"{_mb(report['raw_bytes'])} -> {_mb(report['compressed_bytes'])}, {ratio:.1f}x)")
+        freed = report['before']['hot_bytes'] - report['after']['hot_bytes']
+        print(f"ℹ️  Coleções quentes: {_mb(freed)} a menos (o espaço em disco é reaproveitado pelo WiredTiger)")
+        if report['empty']:
+            print(f"ℹ️  {report['empty']} conversas sem mensagens")
+        for talk_id in report['too_large']:
+            print(f"⚠️  Conversa {talk_id} grande demais para um documento de arquivo; continua na coleção quente")
+        return 0
+
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return 1
+
+    finally:
+        db_config.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Preenche o resumo denormalizado das conversas (talk)
+
+A lista lateral lê last_message_preview, message_count e last_activity_at direto
+do documento da conversa; create_message e append_turn mantêm esses campos a cada
+escrita. Este comando calcula o resumo das conversas já existentes a partir da
+coleção message (ou message_bucket, com MESSAGE_STORAGE=bucket), com uma única
+agregação, e grava em lotes (bulk_write).
+
+Conversas com mensagens são recalculadas; conversas sem mensagens e ainda sem
+resumo recebem message_count 0 e last_activity_at da última atualização.
+
+Uso:
+    python data/backfill_talk_summaries.py                   # preenche os resumos
+    python data/backfill_talk_summaries.py --dry-run         # só conta o que mudaria
+    python data/backfill_talk_summaries.py --batch-size 500  # tamanho do lote de escrita
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, Any, Iterator, List
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+# Permite rodar como script a partir da raiz ou de data/
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from config.settings import settings
+from use_cases.message_use_case import talk_summary_fields
+
+# Última mensagem e total por conversa; o $sort segue a ordem do índice message_history
+SUMMARY_PIPELINE: List[Dict[str, Any]] = [
+    {'$match': {'is_deleted': False}},
+    {'$sort': {'talk_id': 1, 'create_at': 1, '_id': 1}},
+    {'$group': {
+        '_id': '$talk_id',
+        'message_count': {'$sum': 1},
+        'content': {'$last': '$content'},
+        'create_at': {'$last': '$create_at'},
+    }},
+]
+
+# Mesmo resumo com MESSAGE_STORAGE=bucket: desmonta os buckets vivos em mensagens
+BUCKET_SUMMARY_PIPELINE: List[Dict[str, Any]] = [
+    {'$match': {'is_deleted': False}},
+    {'$unwind': '$messages'},
+    {'$match': {'messages.is_deleted': False}},
+    {'$sort': {'talk_id': 1, 'messages.create_at': 1, 'messages._id': 1}},
+    {'$group': {
+        '_id': '$talk_id',
+        'message_count': {'$sum': 1},
+        'content': {'$last': '$messages.content'},
+        'create_at': {'$last': '$messages.create_at'},
+    }},
+]
+
+
+def summary_updates(db: Database) -> Iterator[UpdateOne]:
+    """Uma atualização por conversa com mensagens, a partir da agregação"""
+    if settings.MESSAGE_STORAGE == 'bucket':
+        rows = db.message_bucket.aggregate(BUCKET_SUMMARY_PIPELINE, allowDiskUse=True)
+    else:
+        rows = db.message.aggregate(SUMMARY_PIPELINE, allowDiskUse=True)
+    for row in rows:
+        yield UpdateOne({'_id': row['_id']}, {'$set': talk_summary_fields(row, row['message_count'])})
+
+
+def backfill_talk_summaries(db: Database, batch_size: int = 1000, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Calcula e grava o resumo de todas as conversas
+
+    Returns:
+        {'updated': conversas recalculadas, 'empty': conversas sem mensagens preenchidas}
+    """
+    updated = 0
+    batch: List[UpdateOne] = []
+    for update in summary_updates(db):
+        batch.append(update)
+        if len(batch) >= batch_size:
+            updated += _flush(db, batch, dry_run)
+            batch = []
+    if batch:
+        updated += _flush(db, batch, dry_run)
+
+    missing = {'message_count': {'$exists': False}}
+    if dry_run:
+        empty = db.talk.count_documents(missing)
+    else:
+        # Pipeline de atualização: last_activity_at vem do próprio documento
+        empty = db.talk.update_many(missing, [{'$set': {
+            'last_message_preview': None,
+            'message_count': 0,
+            'last_activity_at': {'$ifNull': ['$update_at', '$create_at']},
+        }}]).modified_count
+
+    return {'updated': updated, 'empty': empty}
+
+
+def _flush(db: Database, batch: List[UpdateOne], dry_run: bool) -> int:
+    if dry_run:
+        return len(batch)
+    return db.talk.bulk_write(batch, ordered=False).matched_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preenche o resumo denormalizado das conversas")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Atualizações por bulk_write")
+    parser.add_argument('--dry-run', action='store_true', help="Só conta o que mudaria")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(project_root / 'env.example')
+    from config.database import db_config
+
+    try:
+        db = db_config.connect()
+        report = backfill_talk_summaries(db, batch_size=args.batch_size, dry_run=args.dry_run)
+        prefix = "(dry-run) " if args.dry_run else ""
+        print(f"✅ {prefix}{report['updated']} conversas com resumo recalculado")
+        print(f"ℹ️  {prefix}{report['empty']} conversas sem mensagens preenchidas")
+        return 0
+
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return 1
+
+    finally:
+        db_config.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Gerenciamento de índices do MongoDB
+
+Os índices são declarados a partir das consultas dos repositórios (igualdade,
+depois ordenação, depois faixa) e aplicados de forma idempotente: índices iguais
+ficam como estão, índices com opções diferentes são recriados e índices que não
+estão na declaração são removidos.
+
+A verificação roda explain() no formato de cada consulta dos repositórios e
+falha se o plano vencedor tiver COLLSCAN ou SORT em memória.
+
+Uso:
+    python data/indexes.py                  # aplica a declaração
+    python data/indexes.py --dry-run        # só mostra o que mudaria
+    python data/indexes.py --keep-obsolete  # não remove índices fora da declaração
+    python data/indexes.py --verify         # aplica e verifica os planos das consultas
+
+Em testes: apply_indexes(db) e assert not verify_query_plans(db).
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.database import Database
+
+# Permite rodar como script a partir da raiz ou de data/
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from config.settings import settings
+from entities.user import login_query
+from repositories.bucket_message_repository import BucketMessageRepository, BUCKET_READ_PROJECTION
+from repositories.message_repository import MessageRepository, MESSAGE_HISTORY_PROJECTION
+from repositories.pagination import keyset_filter
+from repositories.reply_job_repository import ReplyJobRepository
+from repositories.talk_repository import TalkRepository, TALK_SIDEBAR_PROJECTION
+
+NOT_DELETED = {'is_deleted': False}
+TOMBSTONE_TTL_SECONDS = settings.TOMBSTONE_RETENTION_DAYS * 24 * 60 * 60
+
+
+@dataclass
+class IndexSpec:
+    collection: str
+    name: str
+    keys: List[Tuple[str, int]]
+    unique: bool = False
+    partial_filter: Optional[Dict[str, Any]] = None
+    expire_after_seconds: Optional[int] = None
+
+    def options(self) -> Dict[str, Any]:
+        """Opções no formato do create_index / index_information"""
+        options = {}
+        if self.unique:
+            options['unique'] = True
+        if self.partial_filter is not None:
+            options['partialFilterExpression'] = self.partial_filter
+        if self.expire_after_seconds is not None:
+            options['expireAfterSeconds'] = self.expire_after_seconds
+        return options
+
+    def matches(self, info: Dict[str, Any]) -> bool:
+        """Compara com uma entrada de collection.index_information()"""
+        keys = [(k, int(v) if isinstance(v, (int, float)) else v) for k, v in info['key']]
+        existing = {
+            option: info[option]
+            for option in ('unique', 'partialFilterExpression', 'expireAfterSeconds')
+            if option in info and info[option] is not False
+        }
+        if 'partialFilterExpression' in existing:
+            existing['partialFilterExpression'] = dict(existing['partialFilterExpression'])
+        return keys == list(self.keys) and existing == self.options()
+
+
+# Índices declarados, um grupo por coleção. Documentos deletados logicamente não
+# aparecem em nenhuma consulta de leitura, então ficam fora dos índices parciais.
+INDEXES: List[IndexSpec] = [
+    # email e cpf são únicos
+    IndexSpec('user', 'email_1', [('email', 1)], unique=True),
+    IndexSpec('user', 'cpf_1', [('cpf', 1)], unique=True),
+
+    # Login (entities.user.login_query): um índice único por ramo do $or, sobre as
+    # chaves normalizadas (data/migrate_user_login_keys.py preenche usuários antigos)
+    IndexSpec('user', 'user_login_email', [('email_normalized', 1)], unique=True,
+              partial_filter={'is_deleted': False, 'email_normalized': {'$exists': True}}),
+    IndexSpec('user', 'user_login_name', [('name_normalized', 1)], unique=True,
+              partial_filter={'is_deleted': False, 'name_normalized': {'$exists': True}}),
+
+    # Lista lateral (TalkRepository.get_talks_by_user_id / get_talks_page): igualdade em
+    # (user_id, is_deleted), faixa e ordenação em (last_activity_at, _id). O resumo
+    # projetado (prévia da última mensagem) vem do documento, então a consulta faz FETCH
+    # apenas dos documentos da página
+    IndexSpec('talk', 'talk_sidebar',
+              [('user_id', 1), ('is_deleted', 1), ('last_activity_at', -1), ('_id', -1)],
+              partial_filter=NOT_DELETED),
+
+    # Histórico e paginação (MessageRepository.get_messages_*) e soft delete por conversa:
+    # igualdade em (talk_id, user_id), faixa e ordenação em (create_at, _id)
+    IndexSpec('message', 'message_history',
+              [('talk_id', 1), ('user_id', 1), ('create_at', 1), ('_id', 1)],
+              partial_filter=NOT_DELETED),
+
+    # Mensagens em buckets (MESSAGE_STORAGE=bucket): histórico e páginas por (talk_id, user_id)
+    # ordenados por last_at; anexação casa o bucket aberto pelo mesmo prefixo; busca por _id
+    # de mensagem (cursor, get_by_id, update/delete) pelo índice multikey
+    IndexSpec('message_bucket', 'message_bucket_history',
+              [('talk_id', 1), ('user_id', 1), ('last_at', 1)],
+              partial_filter=NOT_DELETED),
+    IndexSpec('message_bucket', 'message_bucket_message_id', [('messages._id', 1)]),
+
+    # Fila de respostas (ReplyJobRepository.claim_next): um índice por busca
+    IndexSpec('reply_jobs', 'reply_jobs_pending', [('status', 1), ('available_at', 1)]),
+    IndexSpec('reply_jobs', 'reply_jobs_expired', [('status', 1), ('locked_until', 1)]),
+
+    # Exclusão de conversas: cascatas interrompidas (TalkUseCase.resume_pending_cascades) e
+    # expurgo dos tombstones pelo TTL após TOMBSTONE_RETENTION_DAYS. A conversa só expira
+    # depois da cascata concluída (cascade_pending: False), para não deixar mensagens órfãs
+    IndexSpec('talk', 'talk_cascade_pending', [('cascade_pending', 1), ('deleted_at', 1)],
+              partial_filter={'cascade_pending': True}),
+    IndexSpec('talk', 'tombstone_ttl', [('deleted_at', 1)], expire_after_seconds=TOMBSTONE_TTL_SECONDS,
+              partial_filter={'is_deleted': True, 'cascade_pending': False}),
+    IndexSpec('message', 'tombstone_ttl', [('deleted_at', 1)], expire_after_seconds=TOMBSTONE_TTL_SECONDS,
+              partial_filter={'is_deleted': True}),
+    IndexSpec('message_bucket', 'tombstone_ttl', [('deleted_at', 1)], expire_after_seconds=TOMBSTONE_TTL_SECONDS,
+              partial_filter={'is_deleted': True}),
+
+    # Arquivamento das conversas frias (TalkRepository.iter_archive_candidates): igualdade em
+    # archived_at null (conversa não arquivada), faixa e ordenação em last_activity_at
+    IndexSpec('talk', 'talk_archive_candidates', [('archived_at', 1), ('last_activity_at', 1)],
+              partial_filter=NOT_DELETED),
+
+    # Tokens de renovação (RefreshTokenRepository): revogação da família e expurgo dos vencidos
+    IndexSpec('refresh_tokens', 'refresh_tokens_family', [('family', 1)]),
+    IndexSpec('refresh_tokens', 'expires_at_ttl', [('expires_at', 1)], expire_after_seconds=0),
+
+    # Cache de respostas e leases de coalescência do n8n: o MongoDB remove entradas vencidas
+    IndexSpec('n8n_response_cache', 'expires_at_ttl', [('expires_at', 1)], expire_after_seconds=0),
+    IndexSpec('n8n_inflight', 'expires_at_ttl', [('expires_at', 1)], expire_after_seconds=0),
+]
+
+
+def apply_indexes(db: Database, drop_obsolete: bool = True, dry_run: bool = False,
+                  specs: Optional[List[IndexSpec]] = None) -> Dict[str, List[str]]:
+    """
+    Aplica a declaração de índices
+
+    Índices com opções diferentes da declaração são removidos antes de recriados
+    (o MongoDB não aceita duas definições para o mesmo padrão de chaves).
+
+    Returns:
+        {'created': [...], 'dropped': [...], 'unchanged': [...]} com 'coleção.índice'
+    """
+    specs = INDEXES if specs is None else specs
+    report = {'created': [], 'dropped': [], 'unchanged': []}
+
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in specs:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    for collection_name, collection_specs in by_collection.items():
+        collection = db.get_collection(collection_name)
+        existing = collection.index_information()
+        wanted = {spec.name: spec for spec in collection_specs}
+
+        for name, info in existing.items():
+            if name == '_id_':
+                continue
+            spec = wanted.get(name)
+            if spec is not None and spec.matches(info):
+                report['unchanged'].append(f"{collection_name}.{name}")
+                continue
+            if spec is None and not drop_obsolete:
+                continue
+            if not dry_run:
+                collection.drop_index(name)
+            report['dropped'].append(f"{collection_name}.{name}")
+
+        for spec in collection_specs:
+            if f"{collection_name}.{spec.name}" in report['unchanged']:
+                continue
+            if not dry_run:
+                collection.create_index(spec.keys, name=spec.name, **spec.options())
+            report['created'].append(f"{collection_name}.{spec.name}")
+
+    return report
+
+
+@dataclass
+class QueryShape:
+    """Formato de uma consulta de repositório, para explain()"""
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: List[Tuple[str, int]] = field(default_factory=list)
+    projection: Optional[Dict[str, Any]] = None
+    limit: Optional[int] = None
+    covered: bool = False  # Deve ser atendida só pelo índice (sem FETCH)
+    known_issue: Optional[str] = None  # Problema conhecido: reportado, mas não falha
+
+
+def repository_queries(talk_id: ObjectId, user_id: ObjectId) -> List[QueryShape]:
+    """Consultas de leitura dos repositórios, montadas com os mesmos filtros que eles usam"""
+    now = datetime.utcnow()
+    bound = (now, ObjectId())
+    talk_query = {'user_id': user_id, 'is_deleted': False}
+    message_query = MessageRepository._talk_query(str(talk_id), str(user_id))
+    newest_first = [('create_at', -1), ('_id', -1)]
+    oldest_first = [('create_at', 1), ('_id', 1)]
+    most_active = [('last_activity_at', -1), ('_id', -1)]
+    bucket_query = BucketMessageRepository.bucket_query(str(talk_id), str(user_id))
+    bucket_append_query = {**bucket_query, 'count': {'$lte': 198}, 'size': {'$lte': 200000}}
+    sidebar = dict(TALK_SIDEBAR_PROJECTION)
+
+    return [
+        QueryShape('talk.sidebar', 'talk', talk_query, most_active, sidebar),
+        QueryShape('talk.sidebar_page', 'talk', talk_query, most_active, sidebar, limit=21),
+        QueryShape('talk.sidebar_page_after', 'talk',
+                   {'$and': [talk_query, keyset_filter('last_activity_at', bound, -1, allow_missing=True)]},
+                   most_active, sidebar, limit=21),
+        QueryShape('message.history', 'message', message_query, oldest_first, MESSAGE_HISTORY_PROJECTION),
+        QueryShape('message.history_after', 'message',
+                   {**message_query, **keyset_filter('create_at', bound, 1)},
+                   oldest_first, MESSAGE_HISTORY_PROJECTION),
+        QueryShape('message.page_latest', 'message', message_query, newest_first,
+                   MESSAGE_HISTORY_PROJECTION, limit=21),
+        QueryShape('message.page_before', 'message',
+                   {'$and': [message_query, keyset_filter('create_at', bound, -1)]},
+                   newest_first, MESSAGE_HISTORY_PROJECTION, limit=21),
+        QueryShape('message.cascade_delete_batch', 'message', MessageRepository.cascade_query(str(talk_id)),
+                   projection={'_id': 1}, limit=500),
+        QueryShape('message_bucket.history', 'message_bucket', bucket_query, projection=BUCKET_READ_PROJECTION),
+        QueryShape('message_bucket.page_latest', 'message_bucket', bucket_query, [('last_at', -1)],
+                   BUCKET_READ_PROJECTION),
+        QueryShape('message_bucket.append', 'message_bucket', bucket_append_query, limit=1),
+        QueryShape('message_bucket.by_message_id', 'message_bucket', {'messages._id': ObjectId()}, limit=1),
+        QueryShape('talk.archive_candidates', 'talk', TalkRepository.archive_candidate_query(now),
+                   [('last_activity_at', 1)], {'_id': 1, 'user_id': 1, 'message_count': 1, 'last_activity_at': 1},
+                   limit=100),
+        QueryShape('talk.pending_cascades', 'talk', TalkRepository.pending_cascade_query(now),
+                   [('deleted_at', 1)], {'_id': 1, 'deleted_at': 1}, limit=100),
+        QueryShape('reply_jobs.claim_pending', 'reply_jobs', ReplyJobRepository.pending_query(now),
+                   [('available_at', 1)], limit=1),
+        QueryShape('reply_jobs.claim_expired', 'reply_jobs', ReplyJobRepository.expired_query(now), limit=1),
+        QueryShape('user.login', 'user', login_query('Demo User'), limit=2),
+    ]
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Lista os estágios de um plano do explain (formato clássico e SBE)"""
+    if 'queryPlan' in plan:
+        plan = plan['queryPlan']
+    stages = [plan.get('stage', '')]
+    if 'inputStage' in plan:
+        stages += _plan_stages(plan['inputStage'])
+    for child in plan.get('inputStages', []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def explain_query(db: Database, query: QueryShape) -> List[str]:
+    """Estágios do plano vencedor de uma consulta"""
+    command = {'find': query.collection, 'filter': query.filter}
+    if query.sort:
+        command['sort'] = dict(query.sort)
+    if query.projection is not None:
+        command['projection'] = query.projection
+    if query.limit is not None:
+        command['limit'] = query.limit
+    result = db.command('explain', command, verbosity='queryPlanner')
+    return _plan_stages(result['queryPlanner']['winningPlan'])
+
+
+def verify_query_plans(db: Database, queries: Optional[List[QueryShape]] = None) -> List[str]:
+    """
+    Roda explain() em cada consulta dos repositórios
+
+    Returns:
+        Problemas encontrados (lista vazia quando todas usam índice sem ordenação em memória)
+    """
+    if queries is None:
+        talk = db.talk.find_one(NOT_DELETED, {'_id': 1, 'user_id': 1}) or {}
+        queries = repository_queries(talk.get('_id', ObjectId()), talk.get('user_id', ObjectId()))
+
+    problems = []
+    for query in queries:
+        stages = explain_query(db, query)
+        found = []
+        if 'COLLSCAN' in stages:
+            found.append('COLLSCAN')
+        if 'SORT' in stages:
+            found.append('SORT em memória')
+        if query.covered and 'FETCH' in stages:
+            found.append('FETCH em consulta que deveria ser coberta pelo índice')
+
+        if not found:
+            continue
+        message = f"{query.name}: {', '.join(found)} ({' <- '.join(stages)})"
+        if query.known_issue:
+            print(f"⚠️  {message} - conhecido: {query.known_issue}")
+            continue
+        problems.append(message)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica e verifica os índices do MongoDB")
+    parser.add_argument('--dry-run', action='store_true', help="Só mostra o que mudaria")
+    parser.add_argument('--keep-obsolete', action='store_true', help="Não remove índices fora da declaração")
+    parser.add_argument('--verify', action='store_true', help="Verifica os planos das consultas dos repositórios")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(project_root / 'env.example')
+    from config.database import db_config
+
+    try:
+        db = db_config.connect()
+        report = apply_indexes(db, drop_obsolete=not args.keep_obsolete, dry_run=args.dry_run)
+        prefix = "(dry-run) " if args.dry_run else ""
+        for name in report['dropped']:
+            print(f"🗑️  {prefix}Removido: {name}")
+        for name in report['created']:
+            print(f"✅ {prefix}Criado: {name}")
+        print(f"ℹ️  {len(report['unchanged'])} índices sem alteração")
+
+        if args.verify and not args.dry_run:
+            problems = verify_query_plans(db)
+            for problem in problems:
+                print(f"❌ {problem}")
+            if problems:
+                return 1
+            print("✅ Todas as consultas usam índice sem ordenação em memória")
+        return 0
+
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return 1
+
+    finally:
+        db_config.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,9 +18,11 @@ from dotenv import load_dotenv
 load_dotenv(project_root / 'env.example')
 
 from config.database import db_config
-from entities.user import User
+from entities.user import User, login_keys
 from entities.talk import Talk  
 from entities.message import Message
+from data.indexes import apply_indexes
+from data.backfill_talk_summaries import backfill_talk_summaries
 
 
 def create_database_user(db):
@@ -43,7 +45,7 @@ def create_database_user(db):
 
 def create_collections(db):
     """Cria as coleções principais"""
-    collections = ['user', 'talk', 'message']
+    collections = ['user', 'talk', 'message', 'reply_jobs']
     
     for collection_name in collections:
         if collection_name not in db.list_collection_names():
@@ -54,24 +56,14 @@ def create_collections(db):
 
 
 def create_indexes(db):
-    """Cria índices para performance"""
+    """Aplica a declaração de índices de data/indexes.py"""
     print("📊 Criando índices...")
     
-    # Índices para user
-    db.user.create_index([("email", 1)], unique=True)
-    db.user.create_index([("cpf", 1)], unique=True)
-    db.user.create_index([("create_at", 1)])
-    db.user.create_index([("is_deleted", 1)])
-    
-    # Índices para talk
-    db.talk.create_index([("user_id", 1), ("create_at", -1)])
-    db.talk.create_index([("update_at", -1)])
-    db.talk.create_index([("is_deleted", 1)])
-    
-    # Índices para message
-    db.message.create_index([("talk_id", 1), ("create_at", 1)])
-    db.message.create_index([("user_id", 1), ("create_at", -1)])
-    db.message.create_index([("is_deleted", 1)])
+    report = apply_indexes(db)
+    for name in report['dropped']:
+        print(f"🗑️  Índice removido: {name}")
+    for name in report['created']:
+        print(f"✅ Índice criado: {name}")
     
     print("✅ Índices criados")
 
@@ -100,6 +92,7 @@ def insert_demo_users(db):
             "cargo": "Administrador",
             "cpf": "12345678901",
             "email": "admin@observatorio.fiec.org.br",
+            **login_keys("admin@observatorio.fiec.org.br", "Administrador FIEC"),
             "password": "$2b$12$PfdIBqe/3YuXAb1Y3bdE2uQ5PeErK2neBeyLqR/WeezVa5HTHHClG",  # admin123
             "create_at": datetime(2024, 1, 1),
             "update_at": datetime.utcnow(),
@@ -113,6 +106,7 @@ def insert_demo_users(db):
             "cargo": "Analista Sênior",
             "cpf": "23456789012",
             "email": "maria.silva@observatorio.fiec.org.br",
+            **login_keys("maria.silva@observatorio.fiec.org.br", "Maria Silva"),
             "password": "$2b$12$gTV9Sx3gtjG4yW8mBkERKuEvSMyHQdGfq6YOPlE/2XkSkO5wJ7aE.",  # analyst123
             "create_at": datetime(2024, 1, 15),
             "update_at": datetime.utcnow(),
@@ -126,6 +120,7 @@ def insert_demo_users(db):
             "cargo": "Gerente Comercial",
             "cpf": "34567890123",
             "email": "joao.santos@empresa.com.br",
+            **login_keys("joao.santos@empresa.com.br", "João Santos"),
             "password": "$2b$12$LMjihNPcq6n1sZwz44tXTeo5Bu5foHkv0KYnBtbu6IjX.jUloWQ0a",  # user123
             "create_at": datetime(2024, 2, 1),
             "update_at": datetime.utcnow(),
@@ -300,6 +295,7 @@ def main():
         user_ids = insert_demo_users(db)
         talk_ids = insert_demo_talks(db, user_ids[1], user_ids[2])
         insert_demo_messages(db, talk_ids[0], talk_ids[1], user_ids[1], user_ids[2])
+        backfill_talk_summaries(db)
         
         # Resumo
         print_summary(db, user_ids, talk_ids)
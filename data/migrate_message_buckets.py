@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Migra as mensagens da coleção message para buckets (message_bucket)
+
+Com MESSAGE_STORAGE=bucket a API lê e grava mensagens agrupadas por conversa
+(BucketMessageRepository). Este comando lê as mensagens não deletadas na ordem do
+índice message_history, monta os buckets respeitando MESSAGE_BUCKET_MAX_MESSAGES e
+MESSAGE_BUCKET_MAX_KB, grava em lotes (insert_many) e aplica os índices de
+message_bucket. As mensagens mantêm o _id, então cursores de paginação e ids já
+entregues aos clientes continuam válidos.
+
+Conversas que já têm buckets são puladas (a menos que --rebuild). Rode com a API
+parada ou ainda em MESSAGE_STORAGE=document e troque o modo ao final; mensagens
+gravadas na coleção message depois da migração não são copiadas.
+
+--rebuild refaz os buckets das conversas com mensagens na origem juntando o que já
+está nos buckets: mensagens migradas antes com --delete-source (e as gravadas em
+MESSAGE_STORAGE=bucket) continuam lá. Se a mensagem existe nos dois, vale a da origem.
+
+Uso:
+    python data/migrate_message_buckets.py                   # migra e cria os índices
+    python data/migrate_message_buckets.py --dry-run         # só conta o que seria gravado
+    python data/migrate_message_buckets.py --rebuild         # refaz os buckets das conversas migradas
+    python data/migrate_message_buckets.py --delete-source   # remove da coleção message o que foi migrado
+"""
+
+import argparse
+import itertools
+import sys
+from pathlib import Path
+from typing import Dict, Any, Iterator, List
+
+from pymongo.database import Database
+
+# Permite rodar como script a partir da raiz ou de data/
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from config.settings import settings
+from data.indexes import INDEXES, apply_indexes
+from repositories.bucket_message_repository import BucketMessageRepository, build_buckets, message_key
+
+# Mesma ordem do índice message_history (a consulta usa o índice parcial)
+SOURCE_QUERY = {'is_deleted': False}
+SOURCE_SORT = [('talk_id', 1), ('user_id', 1), ('create_at', 1), ('_id', 1)]
+
+
+def migrate_message_buckets(db: Database, batch_size: int = 100, dry_run: bool = False,
+                            rebuild: bool = False, delete_source: bool = False) -> Dict[str, Any]:
+    """
+    Copia as mensagens para buckets e aplica os índices de message_bucket
+
+    Args:
+        batch_size: Buckets por insert_many
+        rebuild: Refaz os buckets das conversas que têm mensagens na origem, mantendo as
+            mensagens que só estão nos buckets
+        delete_source: Remove da coleção message as mensagens já copiadas
+
+    Returns:
+        {'talks', 'skipped', 'buckets', 'messages', 'deleted', 'indexes'}
+    """
+    migrated = set() if rebuild else set(db.message_bucket.distinct('talk_id'))
+    report = {'talks': 0, 'skipped': 0, 'buckets': 0, 'messages': 0, 'deleted': 0}
+
+    def source() -> Iterator[Dict[str, Any]]:
+        skipped = set()
+        for message in db.message.find(SOURCE_QUERY).sort(SOURCE_SORT).batch_size(1000):
+            talk_id = message['talk_id']
+            if talk_id in migrated:
+                if talk_id not in skipped:
+                    skipped.add(talk_id)
+                    report['skipped'] += 1
+                continue
+            yield message
+
+    def merged(messages: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """--rebuild: mensagens de cada conversa somadas às que só existem nos buckets atuais"""
+        for talk_id, group in itertools.groupby(messages, key=lambda message: message['talk_id']):
+            group = list(group)
+            seen = {message['_id'] for message in group}
+            for bucket in db.message_bucket.find({'talk_id': talk_id, 'is_deleted': False}):
+                for message in BucketMessageRepository.unpack(bucket):
+                    if message['_id'] not in seen:
+                        seen.add(message['_id'])
+                        group.append(message)
+            group.sort(key=message_key)
+            yield from group
+
+    cleared = set()
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        talks = {bucket['talk_id'] for bucket in batch} - cleared
+        if talks:
+            report['talks'] += len(talks)
+            cleared.update(talks)
+            if rebuild and not dry_run:
+                # O conteúdo desses buckets já foi lido por merged()
+                db.message_bucket.delete_many({'talk_id': {'$in': list(talks)}, 'is_deleted': False})
+
+        message_ids = [entry['_id'] for bucket in batch for entry in bucket['messages']]
+        report['buckets'] += len(batch)
+        report['messages'] += len(message_ids)
+        if dry_run:
+            return
+        db.message_bucket.insert_many(batch, ordered=True)
+        if delete_source:
+            report['deleted'] += db.message.delete_many({'_id': {'$in': message_ids}}).deleted_count
+
+    messages = merged(source()) if rebuild else source()
+    for bucket in build_buckets(messages, settings.MESSAGE_BUCKET_MAX_MESSAGES, settings.MESSAGE_BUCKET_MAX_KB * 1024):
+        batch.append(bucket)
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+
+    bucket_indexes = [spec for spec in INDEXES if spec.collection == 'message_bucket']
+    report['indexes'] = apply_indexes(db, drop_obsolete=False, dry_run=dry_run, specs=bucket_indexes)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra as mensagens para buckets (message_bucket)")
+    parser.add_argument('--batch-size', type=int, default=100, help="Buckets por insert_many")
+    parser.add_argument('--dry-run', action='store_true', help="Só conta o que seria gravado")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Refaz os buckets das conversas que já foram migradas")
+    parser.add_argument('--delete-source', action='store_true',
+                        help="Remove da coleção message as mensagens copiadas")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(project_root / 'env.example')
+    from config.database import db_config
+
+    try:
+        db = db_config.connect()
+        report = migrate_message_buckets(db, batch_size=args.batch_size, dry_run=args.dry_run,
+                                         rebuild=args.rebuild, delete_source=args.delete_source)
+        prefix = "(dry-run) " if args.dry_run else ""
+        print(f"✅ {prefix}{report['messages']} mensagens de {report['talks']} conversas "
+              f"em {report['buckets']} buckets")
+        if report['skipped']:
+            print(f"ℹ️  {report['skipped']} conversas já tinham buckets (use --rebuild para refazer)")
+        if args.delete_source:
+            print(f"🗑️  {prefix}{report['deleted']} mensagens removidas da coleção message")
+        for name in report['indexes']['created']:
+            print(f"✅ {prefix}Índice criado: {name}")
+        return 0
+
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return 1
+
+    finally:
+        db_config.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
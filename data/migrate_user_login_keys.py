@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Preenche as chaves normalizadas do login (email_normalized, name_normalized)
+
+O login busca o usuário por essas chaves numa única consulta, atendida pelos
+índices únicos user_login_email e user_login_name. Este comando calcula as chaves
+dos usuários existentes, grava em lotes e depois aplica os índices do usuário.
+
+Usuários ativos que colidem na mesma chave (ex.: dois cadastros com o mesmo nome)
+ficam sem aquela chave e são listados: continuam entrando pela outra chave até
+o cadastro ser corrigido, e o índice único pode ser criado.
+
+Uso:
+    python data/migrate_user_login_keys.py                   # migra e cria os índices
+    python data/migrate_user_login_keys.py --dry-run         # só mostra o que mudaria
+    python data/migrate_user_login_keys.py --batch-size 500  # tamanho do lote de escrita
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, Any, List
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+# Permite rodar como script a partir da raiz ou de data/
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from entities.user import login_keys
+from data.indexes import INDEXES, apply_indexes
+
+LOGIN_KEY_FIELDS = ('email_normalized', 'name_normalized')
+
+
+def plan_login_keys(db: Database) -> Dict[str, Any]:
+    """
+    Calcula as chaves de cada usuário e separa as colisões entre usuários ativos
+
+    Returns:
+        {'updates': [UpdateOne, ...], 'conflicts': {campo: {chave: [_id, ...]}}}
+    """
+    projection = {'email': 1, 'name': 1, 'is_deleted': 1, **{field: 1 for field in LOGIN_KEY_FIELDS}}
+    users = list(db.user.find({}, projection))
+
+    owners: Dict[str, Dict[str, List[Any]]] = {field: {} for field in LOGIN_KEY_FIELDS}
+    keys_by_user = {}
+    for user in users:
+        keys = login_keys(user.get('email') or '', user.get('name') or '')
+        keys_by_user[user['_id']] = keys
+        if user.get('is_deleted', False):
+            continue
+        for field in LOGIN_KEY_FIELDS:
+            if keys[field]:
+                owners[field].setdefault(keys[field], []).append(user['_id'])
+
+    conflicts = {
+        field: {key: ids for key, ids in by_key.items() if len(ids) > 1}
+        for field, by_key in owners.items()
+    }
+    conflicting = {(field, _id) for field, by_key in conflicts.items() for ids in by_key.values() for _id in ids}
+
+    updates = []
+    for user in users:
+        to_set, to_unset = {}, {}
+        for field, key in keys_by_user[user['_id']].items():
+            if (field, user['_id']) in conflicting or not key:
+                if field in user:
+                    to_unset[field] = ''
+            elif user.get(field) != key:
+                to_set[field] = key
+        change = {}
+        if to_set:
+            change['$set'] = to_set
+        if to_unset:
+            change['$unset'] = to_unset
+        if change:
+            updates.append(UpdateOne({'_id': user['_id']}, change))
+
+    return {'updates': updates, 'conflicts': conflicts}
+
+
+def migrate_user_login_keys(db: Database, batch_size: int = 1000, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Grava as chaves de login e aplica os índices do usuário
+
+    Returns:
+        {'updated': usuários alterados, 'conflicts': colisões, 'indexes': relatório do apply_indexes}
+    """
+    plan = plan_login_keys(db)
+    updates = plan['updates']
+
+    updated = 0
+    for start in range(0, len(updates), batch_size):
+        batch = updates[start:start + batch_size]
+        updated += len(batch) if dry_run else db.user.bulk_write(batch, ordered=False).modified_count
+
+    # Só depois das chaves gravadas os índices únicos podem ser criados
+    user_indexes = [spec for spec in INDEXES if spec.collection == 'user']
+    indexes = apply_indexes(db, drop_obsolete=False, dry_run=dry_run, specs=user_indexes)
+
+    return {'updated': updated, 'conflicts': plan['conflicts'], 'indexes': indexes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preenche as chaves normalizadas do login")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Atualizações por bulk_write")
+    parser.add_argument('--dry-run', action='store_true', help="Só mostra o que mudaria")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(project_root / 'env.example')
+    from config.database import db_config
+
+    try:
+        db = db_config.connect()
+        report = migrate_user_login_keys(db, batch_size=args.batch_size, dry_run=args.dry_run)
+        prefix = "(dry-run) " if args.dry_run else ""
+        print(f"✅ {prefix}{report['updated']} usuários com chaves de login atualizadas")
+        for field, by_key in report['conflicts'].items():
+            for key, ids in by_key.items():
+                print(f"⚠️  {field} '{key}' repetido em {len(ids)} usuários: {', '.join(map(str, ids))}")
+        for name in report['indexes']['created']:
+            print(f"✅ {prefix}Índice criado: {name}")
+        return 0
+
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return 1
+
+    finally:
+        db_config.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
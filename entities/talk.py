@@ -17,6 +17,10 @@ class Talk:
     create_at: Optional[datetime] = None
     update_at: Optional[datetime] = None
     is_deleted: bool = False
+    # Resumo denormalizado para a lista lateral (mantido a cada mensagem gravada)
+    last_message_preview: Optional[str] = None
+    message_count: int = 0
+    last_activity_at: Optional[datetime] = None
     
     def __post_init__(self):
         """Inicializar campos de data se não fornecidos"""
@@ -24,6 +28,8 @@ class Talk:
             self.create_at = datetime.utcnow()
         if self.update_at is None:
             self.update_at = datetime.utcnow()
+        if self.last_activity_at is None:
+            self.last_activity_at = self.create_at
     
     def update_name(self, new_name: str):
         """Atualiza o nome da conversa"""
@@ -48,6 +54,9 @@ class Talk:
             'create_at': self.create_at.isoformat() if self.create_at else None,
             'update_at': self.update_at.isoformat() if self.update_at else None,
             'is_deleted': self.is_deleted,
+            'last_message_preview': self.last_message_preview,
+            'message_count': self.message_count,
+            'last_activity_at': self.last_activity_at.isoformat() if self.last_activity_at else None,
         }
     
     @classmethod
@@ -59,4 +68,7 @@ class Talk:
             create_at=datetime.fromisoformat(data['create_at']) if data.get('create_at') else None,
             update_at=datetime.fromisoformat(data['update_at']) if data.get('update_at') else None,
             is_deleted=data.get('is_deleted', False),
+            last_message_preview=data.get('last_message_preview'),
+            message_count=data.get('message_count', 0),
+            last_activity_at=datetime.fromisoformat(data['last_activity_at']) if data.get('last_activity_at') else None,
         )
@@ -2,11 +2,47 @@
 User Entity - Entidade de usuário do domínio
 """
 
+import unicodedata
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
 
+def normalize_email(email: str) -> str:
+    """Chave de busca do email: sem espaços nas pontas e em minúsculas"""
+    return email.strip().lower()
+
+
+def normalize_name(name: str) -> str:
+    """Chave de busca do nome: Unicode NFKC, sem distinção de maiúsculas e espaços colapsados"""
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+
+
+def login_keys(email: str, name: str) -> dict:
+    """Campos indexados usados pelo login (gravados junto com email e nome)"""
+    return {
+        'email_normalized': normalize_email(email),
+        'name_normalized': normalize_name(name),
+    }
+
+
+def login_query(username: str) -> dict:
+    """Busca do login: email ou nome normalizados, cada ramo atendido pelo seu índice único"""
+    return {'$or': [
+        {'email_normalized': normalize_email(username), 'is_deleted': False},
+        {'name_normalized': normalize_name(username), 'is_deleted': False}
+    ]}
+
+
+def login_user(users: list, username: str) -> Optional[dict]:
+    """Usuário do login; o email tem precedência se o username casar com o nome de outro usuário"""
+    email = normalize_email(username)
+    for user in users:
+        if user.get('email_normalized') == email:
+            return user
+    return users[0] if users else None
+
+
 @dataclass
 class User:
     """Entidade User representando um usuário do sistema
@@ -24,13 +60,22 @@ class User:
     create_at: Optional[datetime] = None
     update_at: Optional[datetime] = None
     is_deleted: bool = False
+    email_normalized: Optional[str] = None
+    name_normalized: Optional[str] = None
     
     def __post_init__(self):
-        """Inicializar campos de data se não fornecidos"""
+        """Inicializar campos de data e chaves de login se não fornecidos"""
         if self.create_at is None:
             self.create_at = datetime.utcnow()
         if self.update_at is None:
             self.update_at = datetime.utcnow()
+        self.refresh_login_keys()
+    
+    def refresh_login_keys(self):
+        """Recalcula as chaves de login a partir do email e do nome"""
+        keys = login_keys(self.email, self.name)
+        self.email_normalized = keys['email_normalized']
+        self.name_normalized = keys['name_normalized']
     
     def delete(self):
         """Marca o usuário como deletado (soft delete)"""
@@ -47,6 +92,7 @@ class User:
         for key, value in kwargs.items():
             if hasattr(self, key) and key not in ['create_at']:
                 setattr(self, key, value)
+        self.refresh_login_keys()
         self.update_at = datetime.utcnow()
     
     def to_dict(self) -> dict:
@@ -58,6 +104,8 @@ class User:
             'cargo': self.cargo,
             'cpf': self.cpf,
             'email': self.email,
+            'email_normalized': self.email_normalized,
+            'name_normalized': self.name_normalized,
             'create_at': self.create_at.isoformat() if self.create_at else None,
             'update_at': self.update_at.isoformat() if self.update_at else None,
             'is_deleted': self.is_deleted,
@@ -0,0 +1,319 @@
+import logging
+import time
+from typing import Dict, Any, Optional, AsyncIterator
+
+import httpx
+
+from config.settings import settings
+from gateways.n8n_base import BaseN8nGateway, CONNECTION_ERROR_MESSAGE
+from gateways.response_cache import ResponseCache, cache_key
+from gateways.single_flight import AsyncSingleFlight
+from gateways.circuit_breaker import CircuitBreaker, AsyncBulkhead
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncN8nGateway(BaseN8nGateway):
+    """
+    Gateway assíncrono para o webhook do n8n (app ASGI), sobre httpx.AsyncClient
+
+    Mesmo contrato do N8nGateway, com send_chat_input, stream_chat_input e
+    check_health aguardáveis. Os dois são irmãos sobre BaseN8nGateway (extração de
+    mensagens, formato de erro, cache em memória e circuit breaker); este não é um
+    N8nGateway. Uma chamada esperando o n8n ocupa só uma corrotina, não uma thread.
+    """
+
+    def __init__(self, base_url: str = None, cache: Optional[ResponseCache] = None,
+                 single_flight: Optional[AsyncSingleFlight] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 bulkhead: Optional[AsyncBulkhead] = None):
+        """
+        Args:
+            base_url: URL base do n8n. Se None, usa variável de ambiente N8N_URL
+            cache: Cache de respostas (None desativa). Use só o nível em memória:
+                   o nível MongoDB do ResponseCache é síncrono e bloquearia o event loop
+            single_flight: Coalescência de chamadas idênticas simultâneas (None desativa)
+            circuit_breaker: Circuit breaker das chamadas ao webhook (None desativa)
+            bulkhead: Limite de chamadas simultâneas ao webhook (None desativa)
+        """
+        super().__init__(base_url, cache, single_flight, circuit_breaker, bulkhead)
+        self.client = self._create_client()
+        self._requests = 0
+
+        logger.info(f"AsyncN8nGateway inicializado com URL: {self.base_url}")
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """
+        Cria o cliente HTTP com pool de conexões keep-alive
+
+        O transporte do httpx só retenta falhas de conexão (a requisição nem chegou
+        ao n8n), o que é seguro também para o POST do webhook.
+        """
+        return httpx.AsyncClient(
+            headers={'Content-Type': 'application/json'},
+            limits=httpx.Limits(
+                max_connections=settings.N8N_POOL_MAXSIZE,
+                max_keepalive_connections=settings.N8N_POOL_MAXSIZE
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=settings.N8N_MAX_RETRIES)
+        )
+
+    def _timeouts(self, read_timeout: float) -> httpx.Timeout:
+        """Timeouts separados: conexão e leitura"""
+        return httpx.Timeout(read_timeout, connect=self.connect_timeout)
+
+    def get_pool_stats(self) -> Dict[str, int]:
+        """O httpx não expõe o estado do pool; reporta as requisições e o limite"""
+        return {'requests': self._requests, 'max_connections': settings.N8N_POOL_MAXSIZE}
+
+    async def close(self):
+        """Fecha as conexões do pool"""
+        await self.client.aclose()
+
+    async def send_chat_input(self, chat_input: str, timeout: int = None, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Envia uma mensagem para o webhook do n8n (ver N8nGateway.send_chat_input)
+        """
+        cached = self._cached(chat_input, use_cache)
+        if cached is not None:
+            logger.info(f"Resposta do n8n servida do cache: {chat_input[:50]}...")
+            return cached
+
+        if self.single_flight is not None:
+            response, shared = await self.single_flight.do(
+                cache_key(chat_input),
+                lambda: self._post_chat_input(chat_input, timeout)
+            )
+            if shared:
+                logger.info(f"Resposta do n8n compartilhada com chamada simultânea: {chat_input[:50]}...")
+                response['coalesced'] = True
+                return response
+        else:
+            response = await self._post_chat_input(chat_input, timeout)
+
+        self._store(chat_input, response, use_cache)
+        return response
+
+    async def _admit(self) -> Optional[Dict[str, Any]]:
+        """
+        Passa pelo circuit breaker e pelo bulkhead antes de chamar o n8n
+
+        Returns:
+            None se a chamada pode seguir; senão a resposta de erro para devolver imediatamente
+        """
+        rejection = self._circuit_rejection()
+        if rejection is None and self.bulkhead is not None and not await self.bulkhead.acquire():
+            rejection = self._bulkhead_rejection()
+        return rejection
+
+    async def _post_chat_input(self, chat_input: str, timeout: int = None) -> Dict[str, Any]:
+        """
+        Chama o webhook do n8n protegido pelo circuit breaker e pelo bulkhead
+        """
+        rejection = await self._admit()
+        if rejection is not None:
+            return rejection
+
+        started = time.monotonic()
+        response = None
+        try:
+            response = await self._request_chat_input(chat_input, timeout)
+            return response
+        finally:
+            self._release(response, started)
+
+    async def _request_chat_input(self, chat_input: str, timeout: int = None) -> Dict[str, Any]:
+        """
+        Faz a chamada ao webhook do n8n, sem cache
+        """
+        if timeout is None:
+            timeout = settings.N8N_TIMEOUT
+
+        try:
+            logger.info(f"Enviando mensagem para n8n: {chat_input[:50]}... (timeout: {timeout}s)")
+            self._requests += 1
+
+            response = await self.client.post(
+                self.webhook_init_url,
+                json={"chatInput": chat_input},
+                timeout=self._timeouts(timeout)
+            )
+            response.raise_for_status()
+
+            try:
+                response_data = response.json()
+                logger.info("Resposta recebida do n8n com sucesso")
+                return self._success_response(response_data, response.status_code)
+            except ValueError:
+                logger.warning("Resposta do n8n não é JSON válido")
+                return self._text_response(response.text, response.status_code)
+
+        except httpx.TimeoutException:
+            return self._timeout_response(timeout)
+
+        except httpx.TransportError:
+            return self._error_response(CONNECTION_ERROR_MESSAGE)
+
+        except httpx.HTTPStatusError as e:
+            return self._http_error_response(e.response.status_code, e.response.text)
+
+        except Exception as e:
+            return self._unexpected_error_response(e)
+
+    async def _aiter_stream_chunks(self, response: httpx.Response) -> AsyncIterator[str]:
+        """
+        Extrai os trechos de texto de uma resposta em streaming (ver N8nGateway._iter_stream_chunks)
+        """
+        if response.headers.get('Content-Type', '').startswith('text/plain'):
+            async for chunk in response.aiter_text():
+                if chunk:
+                    yield chunk
+            return
+
+        pending_lines = []
+        emitted = False
+        async for line in response.aiter_lines():
+            chunk = self._parse_stream_line(line, pending_lines)
+            if chunk is not None:
+                emitted = True
+                yield chunk
+
+        if pending_lines:
+            yield self._flush_stream_lines(pending_lines, emitted)
+
+    async def stream_chat_input(self, chat_input: str, timeout: int = None,
+                                use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Envia uma mensagem e repassa a resposta em partes (ver N8nGateway.stream_chat_input)
+        """
+        cached = self._cached(chat_input, use_cache)
+        if cached is not None:
+            yield {'type': 'chunk', 'content': cached['message']}
+            yield {'type': 'done', 'response': cached}
+            return
+
+        rejection = await self._admit()
+        if rejection is not None:
+            yield {'type': 'done', 'response': rejection}
+            return
+
+        started = time.monotonic()
+        final = None
+        try:
+            async for event in self._stream_upstream(chat_input, timeout):
+                if event['type'] == 'chunk':
+                    yield event
+                else:
+                    final = event['response']
+        finally:
+            # Consumidor cancelado no meio (final None) não conta como falha do n8n
+            self._release(final, started, 'stream')
+
+        self._store(chat_input, final, use_cache)
+        yield {'type': 'done', 'response': final}
+
+    async def _stream_upstream(self, chat_input: str, timeout: int = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Faz a chamada em streaming ao webhook do n8n (sem cache nem proteções)
+        """
+        if timeout is None:
+            timeout = settings.N8N_TIMEOUT
+
+        parts = []
+        try:
+            logger.info(f"Enviando mensagem em streaming para n8n: {chat_input[:50]}... (timeout: {timeout}s)")
+            self._requests += 1
+
+            async with self.client.stream(
+                'POST',
+                self.webhook_init_url,
+                json={"chatInput": chat_input},
+                timeout=self._timeouts(timeout)
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+
+                async for chunk in self._aiter_stream_chunks(response):
+                    parts.append(chunk)
+                    yield {'type': 'chunk', 'content': chunk}
+
+                logger.info(f"Streaming do n8n concluído ({len(parts)} partes)")
+                final = self._stream_response(parts, response.status_code)
+
+        except httpx.TimeoutException:
+            final = self._timeout_response(timeout)
+
+        except httpx.TransportError:
+            final = self._error_response(CONNECTION_ERROR_MESSAGE)
+
+        except httpx.HTTPStatusError as e:
+            final = self._http_error_response(e.response.status_code, e.response.text)
+
+        except Exception as e:
+            final = self._unexpected_error_response(e)
+
+        yield {'type': 'done', 'response': final}
+
+    async def check_health(self) -> bool:
+        """
+        Verifica se o n8n está disponível
+        """
+        try:
+            await self.ping(5)
+            return True
+        except Exception as e:
+            logger.error(f"n8n health check falhou: {str(e)}")
+            return False
+
+    async def ping(self, timeout: float):
+        """
+        Consulta a raiz do n8n com prazo de `timeout` segundos (prober de saúde)
+
+        Raises:
+            httpx.HTTPError, RuntimeError: n8n inacessível ou respondeu com erro
+        """
+        response = await self.client.get(self.base_url,
+                                         timeout=httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout)))
+        if response.status_code not in [200, 302, 404]:
+            raise RuntimeError(f"n8n respondeu {response.status_code}")
+
+
+_shared_async_gateway: Optional[AsyncN8nGateway] = None
+
+
+def get_async_n8n_gateway() -> AsyncN8nGateway:
+    """
+    Retorna o gateway assíncrono do processo; deve ser chamado dentro do event loop do app
+    """
+    global _shared_async_gateway
+    if _shared_async_gateway is None:
+        _shared_async_gateway = AsyncN8nGateway(
+            cache=ResponseCache(settings.N8N_CACHE_MAX_ENTRIES, settings.N8N_CACHE_TTL)
+            if settings.N8N_CACHE_ENABLED else None,
+            single_flight=AsyncSingleFlight() if settings.N8N_SINGLE_FLIGHT_ENABLED else None,
+            circuit_breaker=CircuitBreaker(
+                name='n8n',
+                failure_rate_threshold=settings.N8N_BREAKER_FAILURE_RATE,
+                slow_call_threshold=settings.N8N_BREAKER_SLOW_CALL_SECONDS,
+                slow_call_rate_threshold=settings.N8N_BREAKER_SLOW_CALL_RATE,
+                window_size=settings.N8N_BREAKER_WINDOW_SIZE,
+                minimum_calls=settings.N8N_BREAKER_MINIMUM_CALLS,
+                open_duration=settings.N8N_BREAKER_OPEN_SECONDS,
+                half_open_max_calls=settings.N8N_BREAKER_HALF_OPEN_CALLS
+            ),
+            bulkhead=AsyncBulkhead(
+                name='n8n',
+                max_concurrent=settings.N8N_BULKHEAD_MAX_CONCURRENT,
+                max_wait=settings.N8N_BULKHEAD_MAX_WAIT
+            )
+        )
+    return _shared_async_gateway
+
+
+async def close_async_n8n_gateway():
+    """Fecha o gateway assíncrono no shutdown do app"""
+    global _shared_async_gateway
+    if _shared_async_gateway is not None:
+        await _shared_async_gateway.close()
+        _shared_async_gateway = None
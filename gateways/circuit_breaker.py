@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por janela de chamadas recentes
+
+    - closed: chamadas passam; abre quando a taxa de falhas ou de chamadas lentas
+      da janela atinge o limite (após um mínimo de chamadas)
+    - open: chamadas são recusadas imediatamente até open_duration passar
+    - half_open: deixa passar poucas chamadas de teste; fecha se todas forem
+      bem-sucedidas e rápidas, reabre na primeira falha
+    """
+
+    def __init__(self, name: str, failure_rate_threshold: float, slow_call_threshold: float,
+                 slow_call_rate_threshold: float, window_size: int, minimum_calls: int,
+                 open_duration: float, half_open_max_calls: int):
+        """
+        Args:
+            name: Nome da dependência (usado nos logs)
+            failure_rate_threshold: Fração de falhas na janela que abre o circuito (0-1)
+            slow_call_threshold: Duração, em segundos, a partir da qual uma chamada é lenta
+            slow_call_rate_threshold: Fração de chamadas lentas na janela que abre o circuito (0-1)
+            window_size: Quantidade de chamadas recentes consideradas
+            minimum_calls: Mínimo de chamadas na janela antes de avaliar as taxas
+            open_duration: Tempo, em segundos, que o circuito fica aberto antes do teste
+            half_open_max_calls: Chamadas de teste permitidas no estado half_open
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._window = deque(maxlen=window_size)  # (falhou, lenta)
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._rejected = 0
+        self._last_transition_at: Optional[datetime] = None
+
+    def _transition(self, new_state: str, reason: str):
+        """Muda de estado (chamado com o lock adquirido)"""
+        old_state = self._state
+        self._state = new_state
+        self._last_transition_at = datetime.utcnow()
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+        if new_state in (CLOSED, HALF_OPEN):
+            self._window.clear()
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        logger.warning(f"Circuit breaker '{self.name}': {old_state} -> {new_state} ({reason})")
+
+    def allow_request(self) -> bool:
+        """Retorna True se a chamada pode seguir; cada True deve ser seguido de record() ou cancel()"""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_duration:
+                    self._rejected += 1
+                    return False
+                self._transition(HALF_OPEN, f"{self.open_duration}s em aberto")
+
+            if self._state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self._rejected += 1
+                    return False
+                self._half_open_in_flight += 1
+
+            return True
+
+    def cancel(self):
+        """Libera uma permissão concedida sem registrar resultado (a chamada não aconteceu)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def record(self, failed: bool, duration: float):
+        """Registra o resultado de uma chamada"""
+        slow = duration >= self.slow_call_threshold
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+                if failed or slow:
+                    self._transition(OPEN, "falha na chamada de teste" if failed else "chamada de teste lenta")
+                    return
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._transition(CLOSED, "chamadas de teste bem-sucedidas")
+                return
+
+            if self._state == OPEN:
+                # Chamada iniciada antes da abertura: não altera o estado
+                return
+
+            self._window.append((failed, slow))
+            calls = len(self._window)
+            if calls < self.minimum_calls:
+                return
+
+            failure_rate = sum(1 for f, _ in self._window if f) / calls
+            slow_rate = sum(1 for _, s in self._window if s) / calls
+            if failure_rate >= self.failure_rate_threshold:
+                self._transition(OPEN, f"taxa de falhas {failure_rate:.0%}")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._transition(OPEN, f"taxa de chamadas lentas {slow_rate:.0%}")
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado atual e taxas da janela para monitoramento"""
+        with self._lock:
+            calls = len(self._window)
+            return {
+                'state': self._state,
+                'calls_in_window': calls,
+                'failure_rate': round(sum(1 for f, _ in self._window if f) / calls, 4) if calls else 0.0,
+                'slow_call_rate': round(sum(1 for _, s in self._window if s) / calls, 4) if calls else 0.0,
+                'rejected': self._rejected,
+                'last_transition_at': self._last_transition_at.isoformat() if self._last_transition_at else None
+            }
+
+
+class Bulkhead:
+    """
+    Limita quantas threads podem estar dentro de chamadas à dependência ao mesmo tempo
+
+    Impede que uma dependência lenta ocupe todos os workers e derrube rotas
+    que não dependem dela (login, listagem de conversas).
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float):
+        """
+        Args:
+            name: Nome da dependência (usado nos logs)
+            max_concurrent: Máximo de chamadas simultâneas
+            max_wait: Tempo máximo, em segundos, esperando uma vaga (0 = falha imediata)
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._rejected = 0
+
+    def acquire(self) -> bool:
+        """Ocupa uma vaga; retorna False se o limite foi atingido"""
+        if self.max_wait > 0:
+            acquired = self._semaphore.acquire(timeout=self.max_wait)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+
+        with self._lock:
+            if acquired:
+                self._in_use += 1
+            else:
+                self._rejected += 1
+        if not acquired:
+            logger.warning(f"Bulkhead '{self.name}' cheio ({self.max_concurrent} chamadas simultâneas)")
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self._in_use -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_use': self._in_use,
+                'rejected': self._rejected
+            }
+
+
+class AsyncBulkhead:
+    """
+    Bulkhead para corrotinas (app ASGI): mesma semântica do Bulkhead, sem bloquear o event loop
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._in_use = 0
+        self._rejected = 0
+
+    async def acquire(self) -> bool:
+        """Ocupa uma vaga; retorna False se o limite foi atingido"""
+        acquired = False
+        if self.max_wait > 0:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+                acquired = True
+            except asyncio.TimeoutError:
+                pass
+        elif not self._semaphore.locked():
+            await self._semaphore.acquire()
+            acquired = True
+
+        if acquired:
+            self._in_use += 1
+        else:
+            self._rejected += 1
+            logger.warning(f"Bulkhead '{self.name}' cheio ({self.max_concurrent} chamadas simultâneas)")
+        return acquired
+
+    def release(self):
+        self._in_use -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_concurrent': self.max_concurrent,
+            'in_use': self._in_use,
+            'rejected': self._rejected
+        }
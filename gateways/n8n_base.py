@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_ERROR_MESSAGE = "Erro de conexão com n8n. Verifique se o serviço está rodando."
+BULKHEAD_FULL_MESSAGE = "O n8n está com muitas requisições simultâneas. Tente novamente em instantes."
+
+
+class BaseN8nGateway:
+    """
+    Parte comum do N8nGateway (requests) e do AsyncN8nGateway (httpx)
+
+    Não faz I/O: formato das respostas e dos erros, extração da mensagem, leitura
+    das linhas do streaming, cache, circuit breaker e métricas. Cada gateway cria o
+    seu cliente HTTP e define as chamadas (síncronas ou aguardáveis) sobre esta base.
+    """
+
+    def __init__(self, base_url: str = None, cache=None, single_flight=None,
+                 circuit_breaker=None, bulkhead=None):
+        """
+        Args:
+            base_url: URL base do n8n. Se None, usa variável de ambiente N8N_URL
+                     ou padrão 'http://observatorio_n8n:5678' para Docker
+            cache: Cache de respostas (None desativa o cache)
+            single_flight: Coalescência de chamadas idênticas simultâneas (None desativa)
+            circuit_breaker: Circuit breaker das chamadas ao webhook (None desativa)
+            bulkhead: Limite de chamadas simultâneas ao webhook (None desativa)
+        """
+        if base_url is None:
+            # Prioridade: variável de ambiente > nome do container Docker > localhost
+            base_url = os.getenv('N8N_URL', 'http://observatorio_n8n:5678')
+
+        self.base_url = base_url
+        self.webhook_init_url = f"{base_url}/webhook-test/n8n/init"
+        self.connect_timeout = settings.N8N_CONNECT_TIMEOUT
+        self.cache = cache
+        self.single_flight = single_flight
+        self.circuit_breaker = circuit_breaker
+        self.bulkhead = bulkhead
+
+    def get_pool_stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas do gateway (pool de conexões e cache) para monitoramento"""
+        return {
+            'pool': self.get_pool_stats(),
+            'cache': self.cache.stats() if self.cache else None,
+            'single_flight': self.single_flight.stats() if self.single_flight else None,
+            'circuit_breaker': self.circuit_breaker.stats() if self.circuit_breaker else None,
+            'bulkhead': self.bulkhead.stats() if self.bulkhead else None
+        }
+
+    # Cache de respostas
+
+    def _cached(self, chat_input: str, use_cache: bool) -> Optional[Dict[str, Any]]:
+        """Resposta do cache marcada com 'cached': True, ou None"""
+        if self.cache is None or not use_cache:
+            return None
+        cached = self.cache.get(chat_input)
+        if cached is not None:
+            cached['cached'] = True
+        return cached
+
+    def _store(self, chat_input: str, response: Dict[str, Any], use_cache: bool):
+        """Guarda no cache só respostas de sucesso"""
+        if self.cache is not None and use_cache and response['success']:
+            self.cache.set(chat_input, response)
+
+    # Formato das respostas
+
+    def _extract_message(self, response_data: Any) -> str:
+        """
+        Extrai a mensagem de resposta do N8N em diferentes formatos possíveis
+
+        Args:
+            response_data: Dados da resposta do N8N
+
+        Returns:
+            String com a mensagem extraída
+        """
+        # Se a resposta já é uma string, retornar diretamente
+        if isinstance(response_data, str):
+            return response_data
+
+        # Se for um dicionário, tentar extrair de campos conhecidos
+        if isinstance(response_data, dict):
+            # Tentar campo 'output' (formato atual do N8N)
+            if 'output' in response_data:
+                return str(response_data['output'])
+
+            # Tentar outros campos comuns
+            for field in ['message', 'text', 'response', 'result', 'answer', 'content']:
+                if field in response_data:
+                    return str(response_data[field])
+
+            # Se tiver apenas um campo, retornar seu valor
+            if len(response_data) == 1:
+                return str(list(response_data.values())[0])
+
+        # Se for uma lista, tentar extrair da primeira posição
+        if isinstance(response_data, list) and len(response_data) > 0:
+            return self._extract_message(response_data[0])
+
+        # Fallback: converter para string
+        return str(response_data)
+
+    def _success_response(self, response_data: Any, status_code: int) -> Dict[str, Any]:
+        """Resposta JSON do webhook"""
+        return {
+            'success': True,
+            'message': self._extract_message(response_data),  # String única para o frontend
+            'data': response_data,  # Dados completos para debug
+            'status_code': status_code
+        }
+
+    @staticmethod
+    def _text_response(text: str, status_code: int) -> Dict[str, Any]:
+        """Resposta do webhook que não é JSON: repassa o texto"""
+        return {
+            'success': True,
+            'message': text,  # String única para o frontend
+            'data': {'response': text},
+            'status_code': status_code
+        }
+
+    @staticmethod
+    def _stream_response(parts: list, status_code: int) -> Dict[str, Any]:
+        """Resposta completa de um streaming concluído"""
+        message = ''.join(parts)
+        return {
+            'success': True,
+            'message': message,
+            'data': {'output': message},
+            'status_code': status_code
+        }
+
+    def _error_response(self, error_msg: str, status_code: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Monta a resposta padronizada de erro (mesmo formato de send_chat_input)
+        """
+        logger.error(error_msg)
+        response = {
+            'success': False,
+            'message': error_msg,  # String única para o frontend
+            'error': error_msg,
+            'data': None
+        }
+        if status_code is not None:
+            response['status_code'] = status_code
+        return response
+
+    def _timeout_response(self, timeout: float) -> Dict[str, Any]:
+        response = self._error_response(f"Timeout ao conectar com n8n (>{timeout}s)")
+        response['timeout'] = True
+        return response
+
+    def _http_error_response(self, status_code: int, text: str) -> Dict[str, Any]:
+        return self._error_response(f"Erro HTTP do n8n: {status_code} - {text}", status_code=status_code)
+
+    def _unexpected_error_response(self, error: Exception) -> Dict[str, Any]:
+        return self._error_response(f"Erro inesperado ao comunicar com n8n: {str(error)}")
+
+    # Circuit breaker, bulkhead e métricas
+
+    # Métricas importadas só com METRICS_ENABLED (como em config/database.py): o
+    # prometheus_client não é carregado quando elas estão desligadas
+
+    @staticmethod
+    def _count_rejection(response: Dict[str, Any]):
+        if settings.METRICS_ENABLED:
+            from monitoring.metrics import count_n8n_rejection
+            count_n8n_rejection(response)
+
+    @staticmethod
+    def _observe_call(operation: str, response: Optional[Dict[str, Any]], duration: float):
+        if settings.METRICS_ENABLED:
+            from monitoring.metrics import observe_n8n_call
+            observe_n8n_call(operation, response, duration)
+
+    @staticmethod
+    def _is_upstream_failure(response: Dict[str, Any]) -> bool:
+        """Falhas que indicam n8n indisponível: conexão, timeout e 5xx (4xx não contam)"""
+        if response['success']:
+            return False
+        status_code = response.get('status_code')
+        return status_code is None or status_code >= 500
+
+    def _circuit_rejection(self) -> Optional[Dict[str, Any]]:
+        """Resposta de erro se o circuit breaker recusa a chamada; None se ela pode seguir"""
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow_request():
+            response = self._error_response(CONNECTION_ERROR_MESSAGE)
+            response['circuit_open'] = True
+            self._count_rejection(response)
+            return response
+        return None
+
+    def _bulkhead_rejection(self) -> Dict[str, Any]:
+        """Resposta de erro do bulkhead cheio (a vaga no circuit breaker é devolvida)"""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.cancel()
+        response = self._error_response(BULKHEAD_FULL_MESSAGE)
+        response['bulkhead_full'] = True
+        self._count_rejection(response)
+        return response
+
+    def _release(self, response: Optional[Dict[str, Any]], started: float, operation: str = 'send'):
+        """
+        Libera o bulkhead e registra o resultado no circuit breaker e nas métricas
+        (None: chamada abandonada)
+        """
+        self._observe_call(operation, response, time.monotonic() - started)
+        if self.bulkhead is not None:
+            self.bulkhead.release()
+        if self.circuit_breaker is not None:
+            if response is None:
+                self.circuit_breaker.cancel()
+            else:
+                self.circuit_breaker.record(self._is_upstream_failure(response), time.monotonic() - started)
+
+    # Streaming
+
+    def _parse_stream_line(self, line: str, pending_lines: list) -> Optional[str]:
+        """
+        Interpreta uma linha do streaming do n8n
+
+        Returns:
+            O texto a repassar, ou None (linha vazia, evento de controle ou linha
+            guardada em pending_lines para o final)
+
+        Raises:
+            ValueError: Evento de erro reportado pelo n8n
+        """
+        if not line:
+            return None
+        try:
+            event = json.loads(line)
+        except ValueError:
+            pending_lines.append(line)
+            return None
+
+        if isinstance(event, dict) and 'type' in event:
+            if event['type'] == 'item' and event.get('content'):
+                return str(event['content'])
+            if event['type'] == 'error':
+                raise ValueError(event.get('content') or 'Erro reportado pelo n8n durante o streaming')
+            # begin/end e outros eventos de controle não carregam texto
+            return None
+
+        return self._extract_message(event)
+
+    def _flush_stream_lines(self, pending_lines: list, emitted: bool) -> str:
+        """Texto das linhas acumuladas (JSON em várias linhas ou texto puro)"""
+        body = '\n'.join(pending_lines)
+        try:
+            return self._extract_message(json.loads(body))
+        except ValueError:
+            return body if not emitted else '\n' + body
@@ -1,12 +1,25 @@
 import requests
 import logging
-import os
-from typing import Dict, Any, Optional
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Optional, Iterator, Callable
+from pymongo.collection import Collection
 from config.settings import settings
+from gateways.n8n_base import BaseN8nGateway, CONNECTION_ERROR_MESSAGE
+from gateways.response_cache import ResponseCache, cache_key
+from gateways.single_flight import SingleFlight
+from gateways.circuit_breaker import CircuitBreaker, Bulkhead
 
 logger = logging.getLogger(__name__)
 
-class N8nGateway:
+# Retentativas de leitura/status só para métodos idempotentes. Erros de conexão
+# (a requisição nem chegou ao n8n) são retentados para qualquer método.
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+RETRY_STATUS_CODES = (502, 503, 504)
+
+class N8nGateway(BaseN8nGateway):
     """
     Gateway para comunicação com o n8n via webhook
     
@@ -14,72 +27,148 @@ class N8nGateway:
     para comunicação interna entre containers na mesma rede.
     """
     
-    def __init__(self, base_url: str = None):
+    def __init__(self, base_url: str = None, cache: Optional[ResponseCache] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 bulkhead: Optional[Bulkhead] = None):
         """
-        Inicializa o gateway do n8n
-        
-        Args:
-            base_url: URL base do n8n. Se None, usa variável de ambiente N8N_URL
-                     ou padrão 'http://observatorio_n8n:5678' para Docker
+        Inicializa o gateway do n8n (argumentos em BaseN8nGateway)
         """
-        if base_url is None:
-            # Prioridade: variável de ambiente > nome do container Docker > localhost
-            base_url = os.getenv('N8N_URL', 'http://observatorio_n8n:5678')
-        
-        self.base_url = base_url
-        self.webhook_init_url = f"{base_url}/webhook-test/n8n/init"
+        super().__init__(base_url, cache, single_flight, circuit_breaker, bulkhead)
+        self.session = self._create_session()
         
         logger.info(f"N8nGateway inicializado com URL: {self.base_url}")
     
-    def _extract_message(self, response_data: Any) -> str:
+    def _create_session(self) -> requests.Session:
+        """
+        Cria a sessão HTTP com pool de conexões keep-alive
+
+        A sessão é compartilhada entre threads: ela não é alterada depois de criada
+        e o pool do urllib3 é thread-safe.
+        """
+        retry = Retry(
+            total=settings.N8N_MAX_RETRIES,
+            connect=settings.N8N_MAX_RETRIES,
+            read=settings.N8N_MAX_RETRIES,
+            status=settings.N8N_MAX_RETRIES,
+            backoff_factor=settings.N8N_RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,  # um único host (o n8n)
+            pool_maxsize=settings.N8N_POOL_MAXSIZE,
+            max_retries=retry,
+            pool_block=False
+        )
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json'})
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def _timeouts(self, read_timeout: float) -> tuple:
+        """Timeouts separados: (conexão, leitura)"""
+        return (self.connect_timeout, read_timeout)
+    
+    def get_pool_stats(self) -> Dict[str, int]:
+        """
+        Estatísticas do pool de conexões HTTP para monitoramento
+
+        Returns:
+            Dict com requisições, conexões novas, conexões reutilizadas e conexões ociosas
+        """
+        stats = {'requests': 0, 'new_connections': 0, 'reused_connections': 0, 'idle_connections': 0}
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats['requests'] += pool.num_requests
+                stats['new_connections'] += pool.num_connections
+                if pool.pool is not None:
+                    stats['idle_connections'] += pool.pool.qsize()
+        stats['reused_connections'] = max(stats['requests'] - stats['new_connections'], 0)
+        return stats
+    
+    def close(self):
+        """Fecha as conexões do pool"""
+        self.session.close()
+    
+    def send_chat_input(self, chat_input: str, timeout: int = None, use_cache: bool = True) -> Dict[str, Any]:
         """
-        Extrai a mensagem de resposta do N8N em diferentes formatos possíveis
+        Envia uma mensagem para o webhook do n8n
         
         Args:
-            response_data: Dados da resposta do N8N
+            chat_input: Texto da mensagem do usuário
+            timeout: Timeout de leitura em segundos (padrão: 120 segundos / 2 minutos);
+                     o timeout de conexão é N8N_CONNECT_TIMEOUT
+            use_cache: False ignora o cache de respostas (nem lê, nem grava)
             
         Returns:
-            String com a mensagem extraída
+            Dict contendo a resposta do n8n; respostas vindas do cache têm 'cached': True
         """
-        # Se a resposta já é uma string, retornar diretamente
-        if isinstance(response_data, str):
-            return response_data
-        
-        # Se for um dicionário, tentar extrair de campos conhecidos
-        if isinstance(response_data, dict):
-            # Tentar campo 'output' (formato atual do N8N)
-            if 'output' in response_data:
-                return str(response_data['output'])
-            
-            # Tentar outros campos comuns
-            for field in ['message', 'text', 'response', 'result', 'answer', 'content']:
-                if field in response_data:
-                    return str(response_data[field])
-            
-            # Se tiver apenas um campo, retornar seu valor
-            if len(response_data) == 1:
-                return str(list(response_data.values())[0])
-        
-        # Se for uma lista, tentar extrair da primeira posição
-        if isinstance(response_data, list) and len(response_data) > 0:
-            return self._extract_message(response_data[0])
-        
-        # Fallback: converter para string
-        return str(response_data)
-    
-    def send_chat_input(self, chat_input: str, timeout: int = None) -> Dict[str, Any]:
+        cached = self._cached(chat_input, use_cache)
+        if cached is not None:
+            logger.info(f"Resposta do n8n servida do cache: {chat_input[:50]}...")
+            return cached
+
+        if self.single_flight is not None:
+            # Perguntas idênticas simultâneas compartilham uma única chamada ao n8n
+            response, shared = self.single_flight.do(
+                cache_key(chat_input),
+                lambda: self._post_chat_input(chat_input, timeout)
+            )
+            if shared:
+                logger.info(f"Resposta do n8n compartilhada com chamada simultânea: {chat_input[:50]}...")
+                response['coalesced'] = True
+                return response
+        else:
+            response = self._post_chat_input(chat_input, timeout)
+
+        self._store(chat_input, response, use_cache)
+        return response
+
+    def _admit(self) -> Optional[Dict[str, Any]]:
         """
-        Envia uma mensagem para o webhook do n8n
+        Passa pelo circuit breaker e pelo bulkhead antes de chamar o n8n
+
+        Returns:
+            None se a chamada pode seguir; senão a resposta de erro para devolver imediatamente
+        """
+        rejection = self._circuit_rejection()
+        if rejection is None and self.bulkhead is not None and not self.bulkhead.acquire():
+            rejection = self._bulkhead_rejection()
+        return rejection
+
+    def _post_chat_input(self, chat_input: str, timeout: int = None) -> Dict[str, Any]:
+        """
+        Chama o webhook do n8n protegido pelo circuit breaker e pelo bulkhead
+        """
+        rejection = self._admit()
+        if rejection is not None:
+            return rejection
+
+        started = time.monotonic()
+        response = None
+        try:
+            response = self._request_chat_input(chat_input, timeout)
+            return response
+        finally:
+            self._release(response, started)
+
+    def _request_chat_input(self, chat_input: str, timeout: int = None) -> Dict[str, Any]:
+        """
+        Faz a chamada ao webhook do n8n, sem cache
         
         Args:
             chat_input: Texto da mensagem do usuário
-            timeout: Timeout da requisição em segundos (padrão: 120 segundos / 2 minutos)
+            timeout: Timeout de leitura em segundos (padrão: N8N_TIMEOUT)
             
         Returns:
             Dict contendo a resposta do n8n
-            
-        Raises:
-            Exception: Se houver erro na comunicação com o n8n
         """
         # Usa timeout configurado se não for especificado
         if timeout is None:
@@ -92,11 +181,10 @@ class N8nGateway:
             
             logger.info(f"Enviando mensagem para n8n: {chat_input[:50]}... (timeout: {timeout}s)")
             
-            response = requests.post(
+            response = self.session.post(
                 self.webhook_init_url,
                 json=payload,
-                timeout=timeout,
-                headers={'Content-Type': 'application/json'}
+                timeout=self._timeouts(timeout)
             )
             
             # Verificar se a resposta foi bem-sucedida
@@ -105,68 +193,138 @@ class N8nGateway:
             # Tentar parsear a resposta JSON
             try:
                 response_data = response.json()
-                logger.info(f"Resposta recebida do n8n com sucesso")
+                logger.info("Resposta recebida do n8n com sucesso")
                 
                 # Extrair a mensagem de resposta em diferentes formatos possíveis
-                message = self._extract_message(response_data)
-                
-                return {
-                    'success': True,
-                    'message': message,  # String única para o frontend
-                    'data': response_data,  # Dados completos para debug
-                    'status_code': response.status_code
-                }
+                return self._success_response(response_data, response.status_code)
             except ValueError:
                 # Se não for JSON, retornar o texto da resposta
                 logger.warning("Resposta do n8n não é JSON válido")
-                return {
-                    'success': True,
-                    'message': response.text,  # String única para o frontend
-                    'data': {'response': response.text},
-                    'status_code': response.status_code
-                }
+                return self._text_response(response.text, response.status_code)
                 
         except requests.exceptions.Timeout:
-            error_msg = f"Timeout ao conectar com n8n (>{timeout}s)"
-            logger.error(error_msg)
-            return {
-                'success': False,
-                'message': error_msg,  # String única para o frontend
-                'error': error_msg,
-                'data': None
-            }
+            return self._timeout_response(timeout)
             
         except requests.exceptions.ConnectionError:
-            error_msg = "Erro de conexão com n8n. Verifique se o serviço está rodando."
-            logger.error(error_msg)
-            return {
-                'success': False,
-                'message': error_msg,  # String única para o frontend
-                'error': error_msg,
-                'data': None
-            }
+            return self._error_response(CONNECTION_ERROR_MESSAGE)
             
         except requests.exceptions.HTTPError as e:
-            error_msg = f"Erro HTTP do n8n: {e.response.status_code} - {e.response.text}"
-            logger.error(error_msg)
-            return {
-                'success': False,
-                'message': error_msg,  # String única para o frontend
-                'error': error_msg,
-                'status_code': e.response.status_code,
-                'data': None
-            }
+            return self._http_error_response(e.response.status_code, e.response.text)
             
         except Exception as e:
-            error_msg = f"Erro inesperado ao comunicar com n8n: {str(e)}"
-            logger.error(error_msg)
-            return {
-                'success': False,
-                'message': error_msg,  # String única para o frontend
-                'error': error_msg,
-                'data': None
-            }
+            return self._unexpected_error_response(e)
     
+    def _iter_stream_chunks(self, response: requests.Response) -> Iterator[str]:
+        """
+        Extrai os trechos de texto de uma resposta em streaming do n8n
+
+        - text/plain: repassa os bytes conforme chegam
+        - NDJSON (formato de streaming do n8n): uma linha JSON por evento,
+          com o texto nos eventos {"type": "item", "content": ...}
+        - JSON comum (webhook sem streaming): um único trecho com a mensagem completa
+        """
+        content_type = response.headers.get('Content-Type', '')
+
+        if content_type.startswith('text/plain'):
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+            return
+
+        # Linhas que não são JSON isolado (ex.: JSON formatado em várias linhas)
+        # são acumuladas e interpretadas no final
+        pending_lines = []
+        emitted = False
+        for line in response.iter_lines(decode_unicode=True):
+            chunk = self._parse_stream_line(line, pending_lines)
+            if chunk is not None:
+                emitted = True
+                yield chunk
+
+        if pending_lines:
+            yield self._flush_stream_lines(pending_lines, emitted)
+
+    def stream_chat_input(self, chat_input: str, timeout: int = None,
+                          use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Envia uma mensagem para o webhook do n8n e repassa a resposta em partes
+
+        Args:
+            chat_input: Texto da mensagem do usuário
+            timeout: Timeout de leitura entre partes, em segundos (padrão: N8N_TIMEOUT)
+            use_cache: False ignora o cache de respostas
+
+        Yields:
+            {'type': 'chunk', 'content': str} para cada trecho recebido e, por último,
+            {'type': 'done', 'response': Dict} com a resposta completa no mesmo
+            formato de send_chat_input. Webhooks sem streaming geram um único trecho.
+        """
+        cached = self._cached(chat_input, use_cache)
+        if cached is not None:
+            yield {'type': 'chunk', 'content': cached['message']}
+            yield {'type': 'done', 'response': cached}
+            return
+
+        rejection = self._admit()
+        if rejection is not None:
+            yield {'type': 'done', 'response': rejection}
+            return
+
+        started = time.monotonic()
+        final = None
+        try:
+            for event in self._stream_upstream(chat_input, timeout):
+                if event['type'] == 'chunk':
+                    yield event
+                else:
+                    final = event['response']
+        finally:
+            # Cliente desconectado no meio (final None) não conta como falha do n8n
+            self._release(final, started, 'stream')
+
+        self._store(chat_input, final, use_cache)
+        yield {'type': 'done', 'response': final}
+
+    def _stream_upstream(self, chat_input: str, timeout: int = None) -> Iterator[Dict[str, Any]]:
+        """
+        Faz a chamada em streaming ao webhook do n8n (sem cache nem proteções)
+        """
+        if timeout is None:
+            timeout = settings.N8N_TIMEOUT
+
+        parts = []
+        try:
+            logger.info(f"Enviando mensagem em streaming para n8n: {chat_input[:50]}... (timeout: {timeout}s)")
+
+            with self.session.post(
+                self.webhook_init_url,
+                json={"chatInput": chat_input},
+                timeout=self._timeouts(timeout),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+
+                for chunk in self._iter_stream_chunks(response):
+                    parts.append(chunk)
+                    yield {'type': 'chunk', 'content': chunk}
+
+                logger.info(f"Streaming do n8n concluído ({len(parts)} partes)")
+                final = self._stream_response(parts, response.status_code)
+
+        except requests.exceptions.Timeout:
+            final = self._timeout_response(timeout)
+
+        except requests.exceptions.ConnectionError:
+            final = self._error_response(CONNECTION_ERROR_MESSAGE)
+
+        except requests.exceptions.HTTPError as e:
+            final = self._http_error_response(e.response.status_code, e.response.text)
+
+        except Exception as e:
+            final = self._unexpected_error_response(e)
+
+        yield {'type': 'done', 'response': final}
+
     def check_health(self) -> bool:
         """
         Verifica se o n8n está disponível
@@ -175,8 +333,97 @@ class N8nGateway:
             bool: True se o n8n está respondendo, False caso contrário
         """
         try:
-            response = requests.get(self.base_url, timeout=5)
-            return response.status_code in [200, 302, 404]  # 404 pode ser ok se a rota raiz não existir
+            self.ping(5)
+            return True
         except Exception as e:
             logger.error(f"n8n health check falhou: {str(e)}")
             return False
+
+    def ping(self, timeout: float):
+        """
+        Consulta a raiz do n8n com prazo de `timeout` segundos (prober de saúde)
+
+        Raises:
+            requests.RequestException, RuntimeError: n8n inacessível ou respondeu com erro
+        """
+        response = self.session.get(self.base_url, timeout=(min(self.connect_timeout, timeout), timeout))
+        if response.status_code not in [200, 302, 404]:  # 404 pode ser ok se a rota raiz não existir
+            raise RuntimeError(f"n8n respondeu {response.status_code}")
+
+
+_shared_gateway: Optional[N8nGateway] = None
+_shared_gateway_lock = threading.Lock()
+
+
+def get_n8n_gateway() -> N8nGateway:
+    """
+    Retorna o gateway compartilhado do processo (um único pool de conexões por worker)
+    """
+    global _shared_gateway
+    if _shared_gateway is None:
+        with _shared_gateway_lock:
+            if _shared_gateway is None:
+                _shared_gateway = N8nGateway(
+                    cache=_build_response_cache(),
+                    single_flight=_build_single_flight(),
+                    circuit_breaker=CircuitBreaker(
+                        name='n8n',
+                        failure_rate_threshold=settings.N8N_BREAKER_FAILURE_RATE,
+                        slow_call_threshold=settings.N8N_BREAKER_SLOW_CALL_SECONDS,
+                        slow_call_rate_threshold=settings.N8N_BREAKER_SLOW_CALL_RATE,
+                        window_size=settings.N8N_BREAKER_WINDOW_SIZE,
+                        minimum_calls=settings.N8N_BREAKER_MINIMUM_CALLS,
+                        open_duration=settings.N8N_BREAKER_OPEN_SECONDS,
+                        half_open_max_calls=settings.N8N_BREAKER_HALF_OPEN_CALLS
+                    ),
+                    bulkhead=Bulkhead(
+                        name='n8n',
+                        max_concurrent=settings.N8N_BULKHEAD_MAX_CONCURRENT,
+                        max_wait=settings.N8N_BULKHEAD_MAX_WAIT
+                    )
+                )
+    return _shared_gateway
+
+
+def reset_n8n_gateway():
+    """
+    Descarta o gateway herdado do processo pai (gunicorn post_fork)
+
+    O pool de conexões HTTP da sessão não pode ser dividido entre processos; o
+    próximo get_n8n_gateway() cria um gateway novo no processo filho.
+    """
+    global _shared_gateway
+    with _shared_gateway_lock:
+        _shared_gateway = None
+
+
+def _collection_getter(name: str) -> Callable[[], Collection]:
+    """Coleção do MongoDB resolvida a cada uso (o cliente é criado sob demanda)"""
+    from config.database import db_config
+
+    def collection_getter() -> Collection:
+        return db_config.get_database().get_collection(name)
+
+    return collection_getter
+
+
+def _build_response_cache() -> Optional[ResponseCache]:
+    """Cria o cache de respostas conforme as configurações (None se desativado)"""
+    if not settings.N8N_CACHE_ENABLED:
+        return None
+
+    collection_getter = _collection_getter('n8n_response_cache') if settings.N8N_CACHE_MONGO_ENABLED else None
+    return ResponseCache(settings.N8N_CACHE_MAX_ENTRIES, settings.N8N_CACHE_TTL, collection_getter)
+
+
+def _build_single_flight() -> Optional[SingleFlight]:
+    """Cria a coalescência de chamadas conforme as configurações (None se desativada)"""
+    if not settings.N8N_SINGLE_FLIGHT_ENABLED:
+        return None
+
+    collection_getter = _collection_getter('n8n_inflight') if settings.N8N_SINGLE_FLIGHT_MONGO_ENABLED else None
+    return SingleFlight(
+        lease_ttl=settings.N8N_TIMEOUT + 30,
+        poll_interval=settings.N8N_SINGLE_FLIGHT_POLL_INTERVAL,
+        collection_getter=collection_getter
+    )
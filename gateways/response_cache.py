@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable
+
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_chat_input(chat_input: str) -> str:
+    """
+    Normaliza a pergunta para comparação: ignora maiúsculas, acentos e espaços extras
+
+    "Dados da  Indústria Têxtil" e "dados da industria textil" geram o mesmo texto.
+    """
+    text = unicodedata.normalize('NFKD', chat_input)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
+
+
+def cache_key(chat_input: str) -> str:
+    """Chave estável (sha256 do texto normalizado), usada nos dois níveis do cache"""
+    return hashlib.sha256(normalize_chat_input(chat_input).encode('utf-8')).hexdigest()
+
+
+def cache_allowed(headers) -> bool:
+    """O cliente pode ignorar o cache de respostas com 'Cache-Control: no-cache' (headers do Flask ou do Quart)"""
+    return 'no-cache' not in headers.get('Cache-Control', '')
+
+
+class ResponseCache:
+    """
+    Cache de respostas do n8n em dois níveis
+
+    - Memória: LRU por processo, com expiração por entrada
+    - MongoDB (opcional): compartilhado entre workers, expirado por índice TTL em expires_at
+
+    Falhas do MongoDB nunca propagam: o cache degrada para um miss.
+    """
+
+    def __init__(self, max_entries: int, ttl: int,
+                 collection_getter: Optional[Callable[[], Collection]] = None):
+        """
+        Args:
+            max_entries: Máximo de entradas no nível em memória
+            ttl: Tempo de vida padrão das entradas, em segundos
+            collection_getter: Função que retorna a coleção do nível compartilhado (None desativa)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._collection_getter = collection_getter
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'mongo_hits': 0, 'misses': 0, 'stores': 0}
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def _set_memory(self, key: str, response: Dict[str, Any], ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, chat_input: str) -> Optional[Dict[str, Any]]:
+        """Busca a resposta em memória e, se não houver, no MongoDB"""
+        key = cache_key(chat_input)
+
+        response = self._get_memory(key)
+        if response is not None:
+            self._count('memory_hits')
+            return dict(response)
+
+        if self._collection_getter is not None:
+            try:
+                now = datetime.utcnow()
+                # O monitor TTL roda a cada ~60s: o filtro evita servir entradas já vencidas
+                doc = self._collection_getter().find_one({'_id': key, 'expires_at': {'$gt': now}})
+                if doc:
+                    response = json.loads(doc['response_json'])
+                    self._set_memory(key, response, (doc['expires_at'] - now).total_seconds())
+                    self._count('mongo_hits')
+                    return dict(response)
+            except Exception as e:
+                logger.warning(f"Falha ao ler cache de respostas no MongoDB: {str(e)}")
+
+        self._count('misses')
+        return None
+
+    def set(self, chat_input: str, response: Dict[str, Any], ttl: Optional[int] = None):
+        """Armazena uma resposta bem-sucedida nos dois níveis"""
+        if not response.get('success'):
+            return
+        if ttl is None:
+            ttl = self.ttl
+
+        key = cache_key(chat_input)
+        response = {k: v for k, v in response.items() if k != 'cached'}
+        self._set_memory(key, response, ttl)
+        self._count('stores')
+
+        if self._collection_getter is not None:
+            try:
+                now = datetime.utcnow()
+                self._collection_getter().replace_one(
+                    {'_id': key},
+                    {
+                        '_id': key,
+                        'response_json': json.dumps(response, default=str),
+                        'create_at': now,
+                        'expires_at': now + timedelta(seconds=ttl)
+                    },
+                    upsert=True
+                )
+            except Exception as e:
+                logger.warning(f"Falha ao gravar cache de respostas no MongoDB: {str(e)}")
+
+    def clear(self):
+        """Limpa o nível em memória"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de acerto/erro para monitoramento"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['mongo_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['mongo_hits']) / lookups, 4) if lookups else 0.0
+        stats['shared_tier'] = self._collection_getter is not None
+        return stats
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, Tuple, Awaitable
+
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Tempo extra que o documento de lease fica no MongoDB após a chamada, só para limpeza
+LEASE_CLEANUP_GRACE = 60  # segundos
+
+
+class _Call:
+    """Chamada em andamento compartilhada entre threads do mesmo processo"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalescência de chamadas idênticas simultâneas ao n8n
+
+    Chamadores concorrentes com a mesma chave compartilham uma única chamada:
+    o primeiro (líder) executa, os demais aguardam e recebem o mesmo resultado.
+
+    - Entre threads: um threading.Event por chave em andamento
+    - Entre workers (opcional): um documento de lease no MongoDB com _id = chave.
+      Quem consegue o lease chama o n8n e grava o resultado no documento; os
+      demais consultam o documento até o resultado do mesmo dono aparecer.
+
+    Nada é reaproveitado depois que a chamada termina: um lease já concluído
+    é assumido pelo próximo chamador, que faz uma nova chamada.
+    """
+
+    def __init__(self, lease_ttl: int, poll_interval: float,
+                 collection_getter: Optional[Callable[[], Collection]] = None):
+        """
+        Args:
+            lease_ttl: Validade do lease entre workers, em segundos (deve cobrir a chamada ao n8n)
+            poll_interval: Intervalo de consulta dos seguidores de outros workers, em segundos
+            collection_getter: Função que retorna a coleção de leases (None desativa o modo entre workers)
+        """
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self._collection_getter = collection_getter
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._counters = {'leaders': 0, 'local_followers': 0, 'remote_followers': 0}
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def do(self, key: str, fn: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Executa fn uma única vez para chamadas simultâneas com a mesma chave
+
+        Returns:
+            (resultado, compartilhado) — compartilhado é True se o resultado veio de outro chamador
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self._counters['local_followers'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return dict(call.result), True
+
+        try:
+            call.result, shared = self._run_across_workers(key, fn)
+            return dict(call.result), shared
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run_across_workers(self, key: str, fn: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        if self._collection_getter is None:
+            self._count('leaders')
+            return fn(), False
+
+        owner = uuid.uuid4().hex
+        while True:
+            try:
+                collection = self._collection_getter()
+                current = self._acquire_lease(collection, key, owner)
+                if current is None:
+                    break
+                result = self._wait_for_result(collection, key, current['owner'])
+            except Exception as e:
+                # O lease é só uma otimização: sem MongoDB, chama o n8n diretamente
+                logger.warning(f"Falha na coalescência via MongoDB: {str(e)}")
+                self._count('leaders')
+                return fn(), False
+
+            if result is not None:
+                self._count('remote_followers')
+                return result, True
+            # O líder morreu ou o lease mudou de dono: tenta assumir novamente
+
+        self._count('leaders')
+        result = fn()
+        try:
+            now = datetime.utcnow()
+            collection.update_one(
+                {'_id': key, 'owner': owner},
+                {'$set': {
+                    'status': 'done',
+                    'response_json': json.dumps(result, default=str),
+                    'finished_at': now,
+                    'expires_at': now + timedelta(seconds=LEASE_CLEANUP_GRACE)
+                }}
+            )
+        except Exception as e:
+            logger.warning(f"Falha ao publicar resultado da coalescência no MongoDB: {str(e)}")
+        return result, False
+
+    def _acquire_lease(self, collection: Collection, key: str, owner: str) -> Optional[Dict[str, Any]]:
+        """
+        Tenta obter o lease da chave
+
+        Returns:
+            None se o lease foi obtido; senão o documento do lease em andamento de outro dono
+        """
+        while True:
+            now = datetime.utcnow()
+            lease_expires_at = now + timedelta(seconds=self.lease_ttl)
+            lease = {
+                'owner': owner,
+                'status': 'running',
+                'lease_expires_at': lease_expires_at,
+                'response_json': None,
+                'create_at': now,
+                'expires_at': lease_expires_at + timedelta(seconds=LEASE_CLEANUP_GRACE)
+            }
+            try:
+                collection.insert_one({'_id': key, **lease})
+                return None
+            except DuplicateKeyError:
+                pass
+
+            # Lease concluído (de uma rajada anterior) ou expirado: assume como líder
+            taken = collection.find_one_and_update(
+                {'_id': key, '$or': [{'status': 'done'}, {'lease_expires_at': {'$lte': now}}]},
+                {'$set': lease},
+                return_document=ReturnDocument.AFTER
+            )
+            if taken is not None:
+                return None
+
+            current = collection.find_one({'_id': key}, {'owner': 1, 'status': 1})
+            if current is not None and current['status'] == 'running':
+                return current
+            # Documento removido ou concluído entre as consultas: tenta de novo
+
+    def _wait_for_result(self, collection: Collection, key: str, owner: str) -> Optional[Dict[str, Any]]:
+        """Aguarda o resultado do líder; retorna None se o lease expirar ou trocar de dono"""
+        while True:
+            time.sleep(self.poll_interval)
+            doc = collection.find_one({'_id': key})
+            if doc is None or doc['owner'] != owner:
+                return None
+            if doc['status'] == 'done':
+                return json.loads(doc['response_json'])
+            if doc['lease_expires_at'] <= datetime.utcnow():
+                return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de líderes e seguidores para monitoramento"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._calls)
+        stats['shared_tier'] = self._collection_getter is not None
+        return stats
+
+
+class AsyncSingleFlight:
+    """
+    Coalescência de chamadas idênticas simultâneas entre corrotinas do mesmo processo (app ASGI)
+
+    Mesma semântica do SingleFlight sem o modo entre workers: um único processo
+    ASGI já concentra as requisições que antes ficavam espalhadas em threads.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._counters = {'leaders': 0, 'local_followers': 0, 'remote_followers': 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Executa fn uma única vez para chamadas simultâneas com a mesma chave
+
+        Returns:
+            (resultado, compartilhado) — compartilhado é True se o resultado veio de outro chamador
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if shared:
+            self._counters['local_followers'] += 1
+        else:
+            # A chamada roda na sua própria task: nenhum chamador (nem o líder) a cancela
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda task: self._forget(key, task))
+            self._counters['leaders'] += 1
+        # shield: um chamador cancelado (cliente desconectou) não cancela a chamada dos demais
+        return dict(await asyncio.shield(call)), shared
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Evita o aviso de exceção não lida quando todos os chamadores foram cancelados
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._counters)
+        stats['in_flight'] = len(self._calls)
+        stats['shared_tier'] = False
+        return stats
@@ -0,0 +1,115 @@
+"""
+Configuração do gunicorn (app WSGI de produção)
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+A app é carregada uma vez no processo mestre (preload_app) e os workers herdam o
+código já importado. Conexões não sobrevivem ao fork: o cliente do MongoDB, o
+pool do PostgreSQL e a sessão HTTP do n8n são recriados em cada worker (post_fork).
+O pool do bcrypt, as threads de exclusão em cascata e as do prober de saúde
+já se recriam sozinhos quando percebem outro pid. As métricas do /metrics são
+somadas entre os workers por arquivos em PROMETHEUS_MULTIPROC_DIR.
+
+Classe de worker (GUNICORN_WORKER_CLASS):
+- gthread (padrão): GUNICORN_THREADS threads por worker; a espera pelo n8n não
+  ocupa o processo inteiro
+- sync: uma requisição por worker; só serve com respostas assíncronas do bot
+  (ASYNC_REPLY_ENABLED), senão cada chamada ao n8n prende um worker
+- gevent: GUNICORN_WORKER_CONNECTIONS requisições cooperativas por worker;
+  requer o pacote gevent
+"""
+
+import multiprocessing
+import os
+import shutil
+
+from config.settings import settings
+
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
+worker_class = settings.GUNICORN_WORKER_CLASS
+if worker_class not in WORKER_CLASSES:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS inválido: {worker_class} (use {', '.join(WORKER_CLASSES)})")
+
+if worker_class == 'gevent':
+    # Antes de carregar a app (preload_app): sockets, locks e o ssl já nascem cooperativos
+    try:
+        from gevent import monkey
+    except ImportError as e:
+        raise RuntimeError("GUNICORN_WORKER_CLASS=gevent requer o pacote gevent") from e
+    monkey.patch_all()
+
+
+if settings.METRICS_ENABLED:
+    # Antes de carregar a app: o prometheus_client escolhe o modo multiprocesso ao ser importado.
+    # Arquivos de uma execução anterior somariam contadores de workers que já não existem
+    metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', settings.PROMETHEUS_MULTIPROC_DIR)
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def default_workers(worker_class: str, cpus: int) -> int:
+    """Workers por núcleo: sync precisa de mais processos, já que cada um atende uma requisição"""
+    if worker_class == 'sync':
+        return cpus * 2 + 1
+    if worker_class == 'gthread':
+        return cpus + 1
+    return cpus
+
+
+bind = settings.GUNICORN_BIND
+workers = settings.GUNICORN_WORKERS or default_workers(worker_class, multiprocessing.cpu_count())
+threads = settings.GUNICORN_THREADS if worker_class == 'gthread' else 1
+worker_connections = settings.GUNICORN_WORKER_CONNECTIONS
+preload_app = True
+
+# Uma resposta síncrona do bot pode esperar o n8n até N8N_TIMEOUT: o worker não pode ser
+# morto antes disso, e um reload/desligamento espera as chamadas em andamento
+timeout = int(settings.N8N_TIMEOUT + settings.N8N_CONNECT_TIMEOUT) + 30
+graceful_timeout = timeout
+keepalive = 5
+
+max_requests = settings.GUNICORN_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    server.log.info(
+        f"gunicorn: {workers} workers {worker_class}"
+        + (f" x {threads} threads" if worker_class == 'gthread' else '')
+        + f", timeout {timeout}s"
+    )
+
+
+def post_fork(server, worker):
+    """Recria no worker as conexões que o mestre possa ter aberto ao carregar a app"""
+    from config.database import db_config
+    from config.postgres import postgres_config
+    from gateways.n8n_gateway import reset_n8n_gateway
+    import routes
+
+    db_config.reset_after_fork()
+    postgres_config.reset_after_fork()
+    reset_n8n_gateway()
+    routes.init_controllers()
+    routes.health_prober.start()
+
+
+def worker_exit(server, worker):
+    from passwords import password_verifier
+    import routes
+
+    routes.health_prober.stop()
+    password_verifier.shutdown()
+
+
+def child_exit(server, worker):
+    """Tira das métricas somadas os gauges do worker que saiu (requisições em andamento, conexões)"""
+    if settings.METRICS_ENABLED:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
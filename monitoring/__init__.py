@@ -0,0 +1,6 @@
+"""
+Monitoring - Saúde das dependências da API
+
+O processo web lê o último resultado das verificações; quem consulta as
+dependências são threads/tarefas de fundo.
+"""
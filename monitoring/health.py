@@ -0,0 +1,233 @@
+"""
+Saúde das dependências (MongoDB, PostgreSQL, n8n) verificada em segundo plano
+
+Cada dependência é verificada no seu intervalo (HEALTH_*_INTERVAL) por uma thread
+(app WSGI) ou tarefa do event loop (app ASGI) própria, e o resultado fica num
+snapshot em memória: /api/health só lê o snapshot, então as sondas do balanceador
+não viram tráfego nos bancos. Uma verificação presa além de HEALTH_PROBE_TIMEOUT
+aparece como falha mesmo que o cliente ainda não tenha desistido.
+
+Estado geral:
+- healthy: todas as dependências respondem
+- degraded: uma dependência não crítica (PostgreSQL, n8n) falhou ou o circuito do n8n está aberto
+- partial: alguma dependência ainda não foi verificada neste processo
+- unhealthy: o MongoDB (crítico) falhou
+"""
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+from config.settings import settings
+
+logger = structlog.get_logger(__name__)
+
+# Folga além do timeout antes de considerar presa uma verificação em andamento
+OVERDUE_GRACE = 1.0
+
+
+@dataclass(frozen=True)
+class Probe:
+    """Verificação de uma dependência: check(timeout) levanta exceção quando ela falha"""
+    name: str
+    check: Callable[[float], Any]
+    interval: float
+    timeout: float
+    critical: bool = False
+
+
+def error_message(error: Exception) -> str:
+    return str(error) or type(error).__name__
+
+
+def overall_status(dependencies: Dict[str, Dict[str, Any]]) -> str:
+    """healthy, degraded, partial ou unhealthy (ver docstring do módulo)"""
+    statuses = [(dependency['status'], dependency['critical']) for dependency in dependencies.values()]
+    if ('down', True) in statuses:
+        return 'unhealthy'
+    if any(status == 'down' for status, _ in statuses):
+        return 'degraded'
+    if any(status == 'unknown' for status, _ in statuses):
+        return 'partial'
+    return 'healthy'
+
+
+class HealthProber:
+    """Verifica as dependências em threads de fundo e guarda o último resultado de cada uma"""
+
+    def __init__(self, probes: List[Probe]):
+        # Intervalo 0 desliga a verificação da dependência
+        self.probes = [probe for probe in probes if probe.interval > 0]
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._running_since: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._pid: Optional[int] = None
+
+    def start(self):
+        """Inicia as threads no processo atual (threads não sobrevivem ao fork do gunicorn)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._results.clear()
+            self._running_since.clear()
+        for probe in self.probes:
+            threading.Thread(target=self._loop, args=(probe, self._stop),
+                             name=f"health-{probe.name}", daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            self._pid = None
+
+    def _loop(self, probe: Probe, stop: threading.Event):
+        while not stop.is_set():
+            started = self._begin(probe)
+            try:
+                probe.check(probe.timeout)
+                error = None
+            except Exception as e:
+                error = error_message(e)
+            self._record(probe, started, error)
+            stop.wait(probe.interval)
+
+    def _begin(self, probe: Probe) -> float:
+        started = time.monotonic()
+        with self._lock:
+            self._running_since[probe.name] = started
+        return started
+
+    def _record(self, probe: Probe, started: float, error: Optional[str]):
+        latency = time.monotonic() - started
+        status = 'up' if error is None else 'down'
+        with self._lock:
+            self._running_since.pop(probe.name, None)
+            previous = self._results.get(probe.name)
+            failures = 0 if error is None else (previous['consecutive_failures'] if previous else 0) + 1
+            self._results[probe.name] = {
+                'status': status,
+                'latency_ms': round(latency * 1000, 1),
+                'error': error,
+                'checked_at': datetime.utcnow(),
+                'consecutive_failures': failures,
+            }
+
+        if previous is None or previous['status'] != status:
+            log = logger.info if status == 'up' else logger.warning
+            log("Saúde da dependência", dependency=probe.name, status=status, error=error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Último resultado de cada dependência, sem consultar nenhuma delas
+
+        Returns:
+            {'status': estado geral, 'dependencies': {nome: {status, latency_ms, error,
+             checked_at, consecutive_failures, critical}}}
+        """
+        self.start()
+        now = time.monotonic()
+        dependencies = {}
+        with self._lock:
+            for probe in self.probes:
+                result = dict(self._results.get(probe.name) or {'status': 'unknown'})
+                running_since = self._running_since.get(probe.name)
+                if running_since is not None and now - running_since > probe.timeout + OVERDUE_GRACE:
+                    result.update(status='down', error=f"sem resposta há {now - running_since:.1f}s")
+                result['critical'] = probe.critical
+                dependencies[probe.name] = result
+        return {'status': overall_status(dependencies), 'dependencies': dependencies}
+
+
+class AsyncHealthProber(HealthProber):
+    """Mesmo snapshot, com as verificações como tarefas no event loop do app ASGI"""
+
+    def __init__(self, probes: List[Probe]):
+        super().__init__(probes)
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Cria as tarefas no event loop em execução (startup do app ou primeiro /api/health)"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._loop(probe), name=f"health-{probe.name}")
+                       for probe in self.probes]
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _loop(self, probe: Probe):
+        while True:
+            started = self._begin(probe)
+            try:
+                await asyncio.wait_for(probe.check(probe.timeout), probe.timeout)
+                error = None
+            except asyncio.TimeoutError:
+                error = f"timeout ({probe.timeout}s)"
+            except Exception as e:
+                error = error_message(e)
+            self._record(probe, started, error)
+            await asyncio.sleep(probe.interval)
+
+
+def health_response(snapshot: Dict[str, Any], n8n_stats: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    Corpo e status HTTP do /api/health a partir do snapshot (mesmo contrato nos dois apps)
+
+    O circuito do n8n aberto também deixa a API degradada: ela responde, mas o chat falha.
+    """
+    status = snapshot['status']
+    breaker = n8n_stats['circuit_breaker']
+    if status in ('healthy', 'partial') and breaker is not None and breaker['state'] == 'open':
+        status = 'degraded'
+
+    # Com HEALTH_MONGODB_INTERVAL=0 o MongoDB fica fora do snapshot: estado desconhecido
+    mongodb = snapshot['dependencies'].get('mongodb', {'status': 'unknown'})
+    body = {
+        "status": status,
+        "database": {'up': 'connected', 'down': 'disconnected'}.get(mongodb['status'], 'unknown'),
+        "service": "ChatAI API",
+        "dependencies": snapshot['dependencies'],
+        "n8n": n8n_stats
+    }
+    if mongodb['status'] == 'down':
+        body["error"] = mongodb.get('error')
+    return body, 500 if status == 'unhealthy' else 200
+
+
+def create_health_prober() -> HealthProber:
+    """Prober do app WSGI (pymongo, SQLAlchemy, requests)"""
+    from config.database import db_config
+    from config.postgres import postgres_config
+    from gateways.n8n_gateway import get_n8n_gateway
+
+    timeout = settings.HEALTH_PROBE_TIMEOUT
+    return HealthProber([
+        Probe('mongodb', db_config.ping, settings.HEALTH_MONGODB_INTERVAL, timeout, critical=True),
+        Probe('postgres', lambda _: postgres_config.ping(), settings.HEALTH_POSTGRES_INTERVAL, timeout),
+        Probe('n8n', lambda t: get_n8n_gateway().ping(t), settings.HEALTH_N8N_INTERVAL, timeout),
+    ])
+
+
+def create_async_health_prober() -> AsyncHealthProber:
+    """Prober do app ASGI (motor, httpx; o PostgreSQL síncrono roda numa thread)"""
+    from config.async_database import async_db_config
+    from config.postgres import postgres_config
+    from gateways.async_n8n_gateway import get_async_n8n_gateway
+
+    timeout = settings.HEALTH_PROBE_TIMEOUT
+    return AsyncHealthProber([
+        Probe('mongodb', async_db_config.ping, settings.HEALTH_MONGODB_INTERVAL, timeout, critical=True),
+        Probe('postgres', lambda _: asyncio.to_thread(postgres_config.ping), settings.HEALTH_POSTGRES_INTERVAL, timeout),
+        Probe('n8n', lambda t: get_async_n8n_gateway().ping(t), settings.HEALTH_N8N_INTERVAL, timeout),
+    ])
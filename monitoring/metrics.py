@@ -0,0 +1,268 @@
+"""
+Métricas no formato do Prometheus (GET /metrics)
+
+- http_request_duration_seconds{method, route, status} e http_requests_in_flight
+- mongodb_command_duration_seconds{command, collection, outcome} (CommandListener do pymongo)
+- mongodb_pool_*: espera pelo checkout, falhas, conexões abertas e em uso (ConnectionPoolListener)
+- postgres_pool_*: espera pelo checkout, conexões abertas e em uso (QueuePool do SQLAlchemy)
+- n8n_request_duration_seconds{operation, outcome} e n8n_requests_rejected_total{reason}
+
+Com vários processos (workers do gunicorn) cada um grava as métricas em arquivos em
+PROMETHEUS_MULTIPROC_DIR e o /metrics de qualquer worker soma todos; sem a variável
+(servidor de desenvolvimento, app ASGI num processo) vale o registro do próprio processo.
+A variável precisa existir antes deste módulo ser importado (gunicorn.conf.py cuida disso).
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+from pymongo import monitoring
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# A resposta do bot pode levar até N8N_TIMEOUT (2 minutos por padrão)
+N8N_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180)
+# Esperas por conexão: o normal é sub-milissegundo; segundos indicam pool pequeno
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', "Duração das requisições HTTP",
+    ['method', 'route', 'status'])
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', "Requisições HTTP em andamento", multiprocess_mode='livesum')
+
+MONGODB_COMMAND_DURATION = Histogram(
+    'mongodb_command_duration_seconds', "Duração dos comandos do MongoDB",
+    ['command', 'collection', 'outcome'])
+MONGODB_POOL_CHECKOUT_WAIT = Histogram(
+    'mongodb_pool_checkout_wait_seconds', "Espera por uma conexão do pool do MongoDB",
+    buckets=POOL_WAIT_BUCKETS)
+MONGODB_POOL_CHECKOUT_FAILURES = Counter(
+    'mongodb_pool_checkout_failures_total', "Checkouts do pool do MongoDB que falharam", ['reason'])
+MONGODB_POOL_CONNECTIONS = Gauge(
+    'mongodb_pool_connections', "Conexões abertas no pool do MongoDB", multiprocess_mode='livesum')
+MONGODB_POOL_CHECKED_OUT = Gauge(
+    'mongodb_pool_connections_checked_out', "Conexões do MongoDB em uso", multiprocess_mode='livesum')
+
+POSTGRES_POOL_CHECKOUT_WAIT = Histogram(
+    'postgres_pool_checkout_wait_seconds',
+    "Espera por uma conexão do pool do PostgreSQL (inclui abrir uma conexão nova)",
+    buckets=POOL_WAIT_BUCKETS)
+POSTGRES_POOL_CONNECTIONS_OPENED = Counter(
+    'postgres_pool_connections_opened_total', "Conexões abertas pelo pool do PostgreSQL")
+POSTGRES_POOL_CHECKED_OUT = Gauge(
+    'postgres_pool_connections_checked_out', "Conexões do PostgreSQL em uso", multiprocess_mode='livesum')
+
+N8N_REQUEST_DURATION = Histogram(
+    'n8n_request_duration_seconds', "Duração das chamadas ao webhook do n8n",
+    ['operation', 'outcome'], buckets=N8N_BUCKETS)
+N8N_REQUESTS_REJECTED = Counter(
+    'n8n_requests_rejected_total', "Chamadas ao n8n recusadas antes de sair (circuito aberto, bulkhead cheio)",
+    ['reason'])
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Corpo e Content-Type do /metrics (soma os processos em modo multiprocesso)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def route_label(url_rule: Any) -> str:
+    """Padrão da rota (/api/talk), não a URL: caminhos sem rota viram um só rótulo"""
+    return url_rule.rule if url_rule is not None else 'unmatched'
+
+
+def observe_request(method: str, url_rule: Any, status: int, started: float):
+    HTTP_REQUEST_DURATION.labels(method, route_label(url_rule), str(status)).observe(
+        time.perf_counter() - started)
+
+
+def init_metrics(app):
+    """Instrumenta as requisições do app Flask e registra GET /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def keep_response_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    # teardown roda mesmo com exceção não tratada (sem resposta: conta como 500)
+    @app.teardown_request
+    def finish_request_timer(error):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        observe_request(request.method, request.url_rule, g.pop('metrics_status', 500), started)
+
+    @app.route('/metrics')
+    def metrics():
+        data, content_type = render_metrics()
+        return Response(data, headers={'Content-Type': content_type})
+
+
+def init_async_metrics(app):
+    """Mesmo que init_metrics, para o app Quart (asgi.py)"""
+    from quart import Response, g, request
+
+    @app.before_request
+    async def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    async def keep_response_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    async def finish_request_timer(error):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        observe_request(request.method, request.url_rule, g.pop('metrics_status', 500), started)
+
+    @app.route('/metrics')
+    async def metrics():
+        data, content_type = render_metrics()
+        return Response(data, headers={'Content-Type': content_type})
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Duração de cada comando do MongoDB por comando e coleção"""
+
+    def __init__(self):
+        # O nome da coleção só vem no evento de início
+        self._collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        # getMore traz o id do cursor no lugar da coleção; comandos de admin trazem 1
+        collection = target if isinstance(target, str) else event.command.get('collection', '')
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        self._observe(event, 'succeeded')
+
+    def failed(self, event):
+        self._observe(event, 'failed')
+
+    def _observe(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), '')
+        MONGODB_COMMAND_DURATION.labels(event.command_name, collection, outcome).observe(
+            event.duration_micros / 1_000_000)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Checkouts e conexões do pool do MongoDB"""
+
+    def __init__(self):
+        # Início e fim de um checkout são emitidos pela mesma thread
+        self._local = threading.local()
+
+    def _observe_wait(self):
+        started = getattr(self._local, 'checkout_started', None)
+        if started is not None:
+            MONGODB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+            self._local.checkout_started = None
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._observe_wait()
+        MONGODB_POOL_CHECKED_OUT.inc()
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait()
+        MONGODB_POOL_CHECKOUT_FAILURES.labels(event.reason).inc()
+
+    def connection_checked_in(self, event):
+        MONGODB_POOL_CHECKED_OUT.dec()
+
+    def connection_created(self, event):
+        MONGODB_POOL_CONNECTIONS.inc()
+
+    def connection_closed(self, event):
+        MONGODB_POOL_CONNECTIONS.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+def mongodb_listeners() -> list:
+    """event_listeners dos clientes do MongoDB (pymongo e motor)"""
+    return [CommandMetrics(), PoolMetrics()]
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mede a espera por uma conexão (o SQLAlchemy não tem evento antes do checkout)"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POSTGRES_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def _postgres_connection_opened(dbapi_connection, connection_record):
+    POSTGRES_POOL_CONNECTIONS_OPENED.inc()
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkout')
+def _postgres_checked_out(dbapi_connection, connection_record, connection_proxy):
+    POSTGRES_POOL_CHECKED_OUT.inc()
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkin')
+def _postgres_checked_in(dbapi_connection, connection_record):
+    POSTGRES_POOL_CHECKED_OUT.dec()
+
+
+def n8n_outcome(response: Optional[Dict[str, Any]]) -> str:
+    """Resultado de uma chamada ao n8n para o rótulo outcome"""
+    if response is None:
+        return 'abandoned'  # Cliente desconectado no meio do streaming
+    if response['success']:
+        return 'success'
+    if response.get('timeout'):
+        return 'timeout'
+    if response.get('status_code') is not None:
+        return 'http_error'
+    return 'error'  # Conexão recusada ou erro inesperado
+
+
+def observe_n8n_call(operation: str, response: Optional[Dict[str, Any]], duration: float):
+    N8N_REQUEST_DURATION.labels(operation, n8n_outcome(response)).observe(duration)
+
+
+def count_n8n_rejection(response: Dict[str, Any]):
+    N8N_REQUESTS_REJECTED.labels('circuit_open' if response.get('circuit_open') else 'bulkhead_full').inc()
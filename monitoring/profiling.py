@@ -0,0 +1,356 @@
+"""
+Perfil de requisições sob demanda (PROFILING_ENABLED)
+
+Uma requisição é perfilada quando traz o header X-Profile com o PROFILING_TOKEN ou
+quando cai na amostragem (PROFILING_SAMPLE_RATE). Ela ganha um perfil de CPU
+(cProfile) e a linha do tempo das etapas: auth (token e senha), cada chamada de
+repositório (mongodb), cada chamada ao n8n e a serialização JSON. O resultado vai
+para PROFILING_DIR (<id>.json com as etapas e <id>.prof para `python -m pstats` ou
+snakeviz) ou, com X-Profile-Output: inline, volta no corpo no lugar da resposta.
+Requisições pedidas pelo header também recebem X-Profile-Id e Server-Timing.
+
+Desligado não custa nada: os hooks e os wrappers das etapas só são instalados por
+init_profiling()/init_async_profiling() quando PROFILING_ENABLED=true.
+
+No app ASGI o perfil de CPU cobre o event loop durante a requisição (inclui as
+outras corrotinas em andamento); as etapas continuam sendo só da requisição.
+"""
+
+import asyncio
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+from config.settings import settings
+
+logger = structlog.get_logger(__name__)
+
+# Categorias do resumo (prefixo do nome da etapa) na ordem do Server-Timing
+CATEGORIES = ('auth', 'mongodb', 'n8n', 'serialization')
+# Funções do cProfile no corpo da resposta inline
+INLINE_STATS_LINES = 30
+
+# (nome, início, fim) das etapas da requisição perfilada; None fora de uma
+_spans: ContextVar[Optional[List[Tuple[str, float, float]]]] = ContextVar('profile_spans', default=None)
+# Um perfil de CPU por thread: no event loop, requisições sobrepostas trocariam o hook do cProfile
+_cpu = threading.local()
+_instrumented = False
+
+
+@contextmanager
+def span(name: str):
+    """Registra uma etapa na requisição perfilada em andamento (nada fora dela)"""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, started, time.perf_counter()))
+
+
+def traced(name: str, func: Callable) -> Callable:
+    """Envolve func numa etapa; corrotinas e geradores contam até terminarem"""
+    if inspect.iscoroutinefunction(func):
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+    elif inspect.isasyncgenfunction(func):
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                async for item in func(*args, **kwargs):
+                    yield item
+    elif inspect.isgeneratorfunction(func):
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return (yield from func(*args, **kwargs))
+    else:
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+    return functools.wraps(func)(wrapper)
+
+
+def traced_future(name: str, func: Callable) -> Callable:
+    """Etapa de uma função que devolve um Future: vai da chamada até o Future resolver"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        spans = _spans.get()
+        started = time.perf_counter()
+        future = func(*args, **kwargs)
+        if spans is not None:
+            future.add_done_callback(lambda _: spans.append((name, started, time.perf_counter())))
+        return future
+    return wrapper
+
+
+def _trace_methods(cls: type, category: str, names: Optional[List[str]] = None):
+    """Envolve os métodos públicos definidos na própria classe (ou só `names`)"""
+    for name, value in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(value):
+            continue
+        if names is not None and name not in names:
+            continue
+        setattr(cls, name, traced(f"{category}:{cls.__name__}.{name}", value))
+
+
+def instrument():
+    """Instala os wrappers das etapas (uma vez por processo)"""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    import auth
+    from config.json_provider import BSONJSONProvider
+    from gateways.async_n8n_gateway import AsyncN8nGateway
+    from gateways.n8n_gateway import N8nGateway
+    from passwords import PasswordVerifier
+    from repositories.async_bucket_message_repository import AsyncBucketMessageRepository
+    from repositories.async_message_repository import AsyncMessageRepository
+    from repositories.async_reply_job_repository import AsyncReplyJobRepository
+    from repositories.async_talk_repository import AsyncTalkRepository
+    from repositories.bucket_message_repository import BucketMessageRepository
+    from repositories.message_repository import MessageRepository
+    from repositories.reply_job_repository import ReplyJobRepository
+    from repositories.talk_repository import TalkRepository
+
+    # token_required/async_token_required buscam _decode_bearer no módulo a cada chamada
+    auth._decode_bearer = traced('auth:token', auth._decode_bearer)
+    # verify() do app WSGI também passa por submit()
+    PasswordVerifier.submit = traced_future('auth:password', PasswordVerifier.submit)
+
+    for repository in (MessageRepository, BucketMessageRepository, TalkRepository, ReplyJobRepository,
+                       AsyncMessageRepository, AsyncBucketMessageRepository, AsyncTalkRepository,
+                       AsyncReplyJobRepository):
+        _trace_methods(repository, 'mongodb')
+
+    for gateway in (N8nGateway, AsyncN8nGateway):
+        _trace_methods(gateway, 'n8n', ['send_chat_input', 'stream_chat_input'])
+
+    BSONJSONProvider.response = traced('serialization:json', BSONJSONProvider.response)
+
+
+def profile_trigger(headers) -> Optional[str]:
+    """'header' (X-Profile com o token), 'sample' (amostragem) ou None"""
+    token = headers.get('X-Profile')
+    if token and settings.PROFILING_TOKEN and hmac.compare_digest(
+            token.encode('utf-8'), settings.PROFILING_TOKEN.encode('utf-8')):
+        return 'header'
+    if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+
+def top_level(spans: List[Tuple[str, float, float]]) -> List[Tuple[str, float, float]]:
+    """Etapas que não estão dentro de outra (um repositório chamando outro conta uma vez)"""
+    result = []
+    for name, started, finished in sorted(spans, key=lambda item: (item[1], -item[2])):
+        if result and finished <= result[-1][2]:
+            continue
+        result.append((name, started, finished))
+    return result
+
+
+class RequestProfile:
+    """Perfil de CPU e etapas de uma requisição"""
+
+    def __init__(self, trigger: str, inline: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.trigger = trigger
+        self.inline = inline
+        self.started_at = datetime.utcnow()
+        self.status: Optional[int] = None
+        self.finished = False
+        self.spans: List[Tuple[str, float, float]] = []
+        _spans.set(self.spans)
+        self.profiler: Optional[cProfile.Profile] = None
+        if not getattr(_cpu, 'busy', False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self.profiler = profiler
+                _cpu.busy = True
+            except ValueError:
+                pass  # Outro perfil ativo (a partir do Python 3.12 só um por processo): fica só com as etapas
+        self.started = time.perf_counter()
+
+    def finish(self, method: str, path: str, route: Optional[str]) -> Dict[str, Any]:
+        """Para o perfil de CPU e monta o registro com o resumo por categoria"""
+        finished = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.disable()
+            _cpu.busy = False
+        _spans.set(None)
+        self.finished = True
+
+        breakdown = {category: 0.0 for category in CATEGORIES}
+        for name, started, ended in top_level(self.spans):
+            breakdown[name.split(':', 1)[0]] += (ended - started) * 1000
+        duration_ms = (finished - self.started) * 1000
+        breakdown['other'] = max(duration_ms - sum(breakdown.values()), 0.0)
+
+        return {
+            'id': self.id,
+            'started_at': self.started_at.isoformat(),
+            'trigger': self.trigger,
+            'method': method,
+            'path': path,
+            'route': route,
+            'status': self.status,
+            'duration_ms': round(duration_ms, 2),
+            'breakdown_ms': {category: round(value, 2) for category, value in breakdown.items()},
+            'spans': [{'name': name, 'start_ms': round((started - self.started) * 1000, 2),
+                       'duration_ms': round((ended - started) * 1000, 2)}
+                      for name, started, ended in sorted(self.spans, key=lambda item: item[1])],
+            'cpu_profile': self.profiler is not None,
+        }
+
+    def server_timing(self, record: Dict[str, Any]) -> str:
+        parts = [f"{category};dur={value}" for category, value in record['breakdown_ms'].items()]
+        return ', '.join(parts + [f"total;dur={record['duration_ms']}"])
+
+    def stats_text(self) -> Optional[str]:
+        if self.profiler is None:
+            return None
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(INLINE_STATS_LINES)
+        return output.getvalue()
+
+    def write(self, record: Dict[str, Any]):
+        """Grava <id>.json (etapas) e <id>.prof (cProfile) em PROFILING_DIR"""
+        try:
+            os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+            prefix = os.path.join(settings.PROFILING_DIR, f"{self.started_at:%Y%m%dT%H%M%S}-{self.id}")
+            if self.profiler is not None:
+                self.profiler.dump_stats(f"{prefix}.prof")
+            with open(f"{prefix}.json", 'w', encoding='utf-8') as file:
+                json.dump(record, file, ensure_ascii=False, indent=2)
+            logger.info("Perfil da requisição gravado", path=f"{prefix}.json",
+                        route=record['route'], duration_ms=record['duration_ms'])
+        except OSError as e:
+            logger.error("Falha ao gravar o perfil da requisição", error=str(e))
+
+
+def start_profile(headers) -> Optional[RequestProfile]:
+    trigger = profile_trigger(headers)
+    if trigger is None:
+        return None
+    inline = trigger == 'header' and headers.get('X-Profile-Output', '').lower() == 'inline'
+    return RequestProfile(trigger, inline)
+
+
+def _is_streamed(response) -> bool:
+    # O streaming termina depois do after_request: o perfil fecha no teardown
+    return response.mimetype == 'text/event-stream' or getattr(response, 'is_streamed', False)
+
+
+def finish_response(profile: RequestProfile, request, response) -> Optional[Dict[str, Any]]:
+    """
+    after_request: fecha o perfil das respostas comuns; respostas em streaming
+    fecham no teardown (finish_teardown)
+
+    Returns:
+        O registro a gravar com profile.write() (None se ainda aberto ou devolvido inline)
+    """
+    profile.status = response.status_code
+    if _is_streamed(response):
+        return None
+
+    record = profile.finish(request.method, request.path, route_rule(request))
+    if profile.trigger == 'header':
+        response.headers['X-Profile-Id'] = profile.id
+        response.headers['Server-Timing'] = profile.server_timing(record)
+    if profile.inline:
+        record['stats'] = profile.stats_text()
+        response.set_data(json.dumps(record, ensure_ascii=False))
+        response.mimetype = 'application/json'
+        return None
+    return record
+
+
+def finish_teardown(profile: RequestProfile, request) -> Optional[Dict[str, Any]]:
+    """teardown_request: fecha perfis de streaming e de requisições que terminaram em exceção"""
+    if profile.finished:
+        return None
+    if profile.status is None:
+        profile.status = 500
+    return profile.finish(request.method, request.path, route_rule(request))
+
+
+def route_rule(request) -> Optional[str]:
+    return request.url_rule.rule if request.url_rule is not None else None
+
+
+def init_profiling(app):
+    """Hooks do perfil no app Flask (só chamado com PROFILING_ENABLED)"""
+    from flask import g, request
+
+    instrument()
+
+    @app.before_request
+    def start_request_profile():
+        g.profile = start_profile(request.headers)
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.get('profile')
+        if profile is not None:
+            record = finish_response(profile, request, response)
+            if record is not None:
+                profile.write(record)
+        return response
+
+    @app.teardown_request
+    def close_request_profile(error):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            record = finish_teardown(profile, request)
+            if record is not None:
+                profile.write(record)
+
+
+def init_async_profiling(app):
+    """Mesmo que init_profiling, para o app Quart (asgi.py)"""
+    from quart import g, request
+
+    instrument()
+
+    @app.before_request
+    async def start_request_profile():
+        g.profile = start_profile(request.headers)
+
+    @app.after_request
+    async def finish_request_profile(response):
+        profile = g.get('profile')
+        if profile is not None:
+            record = finish_response(profile, request, response)
+            if record is not None:
+                # Gravar no event loop atrasaria as outras requisições
+                await asyncio.to_thread(profile.write, record)
+        return response
+
+    @app.teardown_request
+    async def close_request_profile(error):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            record = finish_teardown(profile, request)
+            if record is not None:
+                await asyncio.to_thread(profile.write, record)
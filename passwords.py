@@ -0,0 +1,142 @@
+"""
+Verificação de senhas (bcrypt) num pool de processos limitado
+
+bcrypt é CPU puro (~100-300ms por verificação com custo 12) e segura o GIL, então
+rodar no worker da requisição trava as outras rotas do mesmo processo. Aqui as
+verificações vão para um ProcessPoolExecutor com fila limitada: acima do limite
+a verificação é recusada na hora (PasswordPoolFull -> 429 no login); uma
+verificação que passa de PASSWORD_VERIFY_TIMEOUT vira PasswordVerifyTimeout (503).
+
+Quando o custo do hash salvo difere de BCRYPT_ROUNDS, o próprio processo do pool
+gera o hash novo após a senha conferir, para o login regravá-lo.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional, Tuple
+
+import bcrypt
+
+from config.settings import settings
+from gateways.circuit_breaker import Bulkhead
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolFull(Exception):
+    """Fila de verificações cheia"""
+    pass
+
+
+class PasswordVerifyTimeout(Exception):
+    """Verificação sem resultado dentro de PASSWORD_VERIFY_TIMEOUT"""
+    pass
+
+
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    """Gera o hash bcrypt de uma senha com o custo configurado"""
+    rounds = rounds or settings.BCRYPT_ROUNDS
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def hash_cost(hashed: str) -> Optional[int]:
+    """Custo (rounds) de um hash no formato $2b$12$..."""
+    parts = hashed.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def check_password(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """
+    Confere a senha e, se o custo do hash estiver desatualizado, gera o novo hash
+
+    Roda dentro do processo do pool (função de módulo para ser serializável).
+
+    Returns:
+        (senha confere, novo hash ou None)
+    """
+    if not bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8')):
+        return False, None
+    if hash_cost(hashed) != rounds:
+        return True, hash_password(password, rounds)
+    return True, None
+
+
+class PasswordVerifier:
+    """Pool de processos do bcrypt com fila limitada"""
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        """
+        Args:
+            workers: Processos do pool (cada um usa um núcleo durante a verificação)
+            max_pending: Verificações aguardando um processo livre além das em andamento
+            timeout: Tempo máximo, em segundos, esperando o resultado
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self._bulkhead = Bulkhead('bcrypt', workers + max_pending, 0)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Cria o pool no primeiro uso de cada processo (um pool herdado de fork não funciona)"""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+                logger.info(f"Pool do bcrypt iniciado com {self.workers} processos")
+            return self._executor
+
+    def submit(self, password: str, hashed: str) -> Future:
+        """
+        Enfileira uma verificação; o Future resolve para (senha confere, novo hash ou None)
+
+        Raises:
+            PasswordPoolFull: A fila de verificações está cheia
+        """
+        if not self._bulkhead.acquire():
+            raise PasswordPoolFull("Fila de verificação de senhas cheia")
+        try:
+            future = self._get_executor().submit(check_password, password, hashed, settings.BCRYPT_ROUNDS)
+        except Exception:
+            self._bulkhead.release()
+            raise
+        future.add_done_callback(lambda _: self._bulkhead.release())
+        return future
+
+    def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verificação bloqueante (app WSGI): a thread da requisição espera sem segurar o GIL
+
+        Raises:
+            PasswordPoolFull: A fila de verificações está cheia
+            PasswordVerifyTimeout: Sem resultado dentro do timeout
+        """
+        future = self.submit(password, hashed)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()  # Ainda na fila: não ocupa um processo à toa
+            raise PasswordVerifyTimeout(f"Verificação de senha sem resposta em {self.timeout}s")
+
+    def stats(self):
+        return {'workers': self.workers, **self._bulkhead.stats()}
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
+
+
+# Instância global do verificador de senhas
+password_verifier = PasswordVerifier(
+    workers=settings.PASSWORD_POOL_WORKERS,
+    max_pending=settings.PASSWORD_POOL_MAX_PENDING,
+    timeout=settings.PASSWORD_VERIFY_TIMEOUT
+)
@@ -0,0 +1,97 @@
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from typing import List, Dict, Any, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from repositories.async_message_repository import AsyncMessageRepository
+from repositories.bucket_message_repository import BucketMessageRepository, BucketPage, BUCKET_READ_PROJECTION
+from repositories.message_archive import ignore_duplicates
+from repositories.message_repository import MessageRepository, MESSAGE_HISTORY_PROJECTION, MESSAGE_ADMIN_PROJECTION
+from repositories.pagination import Bound
+
+class AsyncBucketMessageRepository(AsyncMessageRepository):
+    """
+    BucketMessageRepository sobre o motor (app ASGI): mesmos buckets, métodos aguardáveis
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        super().__init__(db)
+        self.collection = db.get_collection('message_bucket')
+
+    async def get_messages_by_talk_and_user(self, talk_id: str, user_id: str, after: Optional[str] = None,
+                                            projection: Optional[Dict[str, Any]] = MESSAGE_HISTORY_PROJECTION) -> List[Dict[str, Any]]:
+        await self._rehydrate(talk_id, user_id)
+        bound = await self._resolve_cursor(after) if after else None
+        query = BucketMessageRepository.history_query(talk_id, user_id, bound)
+        buckets = await self.collection.find(query, BUCKET_READ_PROJECTION).to_list(length=None)
+        return BucketMessageRepository.history(buckets, bound, projection)
+
+    async def get_messages_page(self, talk_id: str, user_id: str, limit: int, before: Optional[str] = None,
+                                after: Optional[str] = None,
+                                projection: Optional[Dict[str, Any]] = MESSAGE_HISTORY_PROJECTION) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        await self._rehydrate(talk_id, user_id)
+        page = BucketPage(
+            limit,
+            before=await self._resolve_cursor(before) if before else None,
+            after=await self._resolve_cursor(after) if after else None
+        )
+        query, sort = page.bucket_query(BucketMessageRepository.bucket_query(talk_id, user_id))
+        async for bucket in self.collection.find(query, BUCKET_READ_PROJECTION).sort(sort):
+            if not page.add(bucket):
+                break
+        return page.finish(projection)
+
+    async def _resolve_cursor(self, cursor: str) -> Bound:
+        if ObjectId.is_valid(cursor):
+            message_id = ObjectId(cursor)
+            bucket = await self.collection.find_one({'messages._id': message_id},
+                                                   BucketMessageRepository.message_projection(message_id))
+            return MessageRepository.anchor_bound(message_id, bucket['messages'][0] if bucket else None)
+        return MessageRepository.parse_cursor(cursor)
+
+    async def get_by_id(self, message_id: str,
+                        projection: Optional[Dict[str, Any]] = MESSAGE_ADMIN_PROJECTION) -> Optional[Dict[str, Any]]:
+        bucket = await self.collection.find_one(*BucketMessageRepository.message_lookup(message_id))
+        return BucketMessageRepository.single_message(bucket, projection)
+
+    async def create(self, message_data: Dict[str, Any], write_concern: Optional[WriteConcern] = None,
+                     talk_update: Optional[Dict[str, Any]] = None,
+                     talk_write_concern: Optional[WriteConcern] = None) -> Dict[str, Any]:
+        await self.append_turn([message_data], talk_update, write_concern, talk_write_concern)
+        return message_data
+
+    async def append_turn(self, messages: List[Dict[str, Any]], talk_update: Optional[Dict[str, Any]] = None,
+                          write_concern: Optional[WriteConcern] = None,
+                          talk_write_concern: Optional[WriteConcern] = None) -> List[Dict[str, Any]]:
+        fixed = BucketMessageRepository.fixed_ids(messages)
+        if fixed and await self.collection.find_one(BucketMessageRepository.stored_query(fixed), {'_id': 1}) is not None:
+            raise BucketMessageRepository.duplicate_error(fixed)
+        await self._with_write_concern(self.collection, write_concern).update_one(
+            *BucketMessageRepository.append_update(messages), upsert=True
+        )
+        await self._update_talk(messages[0]['talk_id'], talk_update, talk_write_concern)
+        return messages
+
+    async def soft_delete_batch_by_talk_id(self, talk_id: str, batch_size: int) -> int:
+        ids, count = [], 0
+        async for bucket in self.collection.find(MessageRepository.cascade_query(talk_id), {'count': 1}):
+            ids.append(bucket['_id'])
+            count += bucket.get('count', 0)
+            if count >= batch_size:
+                break
+        if ids:
+            await self.collection.update_many(*BucketMessageRepository.bucket_cascade_update(ids))
+        return count
+
+    async def restore(self, messages: List[Dict[str, Any]]):
+        present_query, projection = BucketMessageRepository.present_lookup(messages)
+        present = BucketMessageRepository.present_ids(
+            await self.collection.find(present_query, projection).to_list(length=None)
+        )
+        buckets = BucketMessageRepository.restored_buckets(messages, present)
+        if not buckets:
+            return
+        try:
+            await self.collection.insert_many(buckets, ordered=False)
+        except BulkWriteError as e:
+            ignore_duplicates(e)
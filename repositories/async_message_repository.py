@@ -0,0 +1,120 @@
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from config.settings import settings
+from repositories.message_archive import ignore_duplicates, interrupted_claim, rehydrate_lookup, unpack_archive
+from repositories.message_repository import MessageRepository, MESSAGE_HISTORY_PROJECTION, MESSAGE_ADMIN_PROJECTION
+from repositories.pagination import Bound, find_page_async, keyset_filter
+
+class AsyncMessageRepository:
+    """
+    MessageRepository sobre o motor (app ASGI): mesmas consultas, métodos aguardáveis
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.get_collection('message')
+        self.talk_collection = db.get_collection('talk')
+        self.archive_collection = db.get_collection('message_archive')
+
+    async def get_messages_by_talk_and_user(self, talk_id: str, user_id: str, after: Optional[str] = None,
+                                            projection: Optional[Dict[str, Any]] = MESSAGE_HISTORY_PROJECTION) -> List[Dict[str, Any]]:
+        await self._rehydrate(talk_id, user_id)
+        query = MessageRepository._talk_query(talk_id, user_id)
+        if after:
+            query.update(keyset_filter('create_at', await self._resolve_cursor(after), 1))
+        return await self.collection.find(query, projection).sort([('create_at', 1), ('_id', 1)]).to_list(length=None)
+
+    async def get_messages_page(self, talk_id: str, user_id: str, limit: int, before: Optional[str] = None,
+                                after: Optional[str] = None,
+                                projection: Optional[Dict[str, Any]] = MESSAGE_HISTORY_PROJECTION) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        await self._rehydrate(talk_id, user_id)
+        return await find_page_async(
+            self.collection,
+            MessageRepository._talk_query(talk_id, user_id),
+            sort_field='create_at',
+            ascending=True,
+            limit=limit,
+            before=await self._resolve_cursor(before) if before else None,
+            after=await self._resolve_cursor(after) if after else None,
+            from_end=True,
+            projection=projection
+        )
+
+    async def _resolve_cursor(self, cursor: str) -> Bound:
+        if ObjectId.is_valid(cursor):
+            message_id = ObjectId(cursor)
+            anchor = await self.collection.find_one({'_id': message_id}, {'create_at': 1})
+            return MessageRepository.anchor_bound(message_id, anchor)
+        return MessageRepository.parse_cursor(cursor)
+
+    async def get_by_id(self, message_id: str,
+                        projection: Optional[Dict[str, Any]] = MESSAGE_ADMIN_PROJECTION) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({'_id': ObjectId(message_id), 'is_deleted': False}, projection)
+
+    async def create(self, message_data: Dict[str, Any], write_concern: Optional[WriteConcern] = None,
+                     talk_update: Optional[Dict[str, Any]] = None,
+                     talk_write_concern: Optional[WriteConcern] = None) -> Dict[str, Any]:
+        result = await self._with_write_concern(self.collection, write_concern).insert_one(message_data)
+        message_data['_id'] = result.inserted_id
+        await self._update_talk(message_data['talk_id'], talk_update, talk_write_concern)
+        return message_data
+
+    async def append_turn(self, messages: List[Dict[str, Any]], talk_update: Optional[Dict[str, Any]] = None,
+                          write_concern: Optional[WriteConcern] = None,
+                          talk_write_concern: Optional[WriteConcern] = None) -> List[Dict[str, Any]]:
+        await self._with_write_concern(self.collection, write_concern).insert_many(messages, ordered=True)
+        await self._update_talk(messages[0]['talk_id'], talk_update, talk_write_concern)
+        return messages
+
+    async def _update_talk(self, talk_id: ObjectId, talk_update: Optional[Dict[str, Any]],
+                           write_concern: Optional[WriteConcern]):
+        talk_query = MessageRepository.live_talk_query(talk_id)
+        live = None
+        if talk_update:
+            result = await self._with_write_concern(self.talk_collection, write_concern).update_one(talk_query, talk_update)
+            live = result.matched_count > 0 if result.acknowledged else None
+        if live is None:
+            live = await self.talk_collection.count_documents(talk_query, limit=1) > 0
+        if not live:
+            await self.collection.update_many(*MessageRepository.talk_tombstone_update(talk_id))
+
+    _with_write_concern = staticmethod(MessageRepository._with_write_concern)
+
+    async def soft_delete_batch_by_talk_id(self, talk_id: str, batch_size: int) -> int:
+        cursor = self.collection.find(MessageRepository.cascade_query(talk_id), {'_id': 1}).limit(batch_size)
+        ids = [doc['_id'] async for doc in cursor]
+        if ids:
+            await self.collection.update_many(*MessageRepository.cascade_update(ids))
+        return len(ids)
+
+    async def _rehydrate(self, talk_id: str, user_id: str) -> int:
+        if not settings.MESSAGE_ARCHIVE_ENABLED:
+            return 0
+        archive = await self.archive_collection.find_one(rehydrate_lookup(talk_id, user_id, datetime.utcnow()))
+        if archive is None:
+            return 0
+        if 'archiving_until' in archive:
+            claimed = await self.archive_collection.update_one(*interrupted_claim(archive))
+            if claimed.modified_count == 0:
+                return 0
+        messages = unpack_archive(archive)
+        await self.restore(messages)
+        await self.archive_collection.delete_one({'_id': archive['_id'], 'archived_at': archive['archived_at']})
+        await self.talk_collection.update_one({'_id': archive['_id']}, {'$unset': {'archived_at': ''}})
+        return len(messages)
+
+    async def restore(self, messages: List[Dict[str, Any]]):
+        if not messages:
+            return
+        try:
+            await self.collection.insert_many(messages, ordered=False)
+        except BulkWriteError as e:
+            ignore_duplicates(e)
+
+    async def delete_archive(self, talk_id: str) -> bool:
+        result = await self.archive_collection.delete_one({'_id': ObjectId(talk_id)})
+        return result.deleted_count > 0
@@ -0,0 +1,26 @@
+from typing import Dict, Any
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from repositories.refresh_token_repository import RefreshTokenRepository, CONSUMED, REUSED, UNKNOWN
+
+class AsyncRefreshTokenRepository:
+    """RefreshTokenRepository sobre o motor (app ASGI): mesmas consultas, métodos aguardáveis"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.get_collection('refresh_tokens')
+
+    async def create(self, claims: Dict[str, Any]):
+        await self.collection.insert_one(RefreshTokenRepository.token_document(claims))
+
+    async def consume(self, claims: Dict[str, Any]) -> str:
+        if await self.collection.find_one_and_update(*RefreshTokenRepository.consume_update(claims),
+                                                     projection={'_id': 1}):
+            return CONSUMED
+        if await self.collection.count_documents(RefreshTokenRepository.token_query(claims), limit=1):
+            await self.revoke_family(claims['fam'])
+            return REUSED
+        return UNKNOWN
+
+    async def revoke_family(self, family: str) -> int:
+        result = await self.collection.delete_many({'family': family})
+        return result.deleted_count
@@ -0,0 +1,24 @@
+from bson import ObjectId
+from typing import Dict, Any, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from repositories.reply_job_repository import REPLY_STATUS_PROJECTION
+
+class AsyncReplyJobRepository:
+    """
+    Enfileiramento e consulta de jobs de resposta pelo motor (app ASGI)
+
+    O processamento dos jobs continua no worker síncrono (workers/reply.py).
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.get_collection('reply_jobs')
+
+    async def enqueue(self, job_data: Dict[str, Any]) -> Dict[str, Any]:
+        result = await self.collection.insert_one(job_data)
+        job_data['_id'] = result.inserted_id
+        return job_data
+
+    async def get_by_id_and_user(self, job_id: str, user_id: str,
+                                 projection: Optional[Dict[str, Any]] = REPLY_STATUS_PROJECTION) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({'_id': ObjectId(job_id), 'user_id': ObjectId(user_id)}, projection)
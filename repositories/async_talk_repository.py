@@ -0,0 +1,68 @@
+from bson import ObjectId
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from repositories.talk_repository import TalkRepository, TALK_SIDEBAR_PROJECTION, TALK_ADMIN_PROJECTION
+from repositories.pagination import decode_cursor, find_page_async
+
+class AsyncTalkRepository:
+    """
+    TalkRepository sobre o motor (app ASGI): mesmas consultas, métodos aguardáveis
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.get_collection('talk')
+
+    async def get_talks_by_user_id(self, user_id: str,
+                                   projection: Optional[Dict[str, Any]] = TALK_SIDEBAR_PROJECTION) -> List[Dict[str, Any]]:
+        return await (
+            self.collection.find({'user_id': ObjectId(user_id), 'is_deleted': False}, projection)
+            .sort([('last_activity_at', -1), ('_id', -1)])
+            .to_list(length=None)
+        )
+
+    async def get_talks_page(self, user_id: str, limit: int, before: Optional[str] = None, after: Optional[str] = None,
+                             projection: Optional[Dict[str, Any]] = TALK_SIDEBAR_PROJECTION) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return await find_page_async(
+            self.collection,
+            {'user_id': ObjectId(user_id), 'is_deleted': False},
+            sort_field='last_activity_at',
+            ascending=False,
+            limit=limit,
+            before=decode_cursor(before) if before else None,
+            after=decode_cursor(after) if after else None,
+            projection=projection,
+            allow_missing=True
+        )
+
+    async def get_by_id(self, talk_id: str, projection: Optional[Dict[str, Any]] = TALK_ADMIN_PROJECTION) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({'_id': ObjectId(talk_id), 'is_deleted': False}, projection)
+
+    async def create(self, talk_data: Dict[str, Any]) -> Dict[str, Any]:
+        result = await self.collection.insert_one(talk_data)
+        talk_data['_id'] = result.inserted_id
+        return talk_data
+
+    async def update_by_id_and_user(self, talk_id: str, user_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        result = await self.collection.update_one(
+            {'_id': ObjectId(talk_id), 'user_id': ObjectId(user_id), 'is_deleted': False},
+            {'$set': update_data}
+        )
+        if result.modified_count > 0:
+            return await self.get_by_id(talk_id)
+        return None
+
+    async def soft_delete_by_id_and_user(self, talk_id: str, user_id: str) -> bool:
+        result = await self.collection.update_one(
+            {'_id': ObjectId(talk_id), 'user_id': ObjectId(user_id), 'is_deleted': False},
+            {'$set': TalkRepository.soft_delete_fields(datetime.utcnow())}
+        )
+        return result.modified_count > 0
+
+    async def finish_cascade(self, talk_id: str) -> bool:
+        result = await self.collection.update_one(
+            {'_id': ObjectId(talk_id), 'cascade_pending': True},
+            {'$set': {'cascade_pending': False}}
+        )
+        return result.modified_count > 0
@@ -0,0 +1,372 @@
+import bson
+from bson import ObjectId
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.write_concern import WriteConcern
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator
+from datetime import datetime
+from config.settings import settings
+from repositories.message_archive import ignore_duplicates
+from repositories.message_repository import MessageRepository, MESSAGE_HISTORY_PROJECTION, MESSAGE_ADMIN_PROJECTION
+from repositories.pagination import Bound, finish_page
+
+# Campos da conversa guardados uma vez no bucket, e não em cada mensagem
+BUCKET_LEVEL_FIELDS = ('talk_id', 'user_id')
+BUCKET_READ_PROJECTION = {'talk_id': 1, 'user_id': 1, 'first_at': 1, 'last_at': 1, 'messages': 1}
+
+
+class BucketMessageRepository(MessageRepository):
+    """
+    Mensagens agrupadas em buckets (coleção message_bucket), com MESSAGE_STORAGE=bucket
+
+    Cada bucket guarda até MESSAGE_BUCKET_MAX_MESSAGES mensagens ou MESSAGE_BUCKET_MAX_KB
+    de uma conversa, em ordem de chegada, anexadas com $push. Ler o histórico inteiro
+    custa alguns documentos sequenciais em vez de um documento (e uma entrada de
+    índice) por mensagem. Mesma interface e mesmas respostas do MessageRepository.
+
+    Documento: {talk_id, user_id, is_deleted, count, size, first_at, last_at,
+    create_at, messages: [{_id, type, content, create_at, update_at, is_deleted}]}
+    """
+
+    def __init__(self, db: Database):
+        super().__init__(db)
+        self.collection = db.get_collection('message_bucket')
+
+    # Leitura
+
+    def get_messages_by_talk_and_user(self, talk_id: str, user_id: str, after: Optional[str] = None,
+                                      projection: Optional[Dict[str, Any]] = MESSAGE_HISTORY_PROJECTION) -> List[Dict[str, Any]]:
+        self._rehydrate(talk_id, user_id)
+        bound = self._resolve_cursor(after) if after else None
+        buckets = self.collection.find(self.history_query(talk_id, user_id, bound), BUCKET_READ_PROJECTION)
+        return self.history(buckets, bound, projection)
+
+    def get_messages_page(self, talk_id: str, user_id: str, limit: int, before: Optional[str] = None,
+                          after: Optional[str] = None,
+                          projection: Optional[Dict[str, Any]] = MESSAGE_HISTORY_PROJECTION) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        self._rehydrate(talk_id, user_id)
+        page = BucketPage(
+            limit,
+            before=self._resolve_cursor(before) if before else None,
+            after=self._resolve_cursor(after) if after else None
+        )
+        query, sort = page.bucket_query(self.bucket_query(talk_id, user_id))
+        for bucket in self.collection.find(query, BUCKET_READ_PROJECTION).sort(sort):
+            if not page.add(bucket):
+                break
+        return page.finish(projection)
+
+    def _resolve_cursor(self, cursor: str) -> Bound:
+        if ObjectId.is_valid(cursor):
+            message_id = ObjectId(cursor)
+            bucket = self.collection.find_one({'messages._id': message_id}, self.message_projection(message_id))
+            return self.anchor_bound(message_id, bucket['messages'][0] if bucket else None)
+        return self.parse_cursor(cursor)
+
+    def get_by_id(self, message_id: str,
+                  projection: Optional[Dict[str, Any]] = MESSAGE_ADMIN_PROJECTION) -> Optional[Dict[str, Any]]:
+        bucket = self.collection.find_one(*self.message_lookup(message_id))
+        return self.single_message(bucket, projection)
+
+    # Escrita
+
+    def create(self, message_data: Dict[str, Any], write_concern: Optional[WriteConcern] = None,
+               talk_update: Optional[Dict[str, Any]] = None,
+               talk_write_concern: Optional[WriteConcern] = None) -> Dict[str, Any]:
+        self.append_turn([message_data], talk_update, write_concern, talk_write_concern)
+        return message_data
+
+    def append_turn(self, messages: List[Dict[str, Any]], talk_update: Optional[Dict[str, Any]] = None,
+                    write_concern: Optional[WriteConcern] = None,
+                    talk_write_concern: Optional[WriteConcern] = None) -> List[Dict[str, Any]]:
+        """
+        Anexa as mensagens ao bucket aberto da conversa (ou abre um novo) com um único upsert
+
+        Raises:
+            DuplicateKeyError: Se um _id fixado pelo chamador já está em algum bucket
+        """
+        fixed = self.fixed_ids(messages)
+        if fixed and self.collection.find_one(self.stored_query(fixed), {'_id': 1}) is not None:
+            raise self.duplicate_error(fixed)
+        self._with_write_concern(self.collection, write_concern).update_one(*self.append_update(messages), upsert=True)
+        self._update_talk(messages[0]['talk_id'], talk_update, talk_write_concern)
+        return messages
+
+    def update(self, message_id: str, message_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        self.collection.update_one(*self.message_update(message_id, message_data))
+        return self.get_by_id(message_id)
+
+    def delete(self, message_id: str) -> bool:
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            *self.message_update(message_id, {'is_deleted': True, 'deleted_at': now, 'update_at': now})
+        )
+        return result.modified_count > 0
+
+    def soft_delete_batch_by_talk_id(self, talk_id: str, batch_size: int) -> int:
+        """
+        Deleta logicamente buckets da conversa até somar batch_size mensagens
+
+        O bucket inteiro vira tombstone (is_deleted/deleted_at) e é expurgado pelo TTL.
+        """
+        ids, count = [], 0
+        for bucket in self.collection.find(self.cascade_query(talk_id), {'count': 1}):
+            ids.append(bucket['_id'])
+            count += bucket.get('count', 0)
+            if count >= batch_size:
+                break
+        if ids:
+            self.collection.update_many(*self.bucket_cascade_update(ids))
+        return count
+
+    # Arquivo das conversas frias
+
+    def _purge_batch(self, batch: List[ObjectId], ids: List[ObjectId]) -> int:
+        """Remove os buckets do lote cujas mensagens vivas foram todas arquivadas"""
+        return self.collection.delete_many(self.purge_query(batch, ids)).deleted_count
+
+    def restore(self, messages: List[Dict[str, Any]]):
+        """Regrava as mensagens em buckets novos, pulando as que já estão em algum bucket"""
+        present = self.present_ids(self.collection.find(*self.present_lookup(messages)))
+        buckets = self.restored_buckets(messages, present)
+        if not buckets:
+            return
+        try:
+            self.collection.insert_many(buckets, ordered=False)
+        except BulkWriteError as e:
+            ignore_duplicates(e)
+
+    # Formato dos buckets (compartilhado com AsyncBucketMessageRepository)
+
+    @staticmethod
+    def bucket_query(talk_id: str, user_id: str) -> Dict[str, Any]:
+        return {'talk_id': ObjectId(talk_id), 'user_id': ObjectId(user_id), 'is_deleted': False}
+
+    @classmethod
+    def history_query(cls, talk_id: str, user_id: str, bound: Optional[Bound]) -> Dict[str, Any]:
+        query = cls.bucket_query(talk_id, user_id)
+        if bound:
+            query['last_at'] = {'$gte': bound[0]}
+        return query
+
+    @classmethod
+    def history(cls, buckets: Iterable[Dict[str, Any]], bound: Optional[Bound],
+                projection: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Histórico em ordem cronológica a partir dos buckets lidos"""
+        messages = [
+            message for bucket in buckets for message in cls.unpack(bucket)
+            if bound is None or is_beyond(message, bound, 1)
+        ]
+        messages.sort(key=message_key)
+        return [project(message, projection) for message in messages]
+
+    @staticmethod
+    def unpack(bucket: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Mensagens não deletadas do bucket, com os campos da conversa de volta"""
+        conversation = {field: bucket[field] for field in BUCKET_LEVEL_FIELDS if field in bucket}
+        return [
+            {**entry, **conversation}
+            for entry in bucket.get('messages', [])
+            if not entry.get('is_deleted', False)
+        ]
+
+    @classmethod
+    def single_message(cls, bucket: Optional[Dict[str, Any]],
+                       projection: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        messages = cls.unpack(bucket) if bucket else []
+        return project(messages[0], projection) if messages else None
+
+    @staticmethod
+    def message_projection(message_id: ObjectId) -> Dict[str, Any]:
+        """Traz do bucket só a mensagem procurada (e os campos da conversa)"""
+        return {'talk_id': 1, 'user_id': 1, 'messages': {'$elemMatch': {'_id': message_id}}}
+
+    @classmethod
+    def message_lookup(cls, message_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        message_id = ObjectId(message_id)
+        return {'messages._id': message_id, 'is_deleted': False}, cls.message_projection(message_id)
+
+    @staticmethod
+    def message_update(message_id: str, fields: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        return (
+            {'messages._id': ObjectId(message_id)},
+            {'$set': {f'messages.$.{field}': value for field, value in fields.items()}}
+        )
+
+    @staticmethod
+    def fixed_ids(messages: List[Dict[str, Any]]) -> List[ObjectId]:
+        """_id fixados pelo chamador (ex.: mensagem do bot do worker de respostas)"""
+        return [message['_id'] for message in messages if '_id' in message]
+
+    @staticmethod
+    def stored_query(ids: List[ObjectId]) -> Dict[str, Any]:
+        """
+        Buckets que já têm alguma das mensagens
+
+        messages._id não é único entre buckets e o $push anexaria de novo: sem esta
+        conferência, a reentrega de um job duplicaria a resposta do bot.
+        """
+        return {'messages._id': {'$in': ids}}
+
+    @staticmethod
+    def duplicate_error(ids: List[ObjectId]) -> DuplicateKeyError:
+        """Mesmo erro do armazenamento plano para _id repetido, tratado pelo chamador"""
+        return DuplicateKeyError(f"Message already stored: {', '.join(str(i) for i in ids)}", 11000)
+
+    @staticmethod
+    def append_update(messages: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Filtro e atualização do upsert que anexa mensagens ao bucket com espaço
+
+        Só casa um bucket em que todas as mensagens cabem; sem nenhum, o upsert cria
+        um bucket novo com os campos de igualdade do filtro (talk_id, user_id, is_deleted).
+        """
+        now = datetime.utcnow()
+        entries = []
+        for message in messages:
+            message.setdefault('_id', ObjectId())
+            entries.append({key: value for key, value in message.items() if key not in BUCKET_LEVEL_FIELDS})
+        size = sum(len(bson.encode(entry)) for entry in entries)
+        created = [message['create_at'] for message in messages]
+        return (
+            {
+                'talk_id': messages[0]['talk_id'],
+                'user_id': messages[0]['user_id'],
+                'is_deleted': False,
+                'count': {'$lte': settings.MESSAGE_BUCKET_MAX_MESSAGES - len(entries)},
+                'size': {'$lte': settings.MESSAGE_BUCKET_MAX_KB * 1024 - size}
+            },
+            {
+                '$push': {'messages': {'$each': entries}},
+                '$inc': {'count': len(entries), 'size': size},
+                '$min': {'first_at': min(created)},
+                '$max': {'last_at': max(created)},
+                '$setOnInsert': {'create_at': now}
+            }
+        )
+
+    @staticmethod
+    def purge_query(batch: List[ObjectId], ids: List[ObjectId]) -> Dict[str, Any]:
+        # Bucket que recebeu mensagem nova depois da leitura do arquivamento fica inteiro
+        return {
+            'messages._id': {'$in': batch},
+            'messages': {'$not': {'$elemMatch': {'_id': {'$nin': ids}, 'is_deleted': False}}}
+        }
+
+    @staticmethod
+    def present_lookup(messages: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        return {'messages._id': {'$in': [message['_id'] for message in messages]}}, {'messages._id': 1}
+
+    @staticmethod
+    def present_ids(buckets: Iterable[Dict[str, Any]]) -> set:
+        return {entry['_id'] for bucket in buckets for entry in bucket.get('messages', [])}
+
+    @staticmethod
+    def restored_buckets(messages: List[Dict[str, Any]], present: set) -> List[Dict[str, Any]]:
+        missing = [message for message in messages if message['_id'] not in present]
+        return list(build_buckets(missing, settings.MESSAGE_BUCKET_MAX_MESSAGES, settings.MESSAGE_BUCKET_MAX_KB * 1024))
+
+    @staticmethod
+    def bucket_cascade_update(ids: List[ObjectId]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        now = datetime.utcnow()
+        return (
+            {'_id': {'$in': ids}, 'is_deleted': False},
+            {'$set': {'is_deleted': True, 'deleted_at': now, 'update_at': now}}
+        )
+
+
+class BucketPage:
+    """
+    Monta uma página de mensagens a partir dos buckets, na semântica do find_page
+
+    Sem cursor ou com before, os buckets são lidos do mais recente para o mais antigo
+    e a leitura para assim que a página (limit + 1) está completa e o próximo bucket
+    só tem mensagens mais antigas. Com after, lê para frente até o fim da conversa.
+    """
+
+    def __init__(self, limit: int, before: Optional[Bound] = None, after: Optional[Bound] = None):
+        self.limit = limit
+        self.bound = after if after is not None else before
+        self.direction = 1 if after is not None else -1
+        self.messages: List[Dict[str, Any]] = []
+
+    def bucket_query(self, query: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+        query = dict(query)
+        if self.bound is not None:
+            if self.direction == 1:
+                query['last_at'] = {'$gte': self.bound[0]}
+            else:
+                query['first_at'] = {'$lte': self.bound[0]}
+        return query, [('last_at', self.direction)]
+
+    def add(self, bucket: Dict[str, Any]) -> bool:
+        """Acrescenta as mensagens do bucket; retorna False quando não precisa ler mais buckets"""
+        if self.direction == -1 and len(self.messages) > self.limit:
+            self.messages.sort(key=message_key, reverse=True)
+            cutoff = self.messages[self.limit]['create_at']
+            if bucket['last_at'] < cutoff:
+                return False
+        for message in BucketMessageRepository.unpack(bucket):
+            if self.bound is None or is_beyond(message, self.bound, self.direction):
+                self.messages.append(message)
+        return True
+
+    def finish(self, projection: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        self.messages.sort(key=message_key, reverse=self.direction == -1)
+        docs, next_cursor = finish_page(self.messages[:self.limit + 1], 'create_at', self.limit, self.direction, 1)
+        return [project(doc, projection) for doc in docs], next_cursor
+
+
+def build_buckets(messages: Iterable[Dict[str, Any]], max_messages: int, max_bytes: int) -> Iterator[Dict[str, Any]]:
+    """
+    Agrupa mensagens ordenadas por (talk_id, user_id, create_at, _id) em buckets
+
+    Um bucket fecha quando a próxima mensagem passaria de max_messages ou max_bytes;
+    uma mensagem maior que max_bytes sozinha ocupa um bucket inteiro. O _id do bucket
+    é o da primeira mensagem, então regravar as mesmas mensagens não duplica buckets.
+    """
+    now = datetime.utcnow()
+    bucket = None
+    for message in messages:
+        conversation = {field: message[field] for field in BUCKET_LEVEL_FIELDS}
+        entry = {key: value for key, value in message.items() if key not in BUCKET_LEVEL_FIELDS}
+        size = len(bson.encode(entry))
+
+        if bucket is not None and (
+            {field: bucket[field] for field in BUCKET_LEVEL_FIELDS} != conversation
+            or bucket['count'] + 1 > max_messages
+            or bucket['size'] + size > max_bytes
+        ):
+            yield bucket
+            bucket = None
+
+        if bucket is None:
+            bucket = {'_id': entry['_id'], **conversation, 'is_deleted': False, 'count': 0, 'size': 0,
+                      'first_at': entry['create_at'], 'create_at': now, 'messages': []}
+
+        bucket['messages'].append(entry)
+        bucket['count'] += 1
+        bucket['size'] += size
+        bucket['last_at'] = entry['create_at']
+
+    if bucket is not None:
+        yield bucket
+
+
+def message_key(message: Dict[str, Any]) -> Tuple[datetime, ObjectId]:
+    return message['create_at'], message['_id']
+
+
+def is_beyond(message: Dict[str, Any], bound: Bound, direction: int) -> bool:
+    """Equivalente em memória do keyset_filter: a mensagem está depois do limite no sentido dado"""
+    value, object_id = bound
+    created = message['create_at']
+    if created == value and object_id is not None:
+        return message['_id'] > object_id if direction == 1 else message['_id'] < object_id
+    return created > value if direction == 1 else created < value
+
+
+def project(message: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if projection is None:
+        return message
+    return {field: message[field] for field, include in projection.items() if include and field in message}
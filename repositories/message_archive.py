@@ -0,0 +1,122 @@
+"""
+Arquivo das conversas frias (coleção message_archive)
+
+As mensagens de uma conversa sem atividade há MESSAGE_ARCHIVE_AFTER_DAYS saem da
+coleção quente (message ou message_bucket) e viram um único documento por
+conversa, com as mensagens serializadas em BSON e comprimidas com zlib. O índice
+e o cache do WiredTiger passam a carregar só as conversas em uso; a conversa é
+reidratada na primeira leitura do histórico (MessageRepository._rehydrate).
+
+Enquanto as mensagens saem da coleção quente o arquivo tem archiving_until, um
+prazo renovado a cada lote removido: a reidratação ignora esse arquivo (restaurar
+agora pularia as mensagens ainda quentes, que o lote seguinte removeria). Prazo
+vencido é arquivamento interrompido; a reidratação toma o arquivo (tira o prazo)
+e o arquivador para no próximo lote.
+
+Documento: {_id: talk_id, user_id, codec, count, raw_size, size, first_at,
+last_at, archived_at, archiving_until, data}
+"""
+
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple
+
+import bson
+from bson import Binary, ObjectId
+from pymongo.errors import BulkWriteError
+
+from config.settings import settings
+
+# Campos da conversa guardados uma vez no arquivo, e não em cada mensagem
+ARCHIVE_LEVEL_FIELDS = ('talk_id', 'user_id')
+ARCHIVE_CODEC = 'zlib'
+# Margem abaixo do limite de 16 MB de um documento BSON
+MAX_ARCHIVE_BYTES = 15 * 1024 * 1024
+# Prazo do arquivamento em andamento; um lote do purge leva bem menos que isso
+ARCHIVE_LEASE = timedelta(minutes=5)
+
+
+class ArchiveTooLarge(Exception):
+    """Conversa grande demais para um único documento de arquivo"""
+    pass
+
+
+def pack_archive(talk_id: ObjectId, user_id: ObjectId, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Monta o documento de arquivo a partir das mensagens da conversa (ordem cronológica)
+
+    Raises:
+        ArchiveTooLarge: O blob comprimido passa de MAX_ARCHIVE_BYTES
+    """
+    entries = [{key: value for key, value in message.items() if key not in ARCHIVE_LEVEL_FIELDS}
+               for message in messages]
+    raw = bson.encode({'messages': entries})
+    data = zlib.compress(raw, settings.MESSAGE_ARCHIVE_COMPRESSION_LEVEL)
+    if len(data) > MAX_ARCHIVE_BYTES:
+        raise ArchiveTooLarge(f"Conversa {talk_id}: {len(data)} bytes comprimidos")
+    archived_at = datetime.utcnow()
+    return {
+        '_id': talk_id,
+        'user_id': user_id,
+        'codec': ARCHIVE_CODEC,
+        'count': len(entries),
+        'raw_size': len(raw),
+        'size': len(data),
+        'first_at': messages[0]['create_at'],
+        'last_at': messages[-1]['create_at'],
+        'archived_at': archived_at,
+        'archiving_until': archived_at + ARCHIVE_LEASE,
+        'data': Binary(data),
+    }
+
+
+def unpack_archive(archive: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Mensagens do arquivo no formato da coleção message"""
+    if archive.get('codec') != ARCHIVE_CODEC:
+        raise ValueError(f"Codec de arquivo desconhecido: {archive.get('codec')}")
+    entries = bson.decode(zlib.decompress(archive['data']))['messages']
+    conversation = {'talk_id': archive['_id'], 'user_id': archive['user_id']}
+    return [{**entry, **conversation} for entry in entries]
+
+
+def archive_lookup(talk_id: str, user_id: str) -> Dict[str, Any]:
+    return {'_id': ObjectId(talk_id), 'user_id': ObjectId(user_id)}
+
+
+def rehydrate_lookup(talk_id: str, user_id: str, now: datetime) -> Dict[str, Any]:
+    """Arquivo completo ou de arquivamento interrompido (prazo vencido)"""
+    return {**archive_lookup(talk_id, user_id), 'archiving_until': {'$not': {'$gt': now}}}
+
+
+def lease_filter(archive: Dict[str, Any]) -> Dict[str, Any]:
+    """O arquivo ainda está sendo gravado por este arquivamento"""
+    return {'_id': archive['_id'], 'archived_at': archive['archived_at'], 'archiving_until': {'$exists': True}}
+
+
+def lease_renewal() -> Dict[str, Any]:
+    return {'$set': {'archiving_until': datetime.utcnow() + ARCHIVE_LEASE}}
+
+
+def interrupted_claim(archive: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Toma um arquivo de arquivamento interrompido antes de restaurá-lo
+
+    Compara o prazo lido: se o arquivador o renovou nesse meio tempo, não casa e a
+    leitura não reidrata; se casa, o arquivador perde o prazo e para no próximo lote.
+    """
+    return (
+        {'_id': archive['_id'], 'archived_at': archive['archived_at'], 'archiving_until': archive['archiving_until']},
+        {'$unset': {'archiving_until': ''}}
+    )
+
+
+def ignore_duplicates(error: BulkWriteError):
+    """
+    Relança o erro se alguma falha não for de chave duplicada
+
+    A reidratação grava documentos com _id fixo: repetir (duas leituras ao mesmo
+    tempo, ou uma reidratação interrompida) só esbarra no que já foi gravado.
+    """
+    if any(item.get('code') != 11000 for item in error.details.get('writeErrors', [])) \
+            or error.details.get('writeConcernErrors'):
+        raise error
@@ -1,45 +1,296 @@
 from bson import ObjectId
 from pymongo.database import Database
-from typing import List, Dict, Any, Optional
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timezone
+from config.settings import settings
+from repositories.message_archive import (ignore_duplicates, interrupted_claim, lease_filter, lease_renewal,
+                                          pack_archive, rehydrate_lookup, unpack_archive)
+from repositories.pagination import Bound, decode_cursor, find_page, keyset_filter
+
+# Projeções por tela: o histórico do chat não usa user_id, is_deleted nem update_at;
+# None retorna o documento inteiro
+MESSAGE_HISTORY_PROJECTION = {'_id': 1, 'type': 1, 'content': 1, 'talk_id': 1, 'create_at': 1}
+MESSAGE_ADMIN_PROJECTION = None
 
 class MessageRepository:
     def __init__(self, db: Database):
         self.db = db
         self.collection = db.get_collection('message')
+        self.talk_collection = db.get_collection('talk')
+        self.archive_collection = db.get_collection('message_archive')
 
-    def get_messages_by_talk_and_user(self, talk_id: str, user_id: str) -> List[Dict[str, Any]]:
+    def get_messages_by_talk_and_user(self, talk_id: str, user_id: str, after: Optional[str] = None,
+                                      projection: Optional[Dict[str, Any]] = MESSAGE_HISTORY_PROJECTION) -> List[Dict[str, Any]]:
         """
         Busca mensagens por talk_id e user_id, ordenadas por data de criação
+
+        after: cursor, _id de uma mensagem ou data ISO 8601; retorna apenas mensagens mais novas
+        """
+        self._rehydrate(talk_id, user_id)
+        query = self._talk_query(talk_id, user_id)
+        if after:
+            query.update(keyset_filter('create_at', self._resolve_cursor(after), 1))
+        return list(self.collection.find(query, projection).sort([('create_at', 1), ('_id', 1)]))
+
+    def get_messages_page(self, talk_id: str, user_id: str, limit: int, before: Optional[str] = None,
+                          after: Optional[str] = None,
+                          projection: Optional[Dict[str, Any]] = MESSAGE_HISTORY_PROJECTION) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
-        return list(self.collection.find({
+        Busca uma página de mensagens em ordem cronológica
+
+        Sem cursor retorna as mensagens mais recentes; o próximo cursor pagina para trás
+        (before) ou, se a página foi pedida com after, para frente.
+        """
+        self._rehydrate(talk_id, user_id)
+        return find_page(
+            self.collection,
+            self._talk_query(talk_id, user_id),
+            sort_field='create_at',
+            ascending=True,
+            limit=limit,
+            before=self._resolve_cursor(before) if before else None,
+            after=self._resolve_cursor(after) if after else None,
+            from_end=True,
+            projection=projection
+        )
+
+    @staticmethod
+    def _talk_query(talk_id: str, user_id: str) -> Dict[str, Any]:
+        return {
             'talk_id': ObjectId(talk_id), 
             'user_id': ObjectId(user_id),
             'is_deleted': False
-        }).sort('create_at', 1))
+        }
+
+    def _resolve_cursor(self, cursor: str) -> Bound:
+        """
+        Converte o cursor em limite de (create_at, _id)
+
+        Aceita o cursor opaco da paginação, o _id de uma mensagem ou uma data ISO 8601.
+
+        Raises:
+            ValueError: Se o cursor não for reconhecido
+        """
+        if ObjectId.is_valid(cursor):
+            message_id = ObjectId(cursor)
+            return self.anchor_bound(message_id, self.collection.find_one({'_id': message_id}, {'create_at': 1}))
+        return self.parse_cursor(cursor)
+
+    @staticmethod
+    def anchor_bound(message_id: ObjectId, anchor: Optional[Dict[str, Any]]) -> Bound:
+        """Limite a partir da mensagem âncora (ou da data do _id, se ela não existir)"""
+        if not anchor:
+            return message_id.generation_time.replace(tzinfo=None), message_id
+        return anchor['create_at'], message_id
 
-    def get_by_id(self, message_id: str) -> Optional[Dict[str, Any]]:
-        return self.collection.find_one({'_id': ObjectId(message_id), 'is_deleted': False})
+    @staticmethod
+    def parse_cursor(cursor: str) -> Bound:
+        """
+        Converte o cursor opaco ou a data ISO 8601 em limite
+
+        Raises:
+            ValueError: Se o cursor não for reconhecido
+        """
+        try:
+            return decode_cursor(cursor)
+        except ValueError:
+            pass
+
+        created_after = datetime.fromisoformat(cursor.replace('Z', '+00:00'))
+        if created_after.tzinfo is not None:
+            # create_at é gravado em UTC sem fuso
+            created_after = created_after.astimezone(timezone.utc).replace(tzinfo=None)
+        return created_after, None
 
-    def create(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
-        result = self.collection.insert_one(message_data)
+    def get_by_id(self, message_id: str,
+                  projection: Optional[Dict[str, Any]] = MESSAGE_ADMIN_PROJECTION) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({'_id': ObjectId(message_id), 'is_deleted': False}, projection)
+
+    def create(self, message_data: Dict[str, Any], write_concern: Optional[WriteConcern] = None,
+               talk_update: Optional[Dict[str, Any]] = None,
+               talk_write_concern: Optional[WriteConcern] = None) -> Dict[str, Any]:
+        """
+        Grava uma mensagem; talk_update ($inc/$set do resumo da conversa) é aplicado em seguida
+        """
+        result = self._with_write_concern(self.collection, write_concern).insert_one(message_data)
         message_data['_id'] = result.inserted_id
+        self._update_talk(message_data['talk_id'], talk_update, talk_write_concern)
         return message_data
 
+    def append_turn(self, messages: List[Dict[str, Any]], talk_update: Optional[Dict[str, Any]] = None,
+                    write_concern: Optional[WriteConcern] = None,
+                    talk_write_concern: Optional[WriteConcern] = None) -> List[Dict[str, Any]]:
+        """
+        Grava as mensagens de um turno (usuário e bot) com um único insert_many ordenado
+
+        As mensagens são retornadas já com _id, sem releitura. talk_update vai logo em
+        seguida: talk é outra coleção e o MongoDB não agrupa escritas de coleções
+        diferentes num mesmo bulk sem transação.
+        """
+        self._with_write_concern(self.collection, write_concern).insert_many(messages, ordered=True)
+        self._update_talk(messages[0]['talk_id'], talk_update, talk_write_concern)
+        return messages
+
+    def _update_talk(self, talk_id: ObjectId, talk_update: Optional[Dict[str, Any]],
+                     write_concern: Optional[WriteConcern]):
+        """
+        Aplica a atualização do resumo da conversa (um único update_one atômico)
+
+        A conversa é conferida depois das mensagens gravadas: se foi deletada nesse meio
+        tempo (resposta do bot chegando depois da exclusão), a cascata pode já ter
+        terminado sem vê-las, então as mensagens vivas da conversa viram tombstones aqui.
+        Uma exclusão posterior à conferência tem a cascata ainda por vir.
+        """
+        live = None
+        if talk_update:
+            result = self._with_write_concern(self.talk_collection, write_concern).update_one(
+                self.live_talk_query(talk_id), talk_update)
+            # Com w=0 o resultado não diz se a conversa casou
+            live = result.matched_count > 0 if result.acknowledged else None
+        if live is None:
+            live = self.talk_collection.count_documents(self.live_talk_query(talk_id), limit=1) > 0
+        if not live:
+            self.collection.update_many(*self.talk_tombstone_update(talk_id))
+
+    @staticmethod
+    def _with_write_concern(collection, write_concern: Optional[WriteConcern]):
+        return collection if write_concern is None else collection.with_options(write_concern=write_concern)
+
     def update(self, message_id: str, message_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         self.collection.update_one({'_id': ObjectId(message_id)}, {'$set': message_data})
         return self.get_by_id(message_id)
 
     def delete(self, message_id: str) -> bool:
-        result = self.collection.update_one({'_id': ObjectId(message_id)}, {'$set': {'is_deleted': True}})
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {'_id': ObjectId(message_id)},
+            {'$set': {'is_deleted': True, 'deleted_at': now, 'update_at': now}}
+        )
         return result.modified_count > 0
 
-    def soft_delete_by_talk_id(self, talk_id: str) -> bool:
+    def soft_delete_batch_by_talk_id(self, talk_id: str, batch_size: int) -> int:
+        """
+        Deleta logicamente um lote de mensagens de uma conversa
+
+        Cada lote é uma busca de ids pelo índice message_history seguida de um
+        update_many limitado a esses ids, então nenhuma escrita segura locks ou o
+        oplog por muito tempo. Retorna a quantidade do lote (menor que batch_size
+        quando não há mais mensagens).
+        """
+        ids = [doc['_id'] for doc in self.collection.find(self.cascade_query(talk_id), {'_id': 1}).limit(batch_size)]
+        if ids:
+            self.collection.update_many(*self.cascade_update(ids))
+        return len(ids)
+
+    # Arquivo das conversas frias (repositories/message_archive.py)
+
+    def archive_talk(self, talk_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Move as mensagens da conversa para um único documento comprimido em message_archive
+
+        Grava o arquivo ainda em andamento (archiving_until), marca a conversa
+        (archived_at, removido pela próxima mensagem gravada ou pela reidratação),
+        remove as mensagens da coleção quente e só então libera o arquivo para a
+        reidratação. Se parar no meio, o prazo vence, a próxima leitura reidrata a
+        conversa e a restauração ignora o que ainda estava na coleção quente.
+
+        Returns:
+            Metadados do arquivo (sem o blob), ou None se a conversa não tem mensagens
+
+        Raises:
+            ArchiveTooLarge: A conversa não cabe num documento
+        """
+        messages = self.get_messages_by_talk_and_user(talk_id, user_id, projection=None)
+        if not messages:
+            # Nada a arquivar; a marca tira a conversa dos candidatos até a próxima mensagem
+            self.talk_collection.update_one({'_id': ObjectId(talk_id)}, {'$set': {'archived_at': datetime.utcnow()}})
+            return None
+        archive = pack_archive(ObjectId(talk_id), ObjectId(user_id), messages)
+        self.archive_collection.replace_one({'_id': archive['_id']}, archive, upsert=True)
+        self.talk_collection.update_one({'_id': archive['_id']}, {'$set': {'archived_at': archive['archived_at']}})
+        self.purge([message['_id'] for message in messages], archive)
+        # Não casa se o arquivo foi tomado por uma reidratação ou removido (exclusão da conversa)
+        self.archive_collection.update_one(lease_filter(archive), {'$unset': {'archiving_until': ''}})
+        del archive['data'], archive['archiving_until']
+        return archive
+
+    def purge(self, ids: List[ObjectId], archive: Dict[str, Any]) -> int:
         """
-        Deleta logicamente todas as mensagens de uma conversa
+        Remove de vez mensagens já arquivadas, em lotes de CASCADE_DELETE_BATCH_SIZE
+
+        Cada lote renova antes o prazo do arquivo; se ele não é mais deste arquivamento
+        (reidratado ou removido), para e deixa o resto na coleção quente.
+        """
+        removed = 0
+        for start in range(0, len(ids), settings.CASCADE_DELETE_BATCH_SIZE):
+            if self.archive_collection.update_one(lease_filter(archive), lease_renewal()).matched_count == 0:
+                break
+            removed += self._purge_batch(ids[start:start + settings.CASCADE_DELETE_BATCH_SIZE], ids)
+        return removed
+
+    def _purge_batch(self, batch: List[ObjectId], ids: List[ObjectId]) -> int:
+        return self.collection.delete_many({'_id': {'$in': batch}}).deleted_count
+
+    def _rehydrate(self, talk_id: str, user_id: str) -> int:
+        """
+        Devolve à coleção quente as mensagens de uma conversa arquivada
+
+        Com MESSAGE_ARCHIVE_ENABLED, cada leitura do histórico custa uma busca por _id
+        em message_archive; a conversa reidratada volta a ser lida só da coleção quente.
+        Um arquivo ainda em andamento é ignorado (as mensagens ainda estão saindo da
+        coleção quente); o de um arquivamento interrompido é tomado antes de restaurar.
+
+        Returns:
+            Quantidade de mensagens restauradas
         """
-        from datetime import datetime
-        result = self.collection.update_many(
-            {'talk_id': ObjectId(talk_id), 'is_deleted': False},
-            {'$set': {'is_deleted': True, 'update_at': datetime.utcnow()}}
+        if not settings.MESSAGE_ARCHIVE_ENABLED:
+            return 0
+        archive = self.archive_collection.find_one(rehydrate_lookup(talk_id, user_id, datetime.utcnow()))
+        if archive is None:
+            return 0
+        if 'archiving_until' in archive and \
+                self.archive_collection.update_one(*interrupted_claim(archive)).modified_count == 0:
+            return 0
+        messages = unpack_archive(archive)
+        self.restore(messages)
+        # Um arquivo regravado nesse meio tempo (outro archived_at) não é removido
+        self.archive_collection.delete_one({'_id': archive['_id'], 'archived_at': archive['archived_at']})
+        self.talk_collection.update_one({'_id': archive['_id']}, {'$unset': {'archived_at': ''}})
+        return len(messages)
+
+    def restore(self, messages: List[Dict[str, Any]]):
+        """Regrava mensagens com o _id original; as que já existem são ignoradas"""
+        if not messages:
+            return
+        try:
+            self.collection.insert_many(messages, ordered=False)
+        except BulkWriteError as e:
+            ignore_duplicates(e)
+
+    def delete_archive(self, talk_id: str) -> bool:
+        """Remove o arquivo da conversa (exclusão da conversa)"""
+        return self.archive_collection.delete_one({'_id': ObjectId(talk_id)}).deleted_count > 0
+
+    @staticmethod
+    def cascade_query(talk_id: str) -> Dict[str, Any]:
+        return {'talk_id': ObjectId(talk_id), 'is_deleted': False}
+
+    @staticmethod
+    def live_talk_query(talk_id: ObjectId) -> Dict[str, Any]:
+        return {'_id': talk_id, 'is_deleted': {'$ne': True}}
+
+    @classmethod
+    def talk_tombstone_update(cls, talk_id: ObjectId) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Todas as mensagens vivas da conversa (ou buckets, com MESSAGE_STORAGE=bucket) viram tombstones"""
+        now = datetime.utcnow()
+        return cls.cascade_query(talk_id), {'$set': {'is_deleted': True, 'deleted_at': now, 'update_at': now}}
+
+    @staticmethod
+    def cascade_update(ids: List[ObjectId]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        now = datetime.utcnow()
+        return (
+            {'_id': {'$in': ids}, 'is_deleted': False},
+            {'$set': {'is_deleted': True, 'deleted_at': now, 'update_at': now}}
         )
-        return result.modified_count > 0
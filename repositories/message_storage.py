@@ -0,0 +1,38 @@
+"""
+Escolha do armazenamento de mensagens (MESSAGE_STORAGE)
+
+- document: um documento por mensagem na coleção message (padrão)
+- bucket: mensagens agrupadas por conversa na coleção message_bucket
+
+Os dois repositórios têm a mesma interface; para migrar os dados existentes use
+data/migrate_message_buckets.py.
+"""
+
+from config.settings import settings
+from repositories.message_repository import MessageRepository
+
+STORAGE_MODES = ('document', 'bucket')
+
+
+def _storage_mode() -> str:
+    mode = settings.MESSAGE_STORAGE
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"MESSAGE_STORAGE inválido: {mode} (use {', '.join(STORAGE_MODES)})")
+    return mode
+
+
+def create_message_repository(db) -> MessageRepository:
+    """Repositório de mensagens do app WSGI e dos workers"""
+    if _storage_mode() == 'bucket':
+        from repositories.bucket_message_repository import BucketMessageRepository
+        return BucketMessageRepository(db)
+    return MessageRepository(db)
+
+
+def create_async_message_repository(db):
+    """Repositório de mensagens do app ASGI (motor)"""
+    if _storage_mode() == 'bucket':
+        from repositories.async_bucket_message_repository import AsyncBucketMessageRepository
+        return AsyncBucketMessageRepository(db)
+    from repositories.async_message_repository import AsyncMessageRepository
+    return AsyncMessageRepository(db)
@@ -0,0 +1,145 @@
+"""
+Paginação por cursor (keyset) sobre (campo de ordenação, _id)
+
+O cursor é opaco para o cliente: base64 de {"v": <valor do campo>, "id": <_id>}.
+Cada página é uma busca por faixa no índice, então páginas profundas custam o
+mesmo que a primeira (sem skip).
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.collection import Collection
+
+from config.settings import settings
+
+# Limite da página: (valor do campo de ordenação, _id opcional para desempate).
+# Valor None: o documento do limite não tem o campo (ver allow_missing em find_page)
+Bound = Tuple[Optional[datetime], Optional[ObjectId]]
+
+
+def parse_page_size(limit: Optional[str]) -> int:
+    """
+    Converte o parâmetro limit, aplicando DEFAULT_PAGE_SIZE e MAX_PAGE_SIZE
+
+    Raises:
+        ValueError: Se limit não for um inteiro
+    """
+    if limit is None or limit == '':
+        return settings.DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), settings.MAX_PAGE_SIZE))
+
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    value = doc.get(sort_field)
+    payload = json.dumps({'v': value.isoformat() if value is not None else None, 'id': str(doc['_id'])},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Bound:
+    """
+    Raises:
+        ValueError: Se o cursor não foi gerado por encode_cursor
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value = datetime.fromisoformat(payload['v']) if payload['v'] is not None else None
+        return value, ObjectId(payload['id'])
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def keyset_filter(sort_field: str, bound: Bound, direction: int, allow_missing: bool = False) -> Dict[str, Any]:
+    """
+    Filtro para documentos depois do limite, no sentido da ordenação da busca (1 ou -1)
+
+    Com allow_missing, documentos sem o campo também são alcançáveis: o Mongo os ordena
+    como null, antes de qualquer valor, e entre eles vale só o _id.
+    """
+    value, object_id = bound
+    op = '$gt' if direction == 1 else '$lt'
+    if value is None:
+        missing = {sort_field: None, '_id': {op: object_id}}
+        return missing if direction == -1 else {'$or': [missing, {sort_field: {'$ne': None}}]}
+    if allow_missing and direction == -1:
+        after = [{sort_field: {op: value}}, {sort_field: None}]
+        if object_id is not None:
+            after.append({sort_field: value, '_id': {op: object_id}})
+        return {'$or': after}
+    if object_id is None:
+        return {sort_field: {op: value}}
+    # A faixa no nível de cima vira limite do índice; o $or só desempata o valor igual
+    return {
+        sort_field: {op + 'e': value},
+        '$or': [{sort_field: {op: value}}, {'_id': {op: object_id}}]
+    }
+
+
+def find_page(collection: Collection, query: Dict[str, Any], sort_field: str, ascending: bool, limit: int,
+              before: Optional[Bound] = None, after: Optional[Bound] = None, from_end: bool = False,
+              projection: Optional[Dict[str, Any]] = None,
+              allow_missing: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Busca uma página ordenada por (sort_field, _id)
+
+    Args:
+        query: Filtro base
+        sort_field: Campo de ordenação (datetime)
+        ascending: Ordem de exibição dos itens
+        limit: Tamanho da página
+        before: Itens anteriores a este limite, na ordem de exibição
+        after: Itens posteriores a este limite, na ordem de exibição
+        from_end: Sem cursor, começa pelo fim (ex.: mensagens mais recentes da conversa)
+        allow_missing: Inclui documentos sem sort_field (ex.: conversas anteriores ao
+            backfill_talk_summaries), que ficam depois dos demais na ordem decrescente
+
+    Returns:
+        (itens na ordem de exibição, cursor da próxima página ou None). O cursor deve ser
+        usado no mesmo parâmetro: 'before' ao andar para trás, 'after' ao andar para frente.
+    """
+    query, sort, direction, display = page_query(query, sort_field, ascending, before, after, from_end, allow_missing)
+    docs = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    return finish_page(docs, sort_field, limit, direction, display)
+
+
+async def find_page_async(collection, query: Dict[str, Any], sort_field: str, ascending: bool, limit: int,
+                          before: Optional[Bound] = None, after: Optional[Bound] = None, from_end: bool = False,
+                          projection: Optional[Dict[str, Any]] = None,
+                          allow_missing: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """find_page para coleções do motor (driver assíncrono)"""
+    query, sort, direction, display = page_query(query, sort_field, ascending, before, after, from_end, allow_missing)
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(length=None)
+    return finish_page(docs, sort_field, limit, direction, display)
+
+
+def page_query(query: Dict[str, Any], sort_field: str, ascending: bool, before: Optional[Bound],
+               after: Optional[Bound], from_end: bool,
+               allow_missing: bool = False) -> Tuple[Dict[str, Any], List[Tuple[str, int]], int, int]:
+    """Monta (filtro, ordenação, sentido da busca, sentido de exibição) de uma página"""
+    display = 1 if ascending else -1
+    if after is not None:
+        direction = display
+        query = {'$and': [query, keyset_filter(sort_field, after, direction, allow_missing)]}
+    elif before is not None:
+        direction = -display
+        query = {'$and': [query, keyset_filter(sort_field, before, direction, allow_missing)]}
+    else:
+        direction = -display if from_end else display
+    return query, [(sort_field, direction), ('_id', direction)], direction, display
+
+
+def finish_page(docs: List[Dict[str, Any]], sort_field: str, limit: int, direction: int,
+                display: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Corta o item extra buscado (limit + 1), gera o cursor e põe os itens na ordem de exibição"""
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    next_cursor = encode_cursor(docs[-1], sort_field) if has_more else None
+    if direction != display:
+        docs.reverse()
+    return docs, next_cursor
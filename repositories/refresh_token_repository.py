@@ -0,0 +1,60 @@
+from bson import ObjectId
+from pymongo.database import Database
+from typing import Dict, Any, Tuple
+from datetime import datetime
+
+# Resultado de consume(): token trocado, token já usado (conta como vazado) ou desconhecido
+CONSUMED = 'consumed'
+REUSED = 'reused'
+UNKNOWN = 'unknown'
+
+class RefreshTokenRepository:
+    """
+    Tokens de renovação emitidos, armazenados na coleção refresh_tokens
+
+    Cada token vale uma troca: /api/refresh consome o jti e emite o próximo da mesma
+    família (a sessão aberta por um login). Apresentar de novo um token já consumido
+    indica vazamento, e a família inteira é revogada. O índice TTL em expires_at
+    remove os tokens vencidos.
+
+    Documento: {_id: jti, user_id, family, expires_at, create_at, used_at}
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.collection = db.get_collection('refresh_tokens')
+
+    def create(self, claims: Dict[str, Any]):
+        self.collection.insert_one(self.token_document(claims))
+
+    def consume(self, claims: Dict[str, Any]) -> str:
+        """Marca o token como usado: CONSUMED, REUSED (família revogada) ou UNKNOWN"""
+        if self.collection.find_one_and_update(*self.consume_update(claims), projection={'_id': 1}):
+            return CONSUMED
+        if self.collection.count_documents(self.token_query(claims), limit=1):
+            self.revoke_family(claims['fam'])
+            return REUSED
+        return UNKNOWN
+
+    def revoke_family(self, family: str) -> int:
+        return self.collection.delete_many({'family': family}).deleted_count
+
+    @staticmethod
+    def token_document(claims: Dict[str, Any]) -> Dict[str, Any]:
+        """claims: payload de auth.issue_refresh_token (jti, fam, user_id, exp)"""
+        return {
+            '_id': claims['jti'],
+            'user_id': ObjectId(claims['user_id']),
+            'family': claims['fam'],
+            'expires_at': claims['exp'],
+            'create_at': datetime.utcnow(),
+            'used_at': None
+        }
+
+    @staticmethod
+    def token_query(claims: Dict[str, Any]) -> Dict[str, Any]:
+        return {'_id': claims['jti'], 'user_id': ObjectId(claims['user_id']), 'family': claims['fam']}
+
+    @classmethod
+    def consume_update(cls, claims: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        return {**cls.token_query(claims), 'used_at': None}, {'$set': {'used_at': datetime.utcnow()}}
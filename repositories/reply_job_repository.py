@@ -0,0 +1,105 @@
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.database import Database
+from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+
+# Campos usados pela consulta de status (GET /api/reply-status)
+REPLY_STATUS_PROJECTION = {'_id': 1, 'talk_id': 1, 'status': 1, 'attempts': 1, 'n8n_status': 1, 'bot_message_id': 1}
+
+class ReplyJobRepository:
+    """
+    Fila durável de respostas do bot, armazenada na coleção reply_jobs
+
+    Status possíveis: pending -> processing -> done | failed
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.collection = db.get_collection('reply_jobs')
+
+    def enqueue(self, job_data: Dict[str, Any]) -> Dict[str, Any]:
+        result = self.collection.insert_one(job_data)
+        job_data['_id'] = result.inserted_id
+        return job_data
+
+    def get_by_id_and_user(self, job_id: str, user_id: str,
+                           projection: Optional[Dict[str, Any]] = REPLY_STATUS_PROJECTION) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({'_id': ObjectId(job_id), 'user_id': ObjectId(user_id)}, projection)
+
+    def claim_next(self, worker_id: str, visibility_timeout: int) -> Optional[Dict[str, Any]]:
+        """
+        Reivindica atomicamente o próximo job disponível
+
+        Primeiro recupera jobs em processamento com a visibilidade expirada (worker morreu),
+        depois o pendente mais antigo com available_at vencido. Cada busca usa seu índice.
+        """
+        now = datetime.utcnow()
+        return (
+            self._claim(self.expired_query(now), None, worker_id, visibility_timeout, now)
+            or self._claim(self.pending_query(now), [('available_at', 1)], worker_id, visibility_timeout, now)
+        )
+
+    @staticmethod
+    def pending_query(now: datetime) -> Dict[str, Any]:
+        return {'status': 'pending', 'available_at': {'$lte': now}}
+
+    @staticmethod
+    def expired_query(now: datetime) -> Dict[str, Any]:
+        return {'status': 'processing', 'locked_until': {'$lte': now}}
+
+    def _claim(self, query: Dict[str, Any], sort, worker_id: str, visibility_timeout: int,
+               now: datetime) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one_and_update(
+            query,
+            {
+                '$set': {
+                    'status': 'processing',
+                    'worker_id': worker_id,
+                    'locked_until': now + timedelta(seconds=visibility_timeout),
+                    'update_at': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=sort,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def mark_done(self, job_id: ObjectId, worker_id: str, n8n_status: str) -> bool:
+        result = self.collection.update_one(
+            {'_id': job_id, 'worker_id': worker_id, 'status': 'processing'},
+            {'$set': {
+                'status': 'done',
+                'n8n_status': n8n_status,
+                'locked_until': None,
+                'update_at': datetime.utcnow()
+            }}
+        )
+        return result.modified_count > 0
+
+    def schedule_retry(self, job_id: ObjectId, worker_id: str, delay: int, error: str) -> bool:
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {'_id': job_id, 'worker_id': worker_id, 'status': 'processing'},
+            {'$set': {
+                'status': 'pending',
+                'available_at': now + timedelta(seconds=delay),
+                'locked_until': None,
+                'last_error': error,
+                'update_at': now
+            }}
+        )
+        return result.modified_count > 0
+
+    def mark_failed(self, job_id: ObjectId, worker_id: str, error: str) -> bool:
+        result = self.collection.update_one(
+            {'_id': job_id, 'worker_id': worker_id, 'status': 'processing'},
+            {'$set': {
+                'status': 'failed',
+                'n8n_status': 'error',
+                'locked_until': None,
+                'last_error': error,
+                'update_at': datetime.utcnow()
+            }}
+        )
+        return result.modified_count > 0
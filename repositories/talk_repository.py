@@ -1,17 +1,56 @@
 from bson import ObjectId
+from datetime import datetime
 from pymongo.database import Database
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from repositories.pagination import decode_cursor, find_page
+
+# Projeções por tela: a lista lateral usa nome, datas e o resumo da última mensagem;
+# None retorna o documento inteiro
+TALK_SIDEBAR_PROJECTION = {
+    '_id': 1, 'name': 1, 'create_at': 1,
+    'last_message_preview': 1, 'message_count': 1, 'last_activity_at': 1
+}
+TALK_ADMIN_PROJECTION = None
 
 class TalkRepository:
     def __init__(self, db: Database):
         self.db = db
         self.collection = db.get_collection('talk')
 
-    def get_talks_by_user_id(self, user_id: str) -> List[Dict[str, Any]]:
-        return list(self.collection.find({'user_id': ObjectId(user_id), 'is_deleted': False}))
+    def get_talks_by_user_id(self, user_id: str,
+                             projection: Optional[Dict[str, Any]] = TALK_SIDEBAR_PROJECTION) -> List[Dict[str, Any]]:
+        """
+        Conversas do usuário, da atividade mais recente para a mais antiga
+
+        O resumo (prévia, contagem, última atividade) vem no próprio documento da conversa
+        """
+        return list(
+            self.collection.find({'user_id': ObjectId(user_id), 'is_deleted': False}, projection)
+            .sort([('last_activity_at', -1), ('_id', -1)])
+        )
+
+    def get_talks_page(self, user_id: str, limit: int, before: Optional[str] = None, after: Optional[str] = None,
+                       projection: Optional[Dict[str, Any]] = TALK_SIDEBAR_PROJECTION) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Busca uma página de conversas, da atividade mais recente para a mais antiga
+
+        O próximo cursor segue para conversas menos recentes (after) ou, se a página
+        foi pedida com before, para conversas mais recentes.
+        """
+        return find_page(
+            self.collection,
+            {'user_id': ObjectId(user_id), 'is_deleted': False},
+            sort_field='last_activity_at',
+            ascending=False,
+            limit=limit,
+            before=decode_cursor(before) if before else None,
+            after=decode_cursor(after) if after else None,
+            projection=projection,
+            allow_missing=True
+        )
 
-    def get_by_id(self, talk_id: str) -> Optional[Dict[str, Any]]:
-        return self.collection.find_one({'_id': ObjectId(talk_id), 'is_deleted': False})
+    def get_by_id(self, talk_id: str, projection: Optional[Dict[str, Any]] = TALK_ADMIN_PROJECTION) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({'_id': ObjectId(talk_id), 'is_deleted': False}, projection)
 
     def create(self, talk_data: Dict[str, Any]) -> Dict[str, Any]:
         result = self.collection.insert_one(talk_data)
@@ -23,7 +62,11 @@ class TalkRepository:
         return self.get_by_id(talk_id)
 
     def delete(self, talk_id: str) -> bool:
-        result = self.collection.update_one({'_id': ObjectId(talk_id)}, {'$set': {'is_deleted': True}})
+        now = datetime.utcnow()
+        result = self.collection.update_one(
+            {'_id': ObjectId(talk_id)},
+            {'$set': {'is_deleted': True, 'deleted_at': now, 'update_at': now}}
+        )
         return result.modified_count > 0
 
     def update_by_id_and_user(self, talk_id: str, user_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -41,10 +84,51 @@ class TalkRepository:
     def soft_delete_by_id_and_user(self, talk_id: str, user_id: str) -> bool:
         """
         Deleta logicamente uma conversa específica de um usuário específico
+
+        A conversa fica com cascade_pending até as mensagens serem deletadas
+        (TalkUseCase.cascade_delete); só então o tombstone pode ser expurgado.
         """
-        from datetime import datetime
+        now = datetime.utcnow()
         result = self.collection.update_one(
             {'_id': ObjectId(talk_id), 'user_id': ObjectId(user_id), 'is_deleted': False},
-            {'$set': {'is_deleted': True, 'update_at': datetime.utcnow()}}
+            {'$set': self.soft_delete_fields(now)}
+        )
+        return result.modified_count > 0
+
+    @staticmethod
+    def soft_delete_fields(now: datetime) -> Dict[str, Any]:
+        return {'is_deleted': True, 'deleted_at': now, 'update_at': now, 'cascade_pending': True}
+
+    def get_pending_cascades(self, deleted_before: datetime, limit: int) -> List[Dict[str, Any]]:
+        """Conversas deletadas cuja cascata não terminou (processo morreu no meio)"""
+        return list(
+            self.collection.find(self.pending_cascade_query(deleted_before), {'_id': 1, 'deleted_at': 1})
+            .sort('deleted_at', 1)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def pending_cascade_query(deleted_before: datetime) -> Dict[str, Any]:
+        return {'cascade_pending': True, 'deleted_at': {'$lte': deleted_before}}
+
+    def iter_archive_candidates(self, inactive_before: datetime, limit: int) -> Iterator[Dict[str, Any]]:
+        """Conversas sem atividade desde inactive_before e ainda não arquivadas, das mais antigas"""
+        return (
+            self.collection.find(self.archive_candidate_query(inactive_before),
+                                 {'_id': 1, 'user_id': 1, 'message_count': 1, 'last_activity_at': 1})
+            .sort('last_activity_at', 1)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def archive_candidate_query(inactive_before: datetime) -> Dict[str, Any]:
+        # archived_at: None também casa a conversa sem o campo (nunca arquivada ou reidratada)
+        return {'is_deleted': False, 'archived_at': None, 'last_activity_at': {'$lt': inactive_before}}
+
+    def finish_cascade(self, talk_id: str) -> bool:
+        """Marca a cascata como concluída; a partir daqui o TTL de tombstones vale para a conversa"""
+        result = self.collection.update_one(
+            {'_id': ObjectId(talk_id), 'cascade_pending': True},
+            {'$set': {'cascade_pending': False}}
         )
         return result.modified_count > 0
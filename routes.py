@@ -1,22 +1,46 @@
+"""
+Rotas do app WSGI (app.py)
+
+Os controllers guardam o banco e o gateway do n8n; init_controllers() os cria em
+create_app() e de novo em cada worker do gunicorn após o fork (gunicorn.conf.py).
+/api/health responde com o snapshot do prober de saúde (monitoring/health.py).
+"""
+
 from flask import Blueprint, jsonify
 from controllers.auth_controller import AuthController
 from controllers.talk_controller import TalkController
 from controllers.message_controller import MessageController
 from auth import token_required
-from config.database import db_config
+from gateways.n8n_gateway import get_n8n_gateway
+from monitoring.health import create_health_prober, health_response
 
 api_bp = Blueprint('api', __name__)
 
-# Instanciando controllers
-auth_controller = AuthController()
-talk_controller = TalkController()
-message_controller = MessageController()
+auth_controller: AuthController = None
+talk_controller: TalkController = None
+message_controller: MessageController = None
+
+# Threads iniciadas no primeiro /api/health de cada processo (ou no post_fork do gunicorn)
+health_prober = create_health_prober()
+
+
+def init_controllers():
+    """Instancia os controllers (conexões do processo atual)"""
+    global auth_controller, talk_controller, message_controller
+    auth_controller = AuthController()
+    talk_controller = TalkController()
+    message_controller = MessageController()
+
 
 # Rotas
 @api_bp.route('/login', methods=['POST'])
 def login():
     return auth_controller.login()
 
+@api_bp.route('/refresh', methods=['POST'])
+def refresh():
+    return auth_controller.refresh()
+
 @api_bp.route('/me', methods=['GET'])
 def get_current_user():
     return auth_controller.get_current_user()
@@ -33,6 +57,14 @@ def get_messages_by_talk():
 def send_message():
     return message_controller.send_message_to_talk()
 
+@api_bp.route('/message/stream', methods=['POST'])
+def stream_message():
+    return message_controller.stream_message_to_talk()
+
+@api_bp.route('/reply-status', methods=['GET'])
+def get_reply_status():
+    return message_controller.get_reply_status()
+
 @api_bp.route('/talk', methods=['POST'])
 def create_talk():
     return talk_controller.create_talk_with_message()
@@ -48,28 +80,6 @@ def delete_talk():
 
 @api_bp.route('/health', methods=['GET'])
 def health():
-    """Health check da API"""
-    try:
-        # Testar conexão com MongoDB
-        db = db_config.get_database()
-        if db is not None:
-            db.command('ping')
-            return jsonify({
-                "status": "healthy",
-                "database": "connected",
-                "service": "ChatAI API"
-            }), 200
-        else:
-            return jsonify({
-                "status": "unhealthy",
-                "database": "disconnected",
-                "error": "Database connection is None"
-            }), 500
-    except Exception as e:
-        return jsonify({
-            "status": "unhealthy",
-            "database": "disconnected",
-            "error": str(e)
-        }), 500
-
-
+    """Health check da API: último resultado do prober, sem consultar as dependências"""
+    body, status_code = health_response(health_prober.snapshot(), get_n8n_gateway().get_stats())
+    return jsonify(body), status_code
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Mede o cold start do app WSGI: imports, create_app() e primeira resposta do /livez
+
+Cada rodada é um interpretador novo (como um worker do gunicorn sem preload). Por
+padrão o MongoDB aponta para um endereço que não responde: a app deve subir e
+responder o /livez no tempo dos imports, e o /readyz responder 503 dentro de
+READINESS_TIMEOUT. Não precisa de MongoDB.
+
+Uso:
+    python scripts/bench_cold_start.py
+    python scripts/bench_cold_start.py --runs 10 --uri mongodb://localhost:27017/chatai
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Roda no processo filho: tempos em segundos, impressos como JSON
+CHILD = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+client = flask_app.test_client()
+livez = client.get('/livez').status_code
+answered = time.perf_counter()
+readyz = client.get('/readyz').status_code
+ready_checked = time.perf_counter()
+print(json.dumps({
+    'imports': imported - started,
+    'create_app': created - imported,
+    'first_livez': answered - created,
+    'total': answered - started,
+    'readyz': ready_checked - answered,
+    'livez_status': livez,
+    'readyz_status': readyz,
+}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start do app WSGI")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--uri', default='mongodb://10.255.255.1:27017/chatai',
+                        help="MONGODB_URI (padrão: endereço que não responde)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, MONGODB_URI=args.uri)
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"{args.runs} rodadas, MONGODB_URI={args.uri}\n")
+    for key, label in (('imports', 'imports'), ('create_app', 'create_app()'),
+                       ('first_livez', 'primeiro /livez'), ('total', 'até responder'),
+                       ('readyz', '/readyz')):
+        values = [run[key] * 1000 for run in runs]
+        print(f"  {label:16} p50 {statistics.median(values):8.1f}ms  máx {max(values):8.1f}ms")
+    print(f"\n  /livez {runs[-1]['livez_status']}  /readyz {runs[-1]['readyz_status']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
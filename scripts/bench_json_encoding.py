@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark da serialização de respostas: json_util (caminho antigo) x BSONJSONProvider
+
+Monta um histórico sintético de mensagens (padrão: 1000) e mede o tempo de
+gerar o corpo da resposta em cada caminho. Não precisa de MongoDB.
+
+Uso:
+    python scripts/bench_json_encoding.py
+    python scripts/bench_json_encoding.py --messages 5000 --repeat 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId, json_util
+from flask import Flask, jsonify
+
+from config.json_provider import BSONJSONProvider, orjson
+
+
+def build_history(count: int) -> list:
+    """Gera mensagens no formato da coleção message"""
+    talk_id, user_id = ObjectId(), ObjectId()
+    start = datetime(2024, 2, 15, 10, 0, 0)
+    return [
+        {
+            '_id': ObjectId(),
+            'type': 'user' if i % 2 == 0 else 'bot',
+            'content': f"Mensagem {i}: dados da indústria têxtil no Ceará, produção e exportações " * 3,
+            'talk_id': talk_id,
+            'user_id': user_id,
+            'create_at': start + timedelta(seconds=i, milliseconds=i % 1000),
+            'update_at': start + timedelta(seconds=i),
+            'is_deleted': False
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialização JSON das respostas")
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    history = build_history(args.messages)
+
+    legacy_app = Flask('legacy')
+    legacy_app.json.compact = True
+
+    provider_app = Flask('provider')
+    provider_app.json = BSONJSONProvider(provider_app)
+
+    plain_app = Flask('plain')
+    plain_app.json = BSONJSONProvider(plain_app)
+    plain_app.json.legacy_bson_format = False
+
+    def old_path():
+        with legacy_app.app_context():
+            return jsonify(json.loads(json_util.dumps(history))).get_data()
+
+    def provider_path():
+        with provider_app.app_context():
+            return jsonify(history).get_data()
+
+    def plain_path():
+        with plain_app.app_context():
+            return jsonify(history).get_data()
+
+    assert json.loads(old_path()) == json.loads(provider_path()), "formato legado divergente do json_util"
+
+    print(f"Mensagens: {args.messages} | repetições: {args.repeat} | orjson: {'sim' if orjson else 'não'}")
+    print(f"Tamanho da resposta: {len(old_path()) / 1024:.1f} KB (json_util) / {len(provider_path()) / 1024:.1f} KB (provider)")
+    print()
+
+    results = {}
+    for name, fn in [('json_util + json.loads + jsonify', old_path),
+                     ('BSONJSONProvider (legado)', provider_path),
+                     ('BSONJSONProvider (simples)', plain_path)]:
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        results[name] = best
+        print(f"{name:<36} {best * 1000:8.2f} ms")
+
+    baseline = results['json_util + json.loads + jsonify']
+    print()
+    for name, value in results.items():
+        print(f"{name:<36} {baseline / value:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark de uma onda de logins: bcrypt na thread da requisição x pool de processos
+
+Simula um worker com várias threads (como o servidor WSGI): algumas threads fazem
+logins em sequência (bcrypt.checkpw com o custo de BCRYPT_ROUNDS) enquanto outras
+atendem "requisições de chat" curtas (serialização de um histórico). Mede logins
+por segundo e a latência p50/p99 do chat em cada modo. Não precisa de MongoDB.
+
+Uso:
+    python scripts/bench_login_storm.py
+    python scripts/bench_login_storm.py --login-threads 8 --chat-threads 4 --seconds 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+
+from config.settings import settings
+from passwords import PasswordVerifier, PasswordPoolFull, hash_password
+
+PASSWORD = 'analyst123'
+
+
+def chat_request(history: list) -> float:
+    """Trabalho de uma requisição de chat curta; retorna a latência em segundos"""
+    started = time.perf_counter()
+    json.dumps(history)
+    return time.perf_counter() - started
+
+
+def run(mode: str, hashed: str, args, verifier: PasswordVerifier) -> dict:
+    stop = threading.Event()
+    logins, rejected, latencies = [0], [0], []
+    lock = threading.Lock()
+    history = [{'type': 'bot', 'content': f"Mensagem {i} " * 20, 'n': i} for i in range(200)]
+
+    def login_loop():
+        while not stop.is_set():
+            try:
+                if mode == 'inline':
+                    bcrypt.checkpw(PASSWORD.encode('utf-8'), hashed.encode('utf-8'))
+                else:
+                    verifier.verify(PASSWORD, hashed)
+            except PasswordPoolFull:
+                with lock:
+                    rejected[0] += 1
+                time.sleep(0.01)
+                continue
+            with lock:
+                logins[0] += 1
+
+    def chat_loop():
+        while not stop.is_set():
+            latency = chat_request(history)
+            with lock:
+                latencies.append(latency)
+            time.sleep(args.chat_interval)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(args.login_threads)]
+    threads += [threading.Thread(target=chat_loop) for _ in range(args.chat_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'logins_per_s': logins[0] / args.seconds,
+        'rejected': rejected[0],
+        'chat_p50_ms': statistics.median(latencies) * 1000,
+        'chat_p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de logins concorrentes com tráfego de chat")
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--chat-threads', type=int, default=4)
+    parser.add_argument('--chat-interval', type=float, default=0.005, help="Pausa entre requisições de chat (s)")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=settings.PASSWORD_POOL_WORKERS)
+    parser.add_argument('--max-pending', type=int, default=settings.PASSWORD_POOL_MAX_PENDING)
+    args = parser.parse_args()
+
+    hashed = hash_password(PASSWORD)
+    verifier = PasswordVerifier(args.workers, args.max_pending, settings.PASSWORD_VERIFY_TIMEOUT)
+    verifier.verify(PASSWORD, hashed)  # aquece o pool
+
+    print(f"BCRYPT_ROUNDS: {settings.BCRYPT_ROUNDS} | núcleos: {os.cpu_count()} | "
+          f"threads de login: {args.login_threads} | threads de chat: {args.chat_threads}")
+    print(f"Pool: {args.workers} processos, fila de {args.max_pending}")
+    print()
+
+    baseline = run('baseline', hashed, argparse.Namespace(**{**vars(args), 'login_threads': 0}), verifier)
+    results = [('sem logins', baseline)]
+    results.append(('bcrypt na thread', run('inline', hashed, args, verifier)))
+    results.append(('pool de processos', run('pool', hashed, args, verifier)))
+    verifier.shutdown()
+
+    print(f"{'modo':<20} {'logins/s':>9} {'por núcleo':>11} {'recusados':>10} {'chat p50':>10} {'chat p99':>10}")
+    for name, result in results:
+        # Núcleos que cada modo consegue ocupar com bcrypt
+        busy = args.login_threads if name == 'bcrypt na thread' else args.workers
+        cores = max(min(busy, os.cpu_count() or 1), 1)
+        print(f"{name:<20} {result['logins_per_s']:9.1f} {result['logins_per_s'] / cores:11.1f} "
+              f"{result['rejected']:10d} {result['chat_p50_ms']:8.2f}ms {result['chat_p99_ms']:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark do armazenamento de mensagens: um documento por mensagem x buckets
+
+Grava uma conversa sintética longa (padrão: 5000 mensagens) nas duas formas,
+num banco de rascunho separado, cria os índices de data/indexes.py e mede o
+histórico inteiro e a página mais recente em cada modo, com o número de chaves
+e documentos examinados pelo plano (explain executionStats). Precisa de um
+MongoDB (MONGODB_URI); o banco de rascunho é apagado ao final.
+
+Uso:
+    python scripts/bench_message_buckets.py
+    python scripts/bench_message_buckets.py --messages 20000 --repeat 10 --database chatai_bench
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from config.settings import settings
+from data.indexes import INDEXES, apply_indexes
+from data.migrate_message_buckets import migrate_message_buckets
+from repositories.bucket_message_repository import BucketMessageRepository, BUCKET_READ_PROJECTION
+from repositories.message_repository import MessageRepository, MESSAGE_HISTORY_PROJECTION
+
+
+def build_talk(count: int):
+    """Gera as mensagens de uma conversa no formato da coleção message"""
+    talk_id, user_id = ObjectId(), ObjectId()
+    start = datetime(2024, 2, 15, 10, 0, 0)
+    messages = [
+        {
+            '_id': ObjectId(),
+            'type': 'user' if i % 2 == 0 else 'bot',
+            'content': f"Mensagem {i}: dados da indústria têxtil no Ceará, produção e exportações " * 3,
+            'talk_id': talk_id,
+            'user_id': user_id,
+            'create_at': start + timedelta(seconds=i),
+            'update_at': start + timedelta(seconds=i),
+            'is_deleted': False
+        }
+        for i in range(count)
+    ]
+    return str(talk_id), str(user_id), messages
+
+
+def timed(fn, repeat: int) -> str:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return f"p50 {statistics.median(samples):7.2f}ms  máx {max(samples):7.2f}ms"
+
+
+def examined(collection, query, projection, sort=None, limit=0) -> str:
+    cursor = collection.find(query, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    stats = cursor.explain()['executionStats']
+    return f"{stats['totalKeysExamined']:6d} chaves  {stats['totalDocsExamined']:6d} docs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de mensagens em documentos x buckets")
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--page', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database', default='chatai_bench_buckets')
+    args = parser.parse_args()
+
+    client = MongoClient(settings.MONGODB_URI, serverSelectionTimeoutMS=5000)
+    db = client[args.database]
+    try:
+        talk_id, user_id, messages = build_talk(args.messages)
+        db.message.insert_many(messages)
+        apply_indexes(db, drop_obsolete=False,
+                      specs=[spec for spec in INDEXES if spec.collection in ('message', 'message_bucket')])
+        report = migrate_message_buckets(db)
+
+        documents = MessageRepository(db)
+        buckets = BucketMessageRepository(db)
+        print(f"{args.messages} mensagens, {report['buckets']} buckets "
+              f"(até {settings.MESSAGE_BUCKET_MAX_MESSAGES} mensagens / {settings.MESSAGE_BUCKET_MAX_KB} KB)")
+
+        assert documents.get_messages_by_talk_and_user(talk_id, user_id) == \
+            buckets.get_messages_by_talk_and_user(talk_id, user_id)
+
+        history_query = {'talk_id': ObjectId(talk_id), 'user_id': ObjectId(user_id), 'is_deleted': False}
+        print("\nHistórico inteiro")
+        print(f"  document  {timed(lambda: documents.get_messages_by_talk_and_user(talk_id, user_id), args.repeat)}"
+              f"  {examined(db.message, history_query, MESSAGE_HISTORY_PROJECTION, [('create_at', 1), ('_id', 1)])}")
+        print(f"  bucket    {timed(lambda: buckets.get_messages_by_talk_and_user(talk_id, user_id), args.repeat)}"
+              f"  {examined(db.message_bucket, history_query, BUCKET_READ_PROJECTION)}")
+
+        buckets_per_page = -(-(args.page + 1) // settings.MESSAGE_BUCKET_MAX_MESSAGES) + 1
+        print(f"\nPágina mais recente ({args.page} mensagens)")
+        print(f"  document  {timed(lambda: documents.get_messages_page(talk_id, user_id, args.page), args.repeat)}"
+              f"  {examined(db.message, history_query, MESSAGE_HISTORY_PROJECTION, [('create_at', -1), ('_id', -1)], args.page + 1)}")
+        print(f"  bucket    {timed(lambda: buckets.get_messages_page(talk_id, user_id, args.page), args.repeat)}"
+              f"  {examined(db.message_bucket, history_query, BUCKET_READ_PROJECTION, [('last_at', -1)], buckets_per_page)}")
+        return 0
+
+    finally:
+        client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do app WSGI: servidor de desenvolvimento x gunicorn (sync, gthread, gevent)
+
+Sobe cada servidor na mesma porta, espera o /health responder, dispara requisições
+concorrentes por alguns segundos e mostra requisições/s, latência p50/p99 e erros.
+Precisa do MongoDB (e do n8n, se o caminho testado chamar o chat) configurados
+como para rodar a API; gevent é pulado se o pacote não estiver instalado.
+
+Uso:
+    python scripts/bench_wsgi_servers.py
+    python scripts/bench_wsgi_servers.py --concurrency 64 --seconds 20 --modes dev gthread
+    python scripts/bench_wsgi_servers.py --path /api/talk-user --token <JWT>
+"""
+
+import argparse
+import importlib.util
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('dev', 'sync', 'gthread', 'gevent')
+PORT = 5000
+
+
+def server_command(mode: str) -> list:
+    if mode == 'dev':
+        # Mesmo servidor do "python app.py", sem o reloader (um único processo para derrubar)
+        return [sys.executable, '-c',
+                "from app import create_app; "
+                f"create_app().run(host='127.0.0.1', port={PORT}, debug=True, use_reloader=False)"]
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+
+
+def start_server(mode: str, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=mode, GUNICORN_BIND=f'127.0.0.1:{PORT}')
+    if workers:
+        env['GUNICORN_WORKERS'] = str(workers)
+    return subprocess.Popen(server_command(mode), cwd=PROJECT_ROOT, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(base_url: str, timeout: float = 60) -> float:
+    """Espera o /health responder; retorna o tempo até a primeira resposta"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if requests.get(f'{base_url}/health', timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu em {timeout}s")
+
+
+def stop_server(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def run_load(url: str, headers: dict, concurrency: int, seconds: float) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = session.get(url, headers=headers, timeout=30).status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / seconds,
+        'p50': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga: servidor de desenvolvimento x gunicorn")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--path', default='/api/health')
+    parser.add_argument('--token', default=None, help="JWT para rotas autenticadas")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=0, help="GUNICORN_WORKERS (0 = padrão da classe)")
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{PORT}'
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    print(f"GET {args.path}: {args.concurrency} clientes por {args.seconds:.0f}s\n")
+    print(f"{'modo':8} {'boot':>7} {'req/s':>9} {'p50':>9} {'p99':>9} {'erros':>6}")
+
+    for mode in args.modes:
+        if mode == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print(f"{mode:8} pulado (pacote gevent não instalado)")
+            continue
+        process = start_server(mode, args.workers)
+        try:
+            boot = wait_ready(base_url)
+            result = run_load(base_url + args.path, headers, args.concurrency, args.seconds)
+            print(f"{mode:8} {boot:6.1f}s {result['rps']:9.1f} {result['p50']:7.1f}ms "
+                  f"{result['p99']:7.1f}ms {result['errors']:6d}")
+        except RuntimeError as e:
+            print(f"{mode:8} falhou: {e}")
+        finally:
+            stop_server(process)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
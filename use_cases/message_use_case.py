@@ -1,35 +1,126 @@
-from repositories.message_repository import MessageRepository
-from typing import List, Dict, Any
+from repositories.message_repository import MessageRepository, MESSAGE_HISTORY_PROJECTION
+from config.database import parse_write_concern
+from config.settings import settings
+from typing import List, Dict, Any, Optional, Tuple
 from bson import ObjectId
 from datetime import datetime
 
+def message_preview(content: str) -> str:
+    """Trecho da mensagem exibido na lista lateral"""
+    content = ' '.join(content.split())
+    if len(content) <= settings.TALK_PREVIEW_LENGTH:
+        return content
+    return content[:settings.TALK_PREVIEW_LENGTH].rstrip() + '...'
+
+
+def talk_summary_fields(last_message: Dict[str, Any], message_count: int) -> Dict[str, Any]:
+    """Campos do resumo da conversa a partir da última mensagem"""
+    return {
+        'last_message_preview': message_preview(last_message['content']),
+        'message_count': message_count,
+        'last_activity_at': last_message['create_at']
+    }
+
+
+def talk_summary_update(last_message: Dict[str, Any], added: int) -> Dict[str, Any]:
+    """Atualização atômica do resumo da conversa após gravar `added` mensagens"""
+    return {
+        '$set': {
+            'last_message_preview': message_preview(last_message['content']),
+            'last_activity_at': last_message['create_at'],
+            'update_at': last_message['create_at']
+        },
+        '$inc': {'message_count': added},
+        # Conversa arquivada com atividade nova volta a ser candidata ao arquivamento
+        '$unset': {'archived_at': ''}
+    }
+
+
 class MessageUseCase:
+    """
+    Regras das mensagens de uma conversa
+
+    Cada método termina com uma única chamada ao repositório e retorna o resultado
+    dela, então o mesmo use case serve ao repositório síncrono (pymongo) e ao
+    assíncrono (motor), cujo resultado é aguardado pelo controller.
+    """
+
     def __init__(self, message_repository: MessageRepository):
         self.message_repository = message_repository
+        self.turn_write_concern = parse_write_concern(settings.MESSAGE_WRITE_CONCERN)
+        self.bot_write_concern = parse_write_concern(settings.BOT_MESSAGE_WRITE_CONCERN)
+        self.talk_write_concern = parse_write_concern(settings.TALK_ACTIVITY_WRITE_CONCERN)
 
-    def get_messages_by_talk_and_user(self, talk_id: str, user_id: str) -> List[Dict[str, Any]]:
+    def get_messages_by_talk_and_user(self, talk_id: str, user_id: str, after: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Retorna mensagens de uma conversa específica para um usuário específico
+
+        after: cursor (_id de mensagem ou data ISO 8601) para buscar só mensagens mais novas
+        """
+        return self.message_repository.get_messages_by_talk_and_user(talk_id, user_id, after)
+
+    def get_messages_page(self, talk_id: str, user_id: str, limit: int, before: Optional[str] = None,
+                          after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retorna uma página de mensagens da conversa e o cursor da próxima página
         """
-        return self.message_repository.get_messages_by_talk_and_user(talk_id, user_id)
+        return self.message_repository.get_messages_page(talk_id, user_id, limit, before, after)
 
-    def create_message(self, content: str, message_type: str, talk_id: str, user_id: str) -> Dict[str, Any]:
+    def get_message_by_id(self, message_id: str) -> Optional[Dict[str, Any]]:
+        return self.message_repository.get_by_id(message_id, projection=MESSAGE_HISTORY_PROJECTION)
+
+    def create_message(self, content: str, message_type: str, talk_id: str, user_id: str,
+                       message_id: Optional[ObjectId] = None) -> Dict[str, Any]:
         """
         Cria uma nova mensagem na conversa
+
+        message_id permite fixar o _id da mensagem (usado pelo worker de respostas
+        para que uma reentrega do mesmo job não duplique a mensagem do bot)
+        """
+        message_data = self._message_data(content, message_type, talk_id, user_id, datetime.utcnow())
+        if message_id is not None:
+            message_data['_id'] = message_id
+        write_concern = self.bot_write_concern if message_type == 'bot' else None
+        return self.message_repository.create(
+            message_data,
+            write_concern=write_concern,
+            talk_update=talk_summary_update(message_data, 1),
+            talk_write_concern=self.talk_write_concern
+        )
+
+    def append_turn(self, talk_id: str, user_id: str, user_content: str, bot_content: str,
+                    sent_at: Optional[datetime] = None, user_type: str = 'user',
+                    touch_talk: bool = True, replied_at: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Grava a mensagem do usuário e a resposta do bot de uma só vez
+
+        sent_at é o momento em que o usuário enviou a mensagem (antes da chamada ao n8n)
+        e replied_at o da resposta (padrão: agora); touch_talk atualiza o resumo da
+        conversa (desnecessário numa conversa criada já com o resumo deste turno).
+
+        Returns:
+            [mensagem do usuário, mensagem do bot], já com _id
         """
-        message_data = {
+        replied_at = replied_at or datetime.utcnow()
+        user_message = self._message_data(user_content, user_type, talk_id, user_id, sent_at or replied_at)
+        bot_message = self._message_data(bot_content, 'bot', talk_id, user_id, replied_at)
+
+        return self.message_repository.append_turn(
+            [user_message, bot_message],
+            talk_update=talk_summary_update(bot_message, 2) if touch_talk else None,
+            write_concern=self.turn_write_concern,
+            talk_write_concern=self.talk_write_concern
+        )
+
+    @staticmethod
+    def _message_data(content: str, message_type: str, talk_id: str, user_id: str,
+                      created_at: datetime) -> Dict[str, Any]:
+        return {
             'content': content,
             'type': message_type,
             'talk_id': ObjectId(talk_id),
             'user_id': ObjectId(user_id),
-            'create_at': datetime.utcnow(),
-            'update_at': datetime.utcnow(),
+            'create_at': created_at,
+            'update_at': created_at,
             'is_deleted': False
         }
-        return self.message_repository.create(message_data)
-
-    def soft_delete_by_talk_id(self, talk_id: str) -> bool:
-        """
-        Deleta logicamente todas as mensagens de uma conversa
-        """
-        return self.message_repository.soft_delete_by_talk_id(talk_id)
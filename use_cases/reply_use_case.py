@@ -0,0 +1,176 @@
+from repositories.reply_job_repository import ReplyJobRepository
+from use_cases.message_use_case import MessageUseCase
+from gateways.n8n_gateway import N8nGateway
+from config.settings import settings
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, Any, Optional
+from bson import ObjectId
+from datetime import datetime
+
+DEFAULT_BOT_ERROR_MESSAGE = 'Desculpe, não consegui processar sua mensagem no momento.'
+
+
+def bot_response_from(n8n_response: Dict[str, Any]) -> str:
+    """
+    Extrai o texto que será salvo como mensagem do bot a partir da resposta do gateway
+    """
+    if n8n_response['success']:
+        return n8n_response.get('message', 'Resposta não disponível')
+    return n8n_response.get('message', DEFAULT_BOT_ERROR_MESSAGE)
+
+
+def wants_async_reply(data: Dict[str, Any]) -> bool:
+    """
+    Campo async do corpo da requisição; ausente, vale ASYNC_REPLY_ENABLED
+
+    Só true (booleano ou texto, como nas flags do settings) liga o modo assíncrono:
+    valores como "false", "0" ou {} não podem enfileirar a resposta por engano.
+    """
+    value = data.get('async')
+    if value is None:
+        return settings.ASYNC_REPLY_ENABLED
+    if isinstance(value, str):
+        return value.lower() == 'true'
+    return value is True
+
+
+def stream_error_response(error: Optional[BaseException] = None) -> Dict[str, Any]:
+    """
+    Resposta de erro no formato do gateway para um streaming que terminou sem o evento done
+
+    Mantém o erro original (exceção do gateway) e salva a mensagem padrão do bot.
+    """
+    detail = f"Streaming do n8n interrompido: {error!r}" if error is not None else "Streaming do n8n interrompido"
+    return {'success': False, 'message': DEFAULT_BOT_ERROR_MESSAGE, 'error': detail, 'data': None}
+
+
+def is_retryable(n8n_response: Dict[str, Any]) -> bool:
+    """
+    Falhas de conexão, timeout e erros 5xx podem ser tentadas novamente;
+    erros 4xx indicam problema na requisição e não mudam com nova tentativa
+    """
+    if n8n_response['success']:
+        return False
+    status_code = n8n_response.get('status_code')
+    return status_code is None or status_code >= 500
+
+
+class ReplyUseCase:
+    def __init__(self, reply_job_repository: ReplyJobRepository, message_use_case: MessageUseCase,
+                 n8n_gateway: Optional[N8nGateway] = None):
+        self.reply_job_repository = reply_job_repository
+        self.message_use_case = message_use_case
+        self.n8n_gateway = n8n_gateway
+
+    def enqueue_reply(self, talk_id: str, user_id: str, content: str, user_message_id: ObjectId) -> Dict[str, Any]:
+        """
+        Enfileira a geração da resposta do bot para uma mensagem já salva do usuário
+        """
+        now = datetime.utcnow()
+        job_data = {
+            'talk_id': ObjectId(talk_id),
+            'user_id': ObjectId(user_id),
+            'content': content,
+            'user_message_id': user_message_id,
+            # _id reservado para a mensagem do bot: torna a escrita idempotente entre tentativas
+            'bot_message_id': ObjectId(),
+            'status': 'pending',
+            'attempts': 0,
+            'max_attempts': settings.REPLY_JOB_MAX_ATTEMPTS,
+            'available_at': now,
+            'locked_until': None,
+            'worker_id': None,
+            'n8n_status': None,
+            'last_error': None,
+            'create_at': now,
+            'update_at': now
+        }
+        return self.reply_job_repository.enqueue(job_data)
+
+    def get_job_status(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o estado de um job do usuário e, quando concluído, a mensagem do bot
+        """
+        job = self.reply_job_repository.get_by_id_and_user(job_id, user_id)
+        if not job:
+            return None
+
+        bot_message = None
+        if self._is_finished(job):
+            bot_message = self.message_use_case.get_message_by_id(job['bot_message_id'])
+        return self._job_status(job, bot_message)
+
+    @staticmethod
+    def _is_finished(job: Dict[str, Any]) -> bool:
+        return job['status'] in ('done', 'failed')
+
+    @staticmethod
+    def _job_status(job: Dict[str, Any], bot_message: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            'job_id': str(job['_id']),
+            'talk_id': str(job['talk_id']),
+            'status': job['status'],
+            'attempts': job['attempts'],
+            'n8n_status': job.get('n8n_status'),
+            'bot_message': bot_message
+        }
+
+    def process_next(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Reivindica e processa o próximo job da fila. Retorna o job ou None se a fila estiver vazia
+        """
+        job = self.reply_job_repository.claim_next(worker_id, settings.REPLY_JOB_VISIBILITY_TIMEOUT)
+        if job:
+            self.process_job(job, worker_id)
+        return job
+
+    def process_job(self, job: Dict[str, Any], worker_id: str) -> None:
+        """
+        Chama o n8n e grava a mensagem do bot; agenda nova tentativa em falhas transitórias
+        """
+        n8n_response = self.n8n_gateway.send_chat_input(job['content'])
+
+        if is_retryable(n8n_response) and job['attempts'] < job['max_attempts']:
+            delay = settings.REPLY_JOB_RETRY_BACKOFF * (2 ** (job['attempts'] - 1))
+            self.reply_job_repository.schedule_retry(job['_id'], worker_id, delay, n8n_response.get('error', ''))
+            return
+
+        # Sucesso ou tentativas esgotadas: a conversa sempre recebe uma mensagem do bot,
+        # como no fluxo síncrono
+        try:
+            self.message_use_case.create_message(
+                content=bot_response_from(n8n_response),
+                message_type='bot',
+                talk_id=str(job['talk_id']),
+                user_id=str(job['user_id']),
+                message_id=job['bot_message_id']
+            )
+        except DuplicateKeyError:
+            # Uma tentativa anterior já gravou a mensagem antes de perder a visibilidade
+            pass
+
+        if n8n_response['success']:
+            self.reply_job_repository.mark_done(job['_id'], worker_id, 'success')
+        else:
+            self.reply_job_repository.mark_failed(job['_id'], worker_id, n8n_response.get('error', ''))
+
+
+class AsyncReplyUseCase(ReplyUseCase):
+    """
+    ReplyUseCase para repositórios assíncronos (app ASGI)
+
+    Só enfileira e consulta jobs; o processamento continua no worker síncrono.
+    """
+
+    async def get_job_status(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o estado de um job do usuário e, quando concluído, a mensagem do bot
+        """
+        job = await self.reply_job_repository.get_by_id_and_user(job_id, user_id)
+        if not job:
+            return None
+
+        bot_message = None
+        if self._is_finished(job):
+            bot_message = await self.message_use_case.get_message_by_id(job['bot_message_id'])
+        return self._job_status(job, bot_message)
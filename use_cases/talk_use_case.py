@@ -1,26 +1,80 @@
 from repositories.talk_repository import TalkRepository
-from typing import List, Dict, Any
+from repositories.message_repository import MessageRepository
+from config.settings import settings
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Threads que executam as cascatas de exclusão (uma por processo; recriadas após fork)
+_cascade_lock = threading.Lock()
+_cascade_executor: Optional[ThreadPoolExecutor] = None
+_cascade_pid: Optional[int] = None
+# Referências das cascatas em andamento no app ASGI (o event loop só guarda referências fracas)
+_cascade_tasks = set()
+
+
+def _submit_cascade(fn, *args) -> Future:
+    global _cascade_executor, _cascade_pid
+    with _cascade_lock:
+        if _cascade_executor is None or _cascade_pid != os.getpid():
+            _cascade_executor = ThreadPoolExecutor(max_workers=settings.CASCADE_DELETE_WORKERS,
+                                                   thread_name_prefix='cascade-delete')
+            _cascade_pid = os.getpid()
+        return _cascade_executor.submit(fn, *args)
+
 
 class TalkUseCase:
-    def __init__(self, talk_repository: TalkRepository):
+    """
+    Regras das conversas
+
+    Métodos de uma única chamada ao repositório retornam o resultado dela e servem
+    também ao repositório assíncrono; os de várias chamadas têm versão em AsyncTalkUseCase.
+    """
+
+    def __init__(self, talk_repository: TalkRepository, message_repository: MessageRepository):
         self.talk_repository = talk_repository
+        self.message_repository = message_repository
 
     def get_talks_by_user_id(self, user_id: str) -> List[Dict[str, Any]]:
         return self.talk_repository.get_talks_by_user_id(user_id)
 
-    def create_talk(self, name: str, user_id: str) -> Dict[str, Any]:
+    def get_talks_page(self, user_id: str, limit: int, before: Optional[str] = None,
+                       after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retorna uma página de conversas do usuário e o cursor da próxima página
+        """
+        return self.talk_repository.get_talks_page(user_id, limit, before, after)
+
+    def create_talk(self, name: str, user_id: str, created_at: Optional[datetime] = None,
+                    summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Cria uma nova conversa (talk) para o usuário
+
+        summary: resumo inicial (talk_summary_fields) quando as primeiras mensagens
+        já são conhecidas; sem ele a conversa começa vazia
         """
+        now = created_at or datetime.utcnow()
         talk_data = {
             'name': name,
             'user_id': ObjectId(user_id),
-            'create_at': datetime.utcnow(),
-            'update_at': datetime.utcnow(),
+            'create_at': now,
+            'update_at': now,
+            'last_message_preview': None,
+            'message_count': 0,
+            'last_activity_at': now,
             'is_deleted': False
         }
+        if summary:
+            talk_data.update(summary)
+            talk_data['update_at'] = summary['last_activity_at']
         return self.talk_repository.create(talk_data)
 
     def update_talk(self, talk_id: str, user_id: str, new_name: str) -> Dict[str, Any]:
@@ -35,19 +89,84 @@ class TalkUseCase:
 
     def delete_talk(self, talk_id: str, user_id: str) -> bool:
         """
-        Deleta logicamente uma conversa (talk) e suas mensagens
+        Deleta logicamente uma conversa (talk) e agenda a exclusão das mensagens
+
+        Retorna sem esperar a cascata: o tempo da requisição não depende do tamanho
+        da conversa. Se o processo morrer no meio, o worker de limpeza retoma a
+        cascata (cascade_pending continua marcado).
         """
-        # 1. Deletar logicamente a conversa
         talk_deleted = self.talk_repository.soft_delete_by_id_and_user(talk_id, user_id)
-        
         if talk_deleted:
-            # 2. Deletar logicamente todas as mensagens da conversa
-            from repositories.message_repository import MessageRepository
-            from config.database import db_config
-            
-            message_repository = MessageRepository(db_config.get_database())
-            
-            # Deletar mensagens em cascata
-            message_repository.soft_delete_by_talk_id(talk_id)
-            
+            _submit_cascade(self.cascade_delete, talk_id)
+        return talk_deleted
+
+    def cascade_delete(self, talk_id: str) -> int:
+        """
+        Deleta logicamente as mensagens da conversa em lotes, com pausa entre eles,
+        e remove o arquivo da conversa, se ela tiver sido arquivada
+
+        Returns:
+            Quantidade de mensagens deletadas
+        """
+        deleted = 0
+        try:
+            while True:
+                count = self.message_repository.soft_delete_batch_by_talk_id(talk_id, settings.CASCADE_DELETE_BATCH_SIZE)
+                deleted += count
+                if count < settings.CASCADE_DELETE_BATCH_SIZE:
+                    break
+                time.sleep(settings.CASCADE_DELETE_PAUSE)
+            self.message_repository.delete_archive(talk_id)
+            self.talk_repository.finish_cascade(talk_id)
+        except Exception as e:
+            logger.error(f"Erro na exclusão das mensagens da conversa {talk_id}: {e}")
+            raise
+        logger.info(f"Conversa {talk_id}: {deleted} mensagens deletadas")
+        return deleted
+
+    def resume_pending_cascades(self, limit: int = 100) -> int:
+        """
+        Retoma cascatas interrompidas (usado pelo worker de limpeza)
+
+        Só considera conversas deletadas há mais de CLEANUP_STALE_CASCADE_SECONDS,
+        para não disputar com a cascata ainda em andamento no processo da API.
+        """
+        deleted_before = datetime.utcnow() - timedelta(seconds=settings.CLEANUP_STALE_CASCADE_SECONDS)
+        talks = self.talk_repository.get_pending_cascades(deleted_before, limit)
+        for talk in talks:
+            self.cascade_delete(str(talk['_id']))
+        return len(talks)
+
+
+class AsyncTalkUseCase(TalkUseCase):
+    """TalkUseCase para repositórios assíncronos (app ASGI)"""
+
+    async def delete_talk(self, talk_id: str, user_id: str) -> bool:
+        """
+        Deleta logicamente uma conversa (talk) e agenda a exclusão das mensagens numa tarefa
+        """
+        talk_deleted = await self.talk_repository.soft_delete_by_id_and_user(talk_id, user_id)
+        if talk_deleted:
+            task = asyncio.create_task(self.cascade_delete(talk_id))
+            _cascade_tasks.add(task)
+            task.add_done_callback(_cascade_tasks.discard)
         return talk_deleted
+
+    async def cascade_delete(self, talk_id: str) -> int:
+        deleted = 0
+        try:
+            while True:
+                count = await self.message_repository.soft_delete_batch_by_talk_id(
+                    talk_id, settings.CASCADE_DELETE_BATCH_SIZE
+                )
+                deleted += count
+                if count < settings.CASCADE_DELETE_BATCH_SIZE:
+                    break
+                await asyncio.sleep(settings.CASCADE_DELETE_PAUSE)
+            await self.message_repository.delete_archive(talk_id)
+            await self.talk_repository.finish_cascade(talk_id)
+        except Exception as e:
+            logger.error(f"Erro na exclusão das mensagens da conversa {talk_id}: {e}")
+            raise
+        logger.info(f"Conversa {talk_id}: {deleted} mensagens deletadas")
+        return deleted
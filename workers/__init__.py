@@ -0,0 +1,5 @@
+"""
+Workers - Processos em segundo plano
+
+Entradas executáveis com `python -m workers.<nome>`, fora do processo web.
+"""
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Worker de limpeza das conversas deletadas
+
+A exclusão das mensagens de uma conversa roda em segundo plano no processo da
+API (TalkUseCase.delete_talk). Se esse processo morrer no meio, a conversa fica
+com cascade_pending marcado; este worker retoma essas cascatas. O expurgo dos
+documentos deletados é feito pelo índice TTL tombstone_ttl (data/indexes.py).
+
+Uso:
+    python -m workers.cleanup            # loop contínuo
+    python -m workers.cleanup --once     # retoma as cascatas pendentes e sai
+"""
+
+import argparse
+import signal
+import sys
+import time
+
+import structlog
+
+from config.database import db_config
+from config.settings import settings
+from repositories.message_storage import create_message_repository
+from repositories.talk_repository import TalkRepository
+from use_cases.talk_use_case import TalkUseCase
+
+logger = structlog.get_logger(__name__)
+
+
+def build_talk_use_case() -> TalkUseCase:
+    db = db_config.get_database()
+    return TalkUseCase(TalkRepository(db), create_message_repository(db))
+
+
+def run(once: bool = False, poll_interval: float = None) -> int:
+    """Executa o loop do worker; retorna a quantidade de cascatas retomadas"""
+    if poll_interval is None:
+        poll_interval = settings.CLEANUP_WORKER_POLL_INTERVAL
+
+    talk_use_case = build_talk_use_case()
+    resumed = 0
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        logger.info("Encerrando worker após a cascata atual", signal=signum)
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    logger.info("Worker de limpeza iniciado")
+
+    while not stopping:
+        try:
+            count = talk_use_case.resume_pending_cascades()
+        except Exception as e:
+            # A conversa continua com cascade_pending e é retomada na próxima rodada
+            logger.error("Erro ao retomar cascata de exclusão", error=str(e))
+            count = 0
+
+        resumed += count
+        if count:
+            logger.info("Cascatas de exclusão retomadas", count=count)
+            continue
+
+        if once:
+            break
+        time.sleep(poll_interval)
+
+    logger.info("Worker de limpeza encerrado", resumed=resumed)
+    return resumed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Worker de limpeza das conversas deletadas")
+    parser.add_argument('--once', action='store_true', help="Retoma as cascatas pendentes e sai")
+    parser.add_argument('--poll-interval', type=float, default=None,
+                        help="Intervalo entre verificações, em segundos")
+    args = parser.parse_args()
+
+    try:
+        run(once=args.once, poll_interval=args.poll_interval)
+        return 0
+    finally:
+        db_config.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
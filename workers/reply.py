@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Worker de respostas do bot
+
+Consome a coleção reply_jobs, chama o n8n e grava a mensagem do bot.
+Vários workers podem rodar em paralelo: a reivindicação do job é atômica
+e jobs de workers que morreram voltam para a fila após a visibilidade expirar.
+
+Uso:
+    python -m workers.reply            # loop contínuo
+    python -m workers.reply --once     # processa o que houver na fila e sai
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+import structlog
+
+from config.database import db_config
+from config.settings import settings
+from gateways.n8n_gateway import get_n8n_gateway
+from repositories.message_storage import create_message_repository
+from repositories.reply_job_repository import ReplyJobRepository
+from use_cases.message_use_case import MessageUseCase
+from use_cases.reply_use_case import ReplyUseCase
+
+logger = structlog.get_logger(__name__)
+
+
+def build_reply_use_case() -> ReplyUseCase:
+    db = db_config.get_database()
+    return ReplyUseCase(
+        ReplyJobRepository(db),
+        MessageUseCase(create_message_repository(db)),
+        get_n8n_gateway()
+    )
+
+
+def run(once: bool = False, poll_interval: float = None) -> int:
+    """Executa o loop do worker; retorna a quantidade de jobs processados"""
+    if poll_interval is None:
+        poll_interval = settings.REPLY_WORKER_POLL_INTERVAL
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    reply_use_case = build_reply_use_case()
+    processed = 0
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        logger.info("Encerrando worker após o job atual", signal=signum)
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    logger.info("Worker de respostas iniciado", worker_id=worker_id)
+
+    while not stopping:
+        try:
+            job = reply_use_case.process_next(worker_id)
+        except Exception as e:
+            # O job continua reivindicado e volta para a fila quando a visibilidade expirar
+            logger.error("Erro ao processar job de resposta", error=str(e))
+            time.sleep(poll_interval)
+            continue
+
+        if job:
+            processed += 1
+            logger.info("Job de resposta processado", job_id=str(job['_id']), attempts=job['attempts'])
+            continue
+
+        if once:
+            break
+        time.sleep(poll_interval)
+
+    logger.info("Worker de respostas encerrado", processed=processed)
+    return processed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Worker de respostas do bot (reply_jobs)")
+    parser.add_argument('--once', action='store_true', help="Processa os jobs disponíveis e sai")
+    parser.add_argument('--poll-interval', type=float, default=None,
+                        help="Intervalo de espera com a fila vazia, em segundos")
+    args = parser.parse_args()
+
+    try:
+        run(once=args.once, poll_interval=args.poll_interval)
+        return 0
+    finally:
+        db_config.disconnect()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
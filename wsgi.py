@@ -0,0 +1,10 @@
+"""
+Entry point WSGI de produção
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import create_app
+
+app = create_app()